@@ -0,0 +1,314 @@
+"""
+Columnar (NumPy) analytics engine.
+
+Loads the orders in a date window once - only the fields analytics need,
+from the hot collection and (when the window reaches it) the archive -
+into NumPy arrays: timestamps, status / order type / payment status codes,
+total cents and item quantities, plus an exploded item table. Every
+analytics grouping is then a vectorized np.unique + np.bincount.
+
+The snapshot is cached for ANALYTICS_SNAPSHOT_TTL_SECONDS and reused for
+any window it covers, so a dashboard issuing a dozen analytics calls reads
+the orders once. Selected with ANALYTICS_ENGINE=numpy or ?engine=numpy;
+results match app.order_totals' aggregation pipelines.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import time
+
+from . import models, order_archive, order_codec
+from .config import settings
+from .money import to_cents
+from .order_totals import MealTotals, Totals
+
+try:  # numpy is optional; the Mongo aggregation engine needs nothing extra
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+STATUS_CODES = order_codec.STATUS_CODES
+ORDER_TYPES = [order_type.value for order_type in models.OrderType]
+PAYMENT_STATUSES = [status.value for status in models.PaymentStatus]
+DELIVERED_CODE = STATUS_CODES.index(models.OrderStatus.DELIVERED.value)
+
+MS_PER_HOUR = 3_600_000
+MS_PER_DAY = 24 * MS_PER_HOUR
+
+HOT_PROJECTION = {
+    "created_at": 1, "status": 1, "order_type": 1, "payment_status": 1,
+    "total_amount": 1, "total_amount_cents": 1,
+    "items.meal_id": 1, "items.meal_name": 1, "items.quantity": 1, "items.subtotal": 1, "items.subtotal_cents": 1,
+}
+ARCHIVE_PROJECTION = {
+    "created_at": 1, "status": 1, "order_type": 1, "payment_status": 1,
+    "total_amount_cents": 1, "it.m": 1, "it.q": 1, "it.s": 1, "v": 1,
+    **{field: 1 for field in HOT_PROJECTION if field.startswith("items.")},  # archived before packing
+}
+
+
+def available() -> bool:
+    return np is not None
+
+
+class ColumnBuilder:
+    """Accumulates raw order documents into column lists"""
+
+    def __init__(self):
+        self.created_ms: List[int] = []
+        self.status: List[int] = []
+        self.order_type: List[int] = []
+        self.payment_status: List[int] = []
+        self.total_cents: List[int] = []
+        self.quantity: List[int] = []
+        self.item_order: List[int] = []
+        self.item_meal: List[int] = []
+        self.item_quantity: List[int] = []
+        self.item_cents: List[int] = []
+        self.meal_ids: List[str] = []
+        self.meal_names: List[str] = []
+        self._meal_index: Dict[str, int] = {}
+        self._status_index = {status: code for code, status in enumerate(STATUS_CODES)}
+        self._type_index = {value: code for code, value in enumerate(ORDER_TYPES)}
+        self._payment_index = {value: code for code, value in enumerate(PAYMENT_STATUSES)}
+
+    def _meal(self, meal_id: str, meal_name: str) -> int:
+        index = self._meal_index.get(meal_id)
+        if index is None:
+            index = self._meal_index[meal_id] = len(self.meal_ids)
+            self.meal_ids.append(meal_id)
+            self.meal_names.append(meal_name)
+        else:
+            self.meal_names[index] = meal_name  # later (hot) documents carry the current name
+        return index
+
+    def _order(self, doc: dict, total_cents: int, quantity: int) -> int:
+        row = len(self.created_ms)
+        self.created_ms.append(order_codec.to_millis(doc["created_at"]))
+        self.status.append(self._status_index[doc["status"]])
+        self.order_type.append(self._type_index[doc["order_type"]])
+        self.payment_status.append(self._payment_index[doc.get("payment_status", "PENDING")])
+        self.total_cents.append(total_cents)
+        self.quantity.append(quantity)
+        return row
+
+    def add_hot(self, doc: dict):
+        items = doc.get("items") or []
+        total = doc.get("total_amount_cents")
+        row = self._order(
+            doc,
+            total if total is not None else to_cents(doc.get("total_amount")),
+            sum(item.get("quantity", 1) for item in items),
+        )
+        for item in items:
+            cents = item.get("subtotal_cents")
+            self.item_order.append(row)
+            self.item_meal.append(self._meal(item["meal_id"], item.get("meal_name", "")))
+            self.item_quantity.append(item.get("quantity", 1))
+            self.item_cents.append(cents if cents is not None else to_cents(item.get("subtotal")))
+
+    def add_archived(self, doc: dict, books: "order_codec.CodeBooks"):
+        if not order_codec.is_packed(doc):
+            return self.add_hot(doc)
+        items = doc.get("it") or []
+        row = self._order(doc, doc.get("total_amount_cents", 0), sum(item.get("q", 1) for item in items))
+        for item in items:
+            self.item_order.append(row)
+            self.item_meal.append(self._meal(*books.meals.entry(item["m"])))
+            self.item_quantity.append(item.get("q", 1))
+            self.item_cents.append(item["s"])
+
+    def build(self, since: Optional[datetime]) -> "OrderColumns":
+        return OrderColumns(
+            since=since,
+            loaded_at=time.monotonic(),
+            created_ms=np.array(self.created_ms, dtype=np.int64),
+            status=np.array(self.status, dtype=np.int8),
+            order_type=np.array(self.order_type, dtype=np.int8),
+            payment_status=np.array(self.payment_status, dtype=np.int8),
+            total_cents=np.array(self.total_cents, dtype=np.int64),
+            quantity=np.array(self.quantity, dtype=np.int64),
+            item_order=np.array(self.item_order, dtype=np.int64),
+            item_meal=np.array(self.item_meal, dtype=np.int64),
+            item_quantity=np.array(self.item_quantity, dtype=np.int64),
+            item_cents=np.array(self.item_cents, dtype=np.int64),
+            meal_ids=self.meal_ids,
+            meal_names=self.meal_names,
+        )
+
+
+@dataclass
+class OrderColumns:
+    since: Optional[datetime]  # window start the snapshot was loaded for (None = all time)
+    loaded_at: float
+    created_ms: Any
+    status: Any
+    order_type: Any
+    payment_status: Any
+    total_cents: Any
+    quantity: Any
+    item_order: Any
+    item_meal: Any
+    item_quantity: Any
+    item_cents: Any
+    meal_ids: List[str]
+    meal_names: List[str]
+
+    def covers(self, since: Optional[datetime]) -> bool:
+        return self.since is None or (since is not None and self.since <= since)
+
+    def window(self, since: Optional[datetime], until: Optional[datetime]):
+        """Boolean mask of orders created in [since, until)"""
+        mask = np.ones(len(self.created_ms), dtype=bool)
+        if since is not None:
+            mask &= self.created_ms >= order_codec.to_millis(since)
+        if until is not None:
+            mask &= self.created_ms < order_codec.to_millis(until)
+        return mask
+
+
+def columns_from_docs(hot_docs: Iterable[dict], archived_docs: Iterable[dict] = (), books=None, since=None) -> OrderColumns:
+    """Build a snapshot from raw documents (archive first, so hot names win)"""
+    builder = ColumnBuilder()
+    for doc in archived_docs:
+        builder.add_archived(doc, books)
+    for doc in hot_docs:
+        builder.add_hot(doc)
+    return builder.build(since)
+
+
+_snapshot: Optional[OrderColumns] = None
+_lock = asyncio.Lock()
+
+
+async def load_columns(since: Optional[datetime]) -> OrderColumns:
+    """Read the window from MongoDB with projections and build a snapshot"""
+    query = {"created_at": {"$gte": since}} if since is not None else {}
+    hot = models.Order.get_motor_collection().find(query, HOT_PROJECTION, batch_size=5000)
+    hot_docs = await hot.to_list(length=None)
+
+    archived_docs: List[dict] = []
+    books = None
+    if order_archive.archive_may_contain(since):
+        archived = models.ArchivedOrder.get_motor_collection().find(query, ARCHIVE_PROJECTION, batch_size=5000)
+        archived_docs = await archived.to_list(length=None)
+        books = await order_codec.codebooks()
+        max_code = max((item["m"] for doc in archived_docs for item in doc.get("it") or []), default=-1)
+        if max_code >= len(books.meals.entries):
+            books = await order_codec.codebooks(refresh=True)
+    return columns_from_docs(hot_docs, archived_docs, books, since)
+
+
+def _is_current(since: Optional[datetime]) -> bool:
+    return (
+        _snapshot is not None
+        and time.monotonic() - _snapshot.loaded_at < settings.analytics_snapshot_ttl_seconds
+        and _snapshot.covers(since)
+    )
+
+
+async def snapshot(since: Optional[datetime]) -> OrderColumns:
+    """
+    Cached snapshot covering `since`, reloaded when stale. Concurrent callers
+    share one load, and a reload keeps the previous snapshot's window when
+    that was wider, so a narrow request never evicts a dashboard's wide one.
+    """
+    global _snapshot
+    if np is None:
+        raise RuntimeError("numpy is required for ANALYTICS_ENGINE=numpy")
+    if _is_current(since):
+        return _snapshot
+
+    async with _lock:
+        if _is_current(since):
+            return _snapshot
+        if _snapshot is not None and _snapshot.covers(since):
+            since = _snapshot.since  # stale: reload the (wider) window it had
+        _snapshot = await load_columns(since)
+        return _snapshot
+
+
+def invalidate():
+    global _snapshot
+    _snapshot = None
+
+
+# --- vectorized group-bys ---
+
+def _group_keys(columns: OrderColumns, key: str, mask) -> Tuple[Any, List[Any]]:
+    """(inverse index per selected order, key value per group)"""
+    created = columns.created_ms[mask]
+    if key == "all":
+        return np.zeros(len(created), dtype=np.int64), [None]
+    if key == "day":
+        raw = created // MS_PER_DAY
+        labels = lambda values: [str(np.datetime64(int(day), "D")) for day in values]
+    elif key == "month":
+        raw = created.astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64)
+        labels = lambda values: [str(np.datetime64(int(month), "M")) for month in values]
+    elif key == "hour":
+        raw = (created // MS_PER_HOUR) % 24
+        labels = lambda values: [int(hour) for hour in values]
+    elif key == "status":
+        raw = columns.status[mask]
+        labels = lambda values: [STATUS_CODES[code] for code in values]
+    elif key == "order_type":
+        raw = columns.order_type[mask]
+        labels = lambda values: [ORDER_TYPES[code] for code in values]
+    elif key == "payment_status":
+        raw = columns.payment_status[mask]
+        labels = lambda values: [PAYMENT_STATUSES[code] for code in values]
+    else:
+        raise KeyError(key)
+    values, inverse = np.unique(raw, return_inverse=True)
+    return inverse, labels(values)
+
+
+def totals_by(columns: OrderColumns, key: str, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict[Any, Totals]:
+    mask = columns.window(since, until)
+    if not mask.any():
+        return {}
+    inverse, labels = _group_keys(columns, key, mask)
+    groups = len(labels)
+    delivered = columns.status[mask] == DELIVERED_CODE
+
+    orders = np.bincount(inverse, minlength=groups)
+    delivered_orders = np.bincount(inverse, weights=delivered, minlength=groups)
+    revenue = np.bincount(inverse, weights=np.where(delivered, columns.total_cents[mask], 0), minlength=groups)
+    sold = np.bincount(inverse, weights=np.where(delivered, columns.quantity[mask], 0), minlength=groups)
+
+    return {
+        label: Totals(
+            orders=int(orders[i]),
+            delivered_orders=int(delivered_orders[i]),
+            revenue_cents=int(round(revenue[i])),
+            sold_meals=int(round(sold[i])),
+        )
+        for i, label in enumerate(labels)
+    }
+
+
+def meal_totals(columns: OrderColumns, since: Optional[datetime] = None, delivered_only: bool = True) -> Dict[str, MealTotals]:
+    order_mask = columns.window(since, None)
+    delivered = columns.status == DELIVERED_CODE
+    if delivered_only:
+        order_mask &= delivered
+    item_mask = order_mask[columns.item_order]
+    if not item_mask.any():
+        return {}
+
+    meals = columns.item_meal[item_mask]
+    item_delivered = delivered[columns.item_order[item_mask]]
+    groups = len(columns.meal_ids)
+    quantity = np.bincount(meals, weights=columns.item_quantity[item_mask], minlength=groups)
+    revenue = np.bincount(meals, weights=np.where(item_delivered, columns.item_cents[item_mask], 0), minlength=groups)
+
+    return {
+        columns.meal_ids[meal]: MealTotals(
+            meal_name=columns.meal_names[meal],
+            quantity=int(round(quantity[meal])),
+            revenue_cents=int(round(revenue[meal])),
+        )
+        for meal in np.unique(meals)
+    }
@@ -10,6 +10,7 @@ from . import models, schemas, crud
 
 # JWT token scheme
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -59,6 +60,17 @@ async def get_current_user(
         raise credentials_exception
     return user
 
+async def get_current_user_optional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> Optional[models.User]:
+    """Resolve the bearer token if one is sent; anonymous requests get None"""
+    if credentials is None:
+        return None
+    phone = verify_token(credentials.credentials)
+    if phone is None:
+        return None
+    return await crud.crud_user.get_by_phone(phone=phone)
+
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)) -> models.User:
     if not current_user.is_verified:
         raise HTTPException(status_code=400, detail="Inactive user")
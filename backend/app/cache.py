@@ -0,0 +1,153 @@
+"""
+Process-local caches for hot, rarely-changing documents
+"""
+from typing import Dict, Optional, Tuple
+from datetime import datetime
+import asyncio
+import time
+
+from pymongo import ReturnDocument
+
+from .config import settings as app_settings
+from . import models
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return opaque(etag) in {opaque(tag) for tag in if_none_match.split(",")}
+
+
+class CacheVersions:
+    """
+    Version counters per cache scope, persisted in the cache_versions
+    collection so every worker agrees on the ETag for a scope.
+    Reads are served from memory and refreshed at most every ttl_seconds.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._versions: Dict[str, Tuple[str, float]] = {}
+
+    @staticmethod
+    def _tag(doc: dict) -> str:
+        return f"{doc.get('token', '')}-{doc.get('version', 0)}"
+
+    async def get(self, scope: str) -> str:
+        """Return the current version tag for a scope"""
+        cached = self._versions.get(scope)
+        if cached and time.monotonic() - cached[1] < self.ttl_seconds:
+            return cached[0]
+
+        doc = await models.CacheVersion.get_motor_collection().find_one({"_id": scope})
+        if doc is None:
+            # First use of this scope: create the row so all workers share a token
+            return await self.bump(scope)
+        tag = self._tag(doc)
+        self._versions[scope] = (tag, time.monotonic())
+        return tag
+
+    async def bump(self, scope: str) -> str:
+        """Invalidate a scope after a write and return its new version tag"""
+        doc = await models.CacheVersion.get_motor_collection().find_one_and_update(
+            {"_id": scope},
+            {
+                "$inc": {"version": 1},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$setOnInsert": {"token": models.CacheVersion(_id=scope).token},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        tag = self._tag(doc)
+        self._versions[scope] = (tag, time.monotonic())
+        return tag
+
+    def invalidate(self):
+        """Force the next get() of every scope to re-read the database"""
+        self._versions.clear()
+
+
+cache_versions = CacheVersions(ttl_seconds=app_settings.cache_version_ttl_seconds)
+
+
+class SettingsCache:
+    """
+    Caches the RestaurantSettings singleton in memory.
+    Writes go through saved(), which replaces the cached object and bumps
+    the "settings" cache scope. Reads trust the cached copy while that
+    scope's version tag is unchanged; CacheVersions re-reads the tag at most
+    every cache_version_ttl_seconds, so writes by other worker processes
+    are seen within that interval without a query per read. The whole
+    document is also reloaded after ttl_seconds.
+    """
+
+    SCOPE = "settings"
+
+    def __init__(self, ttl_seconds: float, versions: CacheVersions):
+        self.ttl_seconds = ttl_seconds
+        self.versions = versions
+        self._settings: Optional[models.RestaurantSettings] = None
+        self._tag: Optional[str] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._settings is not None
+            and time.monotonic() - self._loaded_at < self.ttl_seconds
+        )
+
+    async def _is_current(self) -> bool:
+        return self._is_fresh() and await self.versions.get(self.SCOPE) == self._tag
+
+    async def get(self) -> models.RestaurantSettings:
+        """Return the cached settings, reloading (or creating defaults) when stale or changed elsewhere"""
+        if await self._is_current():
+            return self._settings
+
+        async with self._lock:
+            if await self._is_current():
+                return self._settings
+
+            # Tag first: a write landing during the load leaves us on the older tag, so the next check reloads
+            tag = await self.versions.get(self.SCOPE)
+            settings = await models.RestaurantSettings.find_one()
+            if not settings:
+                settings = models.RestaurantSettings()
+                await settings.insert()
+            self._store(settings, tag)
+            return settings
+
+    async def saved(self, settings: models.RestaurantSettings):
+        """Cache the object after a write and tell the other workers to reload"""
+        tag = await self.versions.bump(self.SCOPE)
+        cached = self._settings
+        if cached is not None and cached.id == settings.id and cached.version > settings.version:
+            settings = cached  # a later write finished first
+        self._store(settings, tag)
+
+    def _store(self, settings: models.RestaurantSettings, tag: str):
+        self._settings = settings
+        self._tag = tag
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next get() to reload from the database"""
+        self._settings = None
+
+    @staticmethod
+    def etag(settings: models.RestaurantSettings) -> str:
+        return f'"{settings.id}-{settings.version}"'
+
+
+settings_cache = SettingsCache(ttl_seconds=app_settings.restaurant_settings_ttl_seconds, versions=cache_versions)
+
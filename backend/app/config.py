@@ -1,3 +1,4 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from typing import Optional, List
 
@@ -36,6 +37,50 @@ class Settings(BaseSettings):
     upload_dir: str = "uploads"
     max_file_size: int = 5242880  # 5MB
     allowed_image_types: List[str] = ["image/jpeg", "image/png", "image/webp"]
+    image_worker_threads: int = 2  # background pool for thumbnails/responsive sizes
+    
+    # Image store (content-addressed; "local" or "s3")
+    image_store_backend: str = "local"
+    image_store_url_prefix: str = "/api/v1/media"  # local backend is served by the media router
+    s3_bucket: Optional[str] = None
+    s3_endpoint_url: Optional[str] = None  # set for MinIO/R2 and other S3-compatible stores
+    s3_region: Optional[str] = None
+    s3_access_key_id: Optional[str] = None
+    s3_secret_access_key: Optional[str] = None
+    s3_public_base_url: Optional[str] = None  # CDN or bucket URL the stored keys are served from
+    
+    # Live board
+    # Follow a MongoDB change stream (replica set) instead of in-process events; without
+    # it each worker's board only sees its own writes, so run a single worker
+    live_board_change_stream: bool = False
+    live_board_client_queue_size: int = 100  # messages buffered per admin screen; a client that falls further behind is disconnected
+    
+    # Order archive
+    order_archive_after_days: int = 90  # terminal orders older than this move to orders_archive
+    order_archive_batch_size: int = 500
+    
+    # Analytics
+    analytics_engine: str = "mongo"  # "mongo" (aggregation pipelines) or "numpy" (columnar snapshot)
+    analytics_snapshot_ttl_seconds: int = 60  # how long the numpy engine reuses a loaded snapshot
+    
+    # Meal sales counters / trending
+    trending_window_days: int = 7
+    trending_limit: int = 8
+    trending_refresh_seconds: int = 300  # how often the storefront "trending now" list is recomputed
+    trending_sets_popular: bool = False  # keep Meal.is_popular in sync with the trending list
+    
+    # Demand forecast (needs numpy)
+    forecast_history_weeks: int = 8  # weeks of hourly rollups / meal counters the forecast learns from
+    forecast_smoothing: float = 0.5  # weight of the most recent week; 1.0 is plain seasonal-naive
+    forecast_refresh_seconds: int = 3600
+    forecast_meal_limit: int = 20  # meals listed, by forecast quantity for the next week
+    
+    # Exports
+    export_dir: str = "exports"  # Parquet / Arrow files written by export_orders.py and the admin endpoint
+    export_batch_size: int = 2000  # documents per cursor batch and per written row group
+    
+    # Reviews
+    review_vote_dedup: bool = True  # one helpful/unhelpful vote per signed-in user per review
     
     # App
     app_name: str = "Moringa Food Ordering System"
@@ -43,6 +88,19 @@ class Settings(BaseSettings):
     debug: bool = True
     environment: str = "development"
     
+    # Caching
+    restaurant_settings_ttl_seconds: int = 30  # full reload interval; changes by other workers are seen via the "settings" cache version
+    cache_version_ttl_seconds: int = 5  # how often workers re-read catalog/review/settings versions
+    catalog_cache_max_age: int = 60  # Cache-Control max-age for public catalog responses
+    catalog_cache_stale_while_revalidate: int = 300
+    
+    # Compression
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # bytes; smaller responses are sent as-is
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5  # used when the brotli package is installed
+    compression_cache_entries: int = 128  # precompressed catalog payloads kept in memory
+    
     # Email
     smtp_server: Optional[str] = None
     smtp_port: Optional[int] = None
@@ -62,6 +120,15 @@ class Settings(BaseSettings):
     mpesa_passkey: Optional[str] = None
     mpesa_callback_url: Optional[str] = None
     mpesa_environment: str = "sandbox"  # sandbox or production
+    mpesa_pending_ttl_hours: int = 24  # unanswered STK pushes are dropped after this
+    mpesa_settled_retention_days: Optional[int] = 90  # None (empty in .env) keeps settled rows forever
+    mpesa_wait_recheck_seconds: float = 5.0  # long-poll DB re-check interval
+
+    @field_validator("mpesa_settled_retention_days", mode="before")
+    @classmethod
+    def _empty_is_none(cls, value):
+        # MPESA_SETTLED_RETENTION_DAYS= (empty) means keep forever
+        return None if isinstance(value, str) and not value.strip() else value
 
     class Config:
         env_file = ".env"
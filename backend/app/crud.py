@@ -1,11 +1,12 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from beanie import PydanticObjectId
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne, ReplaceOne
 import asyncio
 from datetime import datetime, timedelta
 import uuid
 
-from . import models, schemas
+from . import models, money, order_archive, order_rollups, order_state, order_totals, schemas
+from .cache import settings_cache, cache_versions
 from .security import get_password_hash, verify_password
 
 class CRUDCategory:
@@ -44,7 +45,9 @@ class CRUDCategory:
             id=str(uuid.uuid4()),
             **obj_in.dict()
         )
-        return await db_obj.insert()
+        db_obj = await db_obj.insert()
+        await cache_versions.bump("catalog")
+        return db_obj
     
     async def update(self, *, db_obj: models.Category, obj_in: schemas.CategoryUpdate) -> models.Category:
         """Update category"""
@@ -54,13 +57,16 @@ class CRUDCategory:
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         
-        return await db_obj.save()
+        db_obj = await db_obj.save()
+        await cache_versions.bump("catalog")
+        return db_obj
     
     async def delete(self, *, id: str) -> bool:
         """Delete category"""
         category = await models.Category.get(id)
         if category:
             await category.delete()
+            await cache_versions.bump("catalog")
             return True
         return False
 
@@ -113,7 +119,9 @@ class CRUDMeal:
             id=str(uuid.uuid4()),
             **create_data
         )
-        return await db_obj.insert()
+        db_obj = await db_obj.insert()
+        await cache_versions.bump("catalog")
+        return db_obj
     
     async def update(self, *, db_obj: models.Meal, obj_in: schemas.MealUpdate) -> models.Meal:
         """Update meal"""
@@ -129,13 +137,16 @@ class CRUDMeal:
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         
-        return await db_obj.save()
+        db_obj = await db_obj.save()
+        await cache_versions.bump("catalog")
+        return db_obj
     
     async def delete(self, *, id: str) -> bool:
         """Delete meal"""
         meal = await models.Meal.get(id)
         if meal:
             await meal.delete()
+            await cache_versions.bump("catalog")
             return True
         return False
 
@@ -157,7 +168,9 @@ class CRUDIngredient:
             id=str(uuid.uuid4()),
             **obj_in.dict()
         )
-        return await db_obj.insert()
+        db_obj = await db_obj.insert()
+        await cache_versions.bump("catalog")
+        return db_obj
     
     async def update(self, *, db_obj: models.Ingredient, obj_in: schemas.IngredientUpdate) -> models.Ingredient:
         """Update ingredient"""
@@ -167,13 +180,16 @@ class CRUDIngredient:
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         
-        return await db_obj.save()
+        db_obj = await db_obj.save()
+        await cache_versions.bump("catalog")
+        return db_obj
     
     async def delete(self, *, id: str) -> bool:
         """Delete ingredient"""
         ingredient = await models.Ingredient.get(id)
         if ingredient:
             await ingredient.delete()
+            await cache_versions.bump("catalog")
             return True
         return False
 
@@ -237,29 +253,30 @@ class CRUDUser:
 
 class CRUDOrder:
     async def get(self, id: str) -> Optional[models.Order]:
-        """Get order by ID"""
-        return await models.Order.get(id)
+        """Get order by ID (archived orders included)"""
+        return await order_archive.get_order(id)
     
     async def get_multi(self, *, skip: int = 0, limit: int = 100) -> List[models.Order]:
-        """Get multiple orders"""
-        return await models.Order.find().sort(-models.Order.created_at).skip(skip).limit(limit).to_list()
+        """Get multiple orders, newest first, across hot and archived orders"""
+        return await order_archive.find_recent({}, skip=skip, limit=limit)
     
     async def get_by_user(self, *, user_id: str, skip: int = 0, limit: int = 100) -> List[models.Order]:
-        """Get orders by user"""
-        return await models.Order.find(
-            models.Order.user_id == user_id
-        ).sort(-models.Order.created_at).skip(skip).limit(limit).to_list()
+        """Get orders by user, newest first, across hot and archived orders"""
+        return await order_archive.find_recent({"user_id": user_id}, skip=skip, limit=limit)
     
     async def get_by_status(self, *, status: models.OrderStatus, skip: int = 0, limit: int = 100) -> List[models.Order]:
-        """Get orders by status"""
-        return await models.Order.find(
-            models.Order.status == status
-        ).sort(-models.Order.created_at).skip(skip).limit(limit).to_list()
+        """Get orders by status; only terminal statuses can be archived"""
+        return await order_archive.find_recent(
+            {"status": status},
+            skip=skip,
+            limit=limit,
+            include_archive=status in order_archive.TERMINAL_STATUSES
+        )
     
     async def create(self, *, obj_in: schemas.OrderCreate, user_id: str) -> models.Order:
         """Create new order"""
-        # Generate order number
-        order_count = await models.Order.count() + 1
+        # Generate order number (archived orders still hold their numbers)
+        order_count = await order_archive.count_orders() + 1
         order_number = f"ORD-{datetime.utcnow().strftime('%Y%m%d')}-{order_count:06d}"
 
         # Fetch user for customer details
@@ -269,7 +286,7 @@ class CRUDOrder:
 
         # Build order items with full details required by models.Order
         order_items: list[models.OrderItem] = []
-        items_subtotal = 0.0
+        items_subtotal_cents = 0
         for item in obj_in.items:
             meal = await models.Meal.get(item.meal_id)
             if not meal:
@@ -277,7 +294,7 @@ class CRUDOrder:
                 continue
             # Build selected ingredients details
             selected_ings: list[models.OrderItemIngredient] = []
-            extras_total = 0.0
+            extras_cents = 0
             for sel in item.selected_ingredients:
                 ing = await models.Ingredient.get(sel.ingredient_id)
                 if not ing:
@@ -290,18 +307,21 @@ class CRUDOrder:
                     ing_name_str = ing.name.get('en') or ''
                 else:
                     ing_name_str = str(ing.name or '')
+                ing_price_cents = money.to_cents(ing.price)
                 selected_ings.append(
                     models.OrderItemIngredient(
                         ingredient_id=ing.id,
                         name=ing_name_str,
                         price=ing.price,
+                        price_cents=ing_price_cents,
                     )
                 )
-                extras_total += float(ing.price or 0)
+                extras_cents += ing_price_cents
 
-            unit_price = float(meal.price) + extras_total
-            line_subtotal = unit_price * item.quantity
-            items_subtotal += line_subtotal
+            # Priced in integer cents; floats are derived for the API
+            meal_price_cents = money.to_cents(meal.price)
+            line_subtotal_cents = (meal_price_cents + extras_cents) * item.quantity
+            items_subtotal_cents += line_subtotal_cents
 
             # Use meal_name from request if provided, otherwise extract English from meal.name
             meal_name_str = item.meal_name if item.meal_name else (
@@ -334,21 +354,24 @@ class CRUDOrder:
                 models.OrderItem(
                     meal_id=meal.id,
                     meal_name=meal_name_str,
-                    meal_price=float(meal.price),
+                    meal_price=money.from_cents(meal_price_cents),
+                    meal_price_cents=meal_price_cents,
                     quantity=item.quantity,
                     selected_ingredients=selected_ings,
                     removed_ingredients=removed_ids,
                     removed_ingredients_names=removed_names,
                     special_instructions=item.special_instructions,
-                    subtotal=line_subtotal,
+                    subtotal=money.from_cents(line_subtotal_cents),
+                    subtotal_cents=line_subtotal_cents,
                 )
             )
 
-        # Calculate totals
-        subtotal = items_subtotal
-        tax_amount = subtotal * 0.08  # 8% tax (could be moved to settings)
-        delivery_fee = 5.0 if obj_in.order_type == models.OrderType.DELIVERY else 0.0
-        total_amount = subtotal + tax_amount + delivery_fee
+        # Calculate totals from the cached restaurant settings
+        restaurant = await settings_cache.get()
+        subtotal_cents = items_subtotal_cents
+        tax_cents = money.percent_of(subtotal_cents, restaurant.tax_rate)
+        delivery_fee_cents = money.to_cents(restaurant.delivery_fee) if obj_in.order_type == models.OrderType.DELIVERY else 0
+        total_cents = subtotal_cents + tax_cents + delivery_fee_cents
 
         # Create initial status history
         initial_history = models.OrderStatusHistory(
@@ -367,11 +390,16 @@ class CRUDOrder:
             payment_method=models.PaymentMethod(obj_in.payment_method),
             payment_status=models.PaymentStatus.PENDING,
             items=order_items,
-            subtotal=subtotal,
-            tax_amount=tax_amount,
-            delivery_fee=delivery_fee,
+            subtotal=money.from_cents(subtotal_cents),
+            tax_amount=money.from_cents(tax_cents),
+            delivery_fee=money.from_cents(delivery_fee_cents),
             discount_amount=0.0,
-            total_amount=total_amount,
+            total_amount=money.from_cents(total_cents),
+            subtotal_cents=subtotal_cents,
+            tax_amount_cents=tax_cents,
+            delivery_fee_cents=delivery_fee_cents,
+            discount_amount_cents=0,
+            total_amount_cents=total_cents,
             customer_name=customer_name,
             customer_phone=obj_in.phone_number,
             customer_email=customer_email,
@@ -380,79 +408,151 @@ class CRUDOrder:
             order_number=order_number,
             status_history=[initial_history],
         )
-        return await db_obj.insert()
+        db_obj = await db_obj.insert()
+        await order_rollups.record_created([db_obj])
+        return db_obj
     
-    async def update(self, *, db_obj: models.Order, obj_in: schemas.OrderUpdate, changed_by: str = "admin") -> models.Order:
-        """Update order"""
+    async def update(self, *, db_obj: models.Order, obj_in: schemas.OrderUpdate, changed_by: str = "admin") -> Optional[models.Order]:
+        """
+        Update order with one atomic partial write. Status changes go through
+        the order state machine, guarded by the status db_obj was read with;
+        returns None if another writer moved the order in the meantime.
+        Raises order_state.InvalidTransition for disallowed moves.
+        """
         update_data = obj_in.dict(exclude_unset=True)
-        update_data["updated_at"] = datetime.utcnow()
+        new_status = update_data.pop("status", None)
         
-        # Track status changes in history
-        if "status" in update_data and update_data["status"] != db_obj.status:
-            new_status = update_data["status"]
-            status_change = models.OrderStatusHistory(
-                status=new_status,
-                changed_at=datetime.utcnow(),
-                changed_by=changed_by,
-                notes=f"Status changed from {db_obj.status} to {new_status}"
-            )
-            
-            # Append to history
-            if not db_obj.status_history:
-                db_obj.status_history = []
-            db_obj.status_history.append(status_change)
-            
-            # Update status timestamps
-            if new_status == models.OrderStatus.CONFIRMED:
-                update_data["confirmed_at"] = datetime.utcnow()
-            elif new_status == models.OrderStatus.DELIVERED:
-                update_data["completed_at"] = datetime.utcnow()
-        
-        for field, value in update_data.items():
-            setattr(db_obj, field, value)
+        if new_status is not None and new_status != db_obj.status:
+            try:
+                event = await order_state.transition(
+                    db_obj.id,
+                    new_status,
+                    expected=db_obj.status,
+                    changed_by=changed_by,
+                    set_fields=update_data
+                )
+            except order_state.TransitionConflict:
+                return None
+            return event.order if event else None
         
-        return await db_obj.save()
+        update_data["updated_at"] = datetime.utcnow()
+        doc = await models.Order.get_motor_collection().find_one_and_update(
+            {"_id": db_obj.id}, {"$set": update_data}, return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            return None
+        return models.Order.model_validate(doc)
     
     async def get_stats(self):
         """Get order statistics"""
         today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
         
         # Total counts
-        total_orders = await models.Order.count()
+        overall = await order_totals.grand_total()
         total_customers = await models.User.find(models.User.role == models.UserRole.CUSTOMER).count()
         total_meals = await models.Meal.find(models.Meal.is_active == True).count()
         
-        # Revenue calculations
-        delivered_orders = models.Order.find(models.Order.status == models.OrderStatus.DELIVERED)
-        total_revenue = 0
-        async for order in delivered_orders:
-            total_revenue += order.total_amount
-        
-        # Today's stats
-        today_orders = await models.Order.find(
-            models.Order.created_at >= today
-        ).count()
-        
-        today_delivered = models.Order.find({
-            "created_at": {"$gte": today},
-            "status": models.OrderStatus.DELIVERED
-        })
-        today_revenue = 0
-        async for order in today_delivered:
-            today_revenue += order.total_amount
+        # Today's stats (revenue from delivered orders, summed in cents)
+        today_totals = await order_totals.grand_total(since=today)
         
         return {
-            "total_orders": total_orders,
-            "total_revenue": total_revenue,
+            "total_orders": overall.orders,
+            "total_revenue": overall.revenue,
             "total_customers": total_customers,
             "total_meals": total_meals,
-            "today_orders": today_orders,
-            "today_revenue": today_revenue
+            "today_orders": today_totals.orders,
+            "today_revenue": today_totals.revenue
         }
 
+class CRUDMealRatingStats:
+    @staticmethod
+    def build_inc(*, added: Optional[int] = None, removed: Optional[int] = None) -> dict:
+        """$inc document for adding and/or removing one approved rating"""
+        inc: dict = {}
+        for rating, sign in ((added, 1), (removed, -1)):
+            if rating is None:
+                continue
+            for field, value in (("rating_sum", rating), ("rating_count", 1), (f"histogram.{rating}", 1)):
+                inc[field] = inc.get(field, 0) + sign * value
+        return {field: value for field, value in inc.items() if value != 0}
+    
+    async def get(self, meal_id: str) -> Optional[models.MealRatingStats]:
+        """Get rating aggregates for a meal"""
+        return await models.MealRatingStats.get(meal_id)
+    
+    async def get_many(self, meal_ids: List[str]) -> Dict[str, models.MealRatingStats]:
+        """Get rating aggregates for many meals in one query"""
+        stats = await models.MealRatingStats.find({"_id": {"$in": meal_ids}}).to_list()
+        return {s.id: s for s in stats}
+    
+    async def apply(self, meal_id: str, *, added: Optional[int] = None, removed: Optional[int] = None):
+        """Atomically add and/or remove one approved rating for a meal"""
+        await self.apply_many({meal_id: self.build_inc(added=added, removed=removed)})
+    
+    async def apply_many(self, incs: Dict[str, dict]):
+        """Apply per-meal $inc documents in one bulk write"""
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": meal_id}, {"$inc": inc, "$set": {"updated_at": now}}, upsert=True)
+            for meal_id, inc in incs.items()
+            if inc
+        ]
+        if not operations:
+            return
+        await models.MealRatingStats.get_motor_collection().bulk_write(operations, ordered=False)
+        await cache_versions.bump("reviews")
+    
+    async def recompute(self, meal_ids: Optional[List[str]] = None) -> int:
+        """Rebuild aggregates from approved reviews (all meals, or only meal_ids)"""
+        match: dict = {"status": models.ReviewStatus.APPROVED}
+        if meal_ids is not None:
+            match["meal_id"] = {"$in": meal_ids}
+        
+        group: dict = {
+            "_id": "$meal_id",
+            "rating_sum": {"$sum": "$rating"},
+            "rating_count": {"$sum": 1},
+        }
+        for rating in range(1, 6):
+            group[f"r{rating}"] = {"$sum": {"$cond": [{"$eq": ["$rating", rating]}, 1, 0]}}
+        
+        rows = await models.Review.get_motor_collection().aggregate([
+            {"$match": match},
+            {"$group": group},
+        ]).to_list(length=None)
+        
+        now = datetime.utcnow()
+        operations = [
+            ReplaceOne(
+                {"_id": row["_id"]},
+                {
+                    "rating_sum": row["rating_sum"],
+                    "rating_count": row["rating_count"],
+                    "histogram": {str(rating): row[f"r{rating}"] for rating in range(1, 6)},
+                    "updated_at": now,
+                },
+                upsert=True,
+            )
+            for row in rows
+        ]
+        
+        collection = models.MealRatingStats.get_motor_collection()
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+        
+        # Meals that no longer have approved reviews
+        stale = {"_id": {"$nin": [row["_id"] for row in rows]}}
+        if meal_ids is not None:
+            stale["_id"]["$in"] = meal_ids
+        await collection.delete_many(stale)
+        
+        await cache_versions.bump("reviews")
+        return len(rows)
+
 # Create CRUD instances
 crud_category = CRUDCategory()
 crud_meal = CRUDMeal()
 crud_ingredient = CRUDIngredient()
 crud_user = CRUDUser()
-crud_order = CRUDOrder()
\ No newline at end of file
+crud_order = CRUDOrder()
+crud_meal_rating_stats = CRUDMealRatingStats()
\ No newline at end of file
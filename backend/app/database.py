@@ -10,6 +10,31 @@ class Database:
 
 database = Database()
 
+def document_models() -> list:
+    """Every Beanie document the app uses (imported lazily, like the app's startup)"""
+    from .models import User, Category, Meal, Ingredient, Order, ArchivedOrder, OrderCodeBook, ExportWatermark, Coupon, Review, Notification, RestaurantSettings, MPesaTransaction, CacheVersion, MealRatingStats, MealSalesDaily, OrderHourly, ReviewVote
+    
+    return [
+        User,
+        Category,
+        Meal,
+        Ingredient,
+        Order,
+        ArchivedOrder,
+        OrderCodeBook,
+        ExportWatermark,
+        Coupon,
+        Review,
+        Notification,
+        RestaurantSettings,
+        MPesaTransaction,
+        CacheVersion,
+        MealRatingStats,
+        MealSalesDaily,
+        OrderHourly,
+        ReviewVote
+    ]
+
 async def get_database() -> AsyncIOMotorClient:
     return database.client
 
@@ -23,9 +48,6 @@ async def connect_to_mongo():
         await database.client.admin.command('ping')
         print(f"✅ Connected to MongoDB at {settings.mongodb_url}")
         
-        # Initialize Beanie with the models
-        from .models import User, Category, Meal, Ingredient, Order, Coupon, Review, Notification, RestaurantSettings
-        
         # Drop old non-sparse email index if it exists
         try:
             users_collection = database.database.users
@@ -39,20 +61,8 @@ async def connect_to_mongo():
             # Index might not exist, that's fine
             pass
         
-        await init_beanie(
-            database=database.database,
-            document_models=[
-                User,
-                Category, 
-                Meal,
-                Ingredient,
-                Order,
-                Coupon,
-                Review,
-                Notification,
-                RestaurantSettings
-            ]
-        )
+        # Initialize Beanie with the models
+        await init_beanie(database=database.database, document_models=document_models())
         print("✅ Beanie initialized successfully")
         
     except Exception as e:
@@ -0,0 +1,83 @@
+"""
+Streaming NDJSON / CSV responses for export endpoints.
+
+Rows arrive in batches (one batch per cursor round-trip) and each batch is
+encoded and sent as one chunk, so a response of millions of rows holds a
+single batch in memory at a time.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Sequence
+
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+
+MEDIA_TYPES: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+async def cursor_batches(cursor, batch_size: int) -> AsyncIterator[List[dict]]:
+    """Group documents from an async cursor into lists of batch_size"""
+    batch: List[dict] = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_fields(fields: str, allowed: Sequence[str], default: Sequence[str]) -> List[str]:
+    """Comma-separated field list from a query parameter; raises ValueError for unknown fields"""
+    if not fields:
+        return list(default)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown export fields: {', '.join(unknown)}")
+    return selected
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str, separators=(",", ":"))
+    return value
+
+
+def ndjson_chunk(rows: List[dict], fields: Sequence[str]) -> bytes:
+    return b"".join(to_json({field: row.get(field) for field in fields}, fallback=str) + b"\n" for row in rows)
+
+
+def csv_chunk(rows: List[dict], fields: Sequence[str], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    writer.writerows([_csv_cell(row.get(field)) for field in fields] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def encode_batches(batches: AsyncIterator[List[dict]], fields: Sequence[str], fmt: str) -> AsyncIterator[bytes]:
+    if fmt == "csv":
+        yield csv_chunk([], fields, header=True)
+    async for rows in batches:
+        if rows:
+            yield csv_chunk(rows, fields) if fmt == "csv" else ndjson_chunk(rows, fields)
+
+
+def export_response(batches: AsyncIterator[List[dict]], fields: Sequence[str], fmt: str, name: str) -> StreamingResponse:
+    filename = f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}.{fmt}"
+    return StreamingResponse(
+        encode_batches(batches, fields, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
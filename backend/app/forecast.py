@@ -0,0 +1,234 @@
+"""
+Demand forecast: orders and revenue by hour, quantities by meal.
+
+Built on the rollups rather than the orders: order_hourly for orders and
+delivered revenue per hour, meal_sales_daily for delivered quantities per
+meal and day. Each hour of the week (168 slots) - and, for meals, each day
+of the week - is forecast as the exponentially weighted average of that
+slot over the last FORECAST_HISTORY_WEEKS weeks, newest weighted
+FORECAST_SMOOTHING. A smoothing of 1.0 is plain seasonal-naive ("same hour
+last week"). Weeks before the first recorded order are ignored.
+
+DemandForecast recomputes the forecast in the background every
+FORECAST_REFRESH_SECONDS and keeps it in memory; the analytics endpoint
+only reads it. Hours and days are reported in the restaurant's timezone;
+meal counters are per UTC day, so meal forecasts are by UTC weekday.
+Needs numpy (optional).
+"""
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import asyncio
+import logging
+
+from . import models, order_rollups
+from .config import settings
+from .money import from_cents
+
+try:  # numpy is optional; without it there is no forecast
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 7 * 24
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def available() -> bool:
+    return np is not None
+
+
+def seasonal_smoothing(weeks: "np.ndarray", alpha: float) -> "np.ndarray":
+    """Exponentially smooth each season slot across weeks.
+
+    `weeks` is (..., weeks, period), oldest week first; returns (..., period).
+    """
+    level = weeks[..., 0, :].astype(float)
+    for week in range(1, weeks.shape[-2]):
+        level = alpha * weeks[..., week, :] + (1 - alpha) * level
+    return level
+
+
+def recorded_weeks(weeks: "np.ndarray") -> int:
+    """Number of trailing weeks from the first one with any data (axis -2)"""
+    totals = weeks.reshape(-1, *weeks.shape[-2:]).sum(axis=(0, 2))
+    recorded = np.flatnonzero(totals)
+    return int(weeks.shape[-2] - recorded[0]) if recorded.size else 0
+
+
+def _profile(weeks: "np.ndarray", alpha: float) -> Tuple["np.ndarray", int]:
+    count = recorded_weeks(weeks)
+    if not count:
+        return np.zeros(weeks.shape[:-2] + weeks.shape[-1:]), 0
+    return seasonal_smoothing(weeks[..., -count:, :], alpha), count
+
+
+async def load_hourly(start: datetime, end: datetime) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Orders and delivered revenue cents per UTC hour in [start, end), zero-filled"""
+    size = int((end - start) / HOUR)
+    orders = np.zeros(size)
+    revenue_cents = np.zeros(size)
+    cursor = models.OrderHourly.get_motor_collection().find(
+        {"hour": {"$gte": start, "$lt": end}}, {"hour": 1, "orders": 1, "revenue_cents": 1}
+    )
+    async for doc in cursor:
+        index = int((doc["hour"] - start) / HOUR)
+        orders[index] = doc.get("orders", 0)
+        revenue_cents[index] = doc.get("revenue_cents", 0)
+    return orders, revenue_cents
+
+
+async def load_meal_days(start: datetime, end: datetime) -> Tuple[List[str], Dict[str, str], "np.ndarray"]:
+    """Meal ids, names and a (meals, days) matrix of delivered quantities per UTC day in [start, end)"""
+    days = (end - start).days
+    quantities: Dict[str, "np.ndarray"] = {}
+    names: Dict[str, str] = {}
+    cursor = models.MealSalesDaily.get_motor_collection().find(
+        {"day": {"$gte": start, "$lt": end}}, {"meal_id": 1, "meal_name": 1, "day": 1, "quantity": 1}
+    ).sort("day", 1)
+    async for doc in cursor:
+        row = quantities.get(doc["meal_id"])
+        if row is None:
+            row = quantities[doc["meal_id"]] = np.zeros(days)
+        row[(doc["day"] - start).days] = doc.get("quantity", 0)
+        names[doc["meal_id"]] = doc.get("meal_name", "")
+    meal_ids = list(quantities)
+    matrix = np.array([quantities[meal_id] for meal_id in meal_ids]) if meal_ids else np.zeros((0, days))
+    return meal_ids, names, matrix
+
+
+def _utc(day: date, zone: ZoneInfo) -> datetime:
+    """Local midnight of `day` as naive UTC"""
+    return datetime.combine(day, time(), tzinfo=zone).astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+
+async def compute(now: Optional[datetime] = None, timezone: Optional[str] = None) -> Dict[str, Any]:
+    """Forecast tomorrow and the following six days (restaurant-local) from the rollups"""
+    now = now or datetime.utcnow()
+    timezone = timezone or await order_rollups.restaurant_timezone()
+    zone = ZoneInfo(timezone)
+    alpha = settings.forecast_smoothing
+    history = settings.forecast_history_weeks
+
+    # Hourly profile over whole weeks ending at the current (incomplete, excluded) hour
+    end = order_rollups.hour_of(now)
+    start = end - history * HOURS_PER_WEEK * HOUR
+    orders, revenue_cents = await load_hourly(start, end)
+    (order_profile, revenue_profile), weeks = _profile(
+        np.stack([orders, revenue_cents]).reshape(2, history, HOURS_PER_WEEK), alpha
+    )
+
+    tomorrow = now.replace(tzinfo=dt_timezone.utc).astimezone(zone).date() + DAY
+    dates = [tomorrow + offset * DAY for offset in range(7)]
+    days: Dict[date, Dict[str, Any]] = {
+        day: {"date": day.isoformat(), "orders": 0.0, "revenue_cents": 0.0, "hours": []} for day in dates
+    }
+    # UTC hours covering the local week; zones with a non-whole-hour offset are placed by hour start
+    hour = order_rollups.hour_of(_utc(dates[0], zone))
+    while hour < _utc(dates[-1] + DAY, zone):
+        local = hour.replace(tzinfo=dt_timezone.utc).astimezone(zone)
+        slot = int((hour - start) / HOUR) % HOURS_PER_WEEK
+        day = days.get(local.date())
+        if day is not None:
+            day["orders"] += order_profile[slot]
+            day["revenue_cents"] += revenue_profile[slot]
+            day["hours"].append({
+                "hour": local.hour,
+                "starts_at": local.isoformat(),
+                "orders": round(float(order_profile[slot]), 1),
+                "revenue": from_cents(round(revenue_profile[slot])),
+            })
+        hour += HOUR
+    forecast_days = [
+        {
+            "date": day["date"],
+            "orders": round(float(day["orders"]), 1),
+            "revenue": from_cents(round(day["revenue_cents"])),
+            "hours": day["hours"],
+        }
+        for day in days.values()
+    ]
+
+    # Meals by UTC weekday over whole weeks ending yesterday
+    day_end = datetime.combine(now.date(), time())
+    day_start = day_end - history * 7 * DAY
+    meal_ids, names, quantities = await load_meal_days(day_start, day_end)
+    meal_profile, meal_weeks = _profile(quantities.reshape(len(meal_ids), history, 7), alpha)
+    slots = [(datetime.combine(day, time()) - day_start).days % 7 for day in dates]
+    week_quantities = meal_profile[:, slots]
+    meals = [
+        {
+            "meal_id": meal_id,
+            "meal_name": names[meal_id],
+            "next_day": round(float(week_quantities[index, 0]), 1),
+            "next_week": round(float(week_quantities[index].sum()), 1),
+            "days": [
+                {"date": day.isoformat(), "quantity": round(float(quantity), 1)}
+                for day, quantity in zip(dates, week_quantities[index])
+            ],
+        }
+        for index, meal_id in enumerate(meal_ids)
+    ]
+    meals.sort(key=lambda meal: (-meal["next_week"], meal["meal_id"]))
+
+    return {
+        "timezone": timezone,
+        "computed_at": now,
+        "smoothing": alpha,
+        "weeks_of_history": weeks,
+        "meal_weeks_of_history": meal_weeks,
+        "next_day": forecast_days[0],
+        "next_week": {
+            "start": forecast_days[0]["date"],
+            "end": forecast_days[-1]["date"],
+            "orders": round(float(sum(day["orders"] for day in days.values())), 1),
+            "revenue": from_cents(round(sum(day["revenue_cents"] for day in days.values()))),
+            "days": forecast_days,
+        },
+        "meals": meals[:settings.forecast_meal_limit],
+    }
+
+
+class DemandForecast:
+    """Latest forecast in memory, recomputed every forecast_refresh_seconds"""
+
+    def __init__(self):
+        self.result: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Dict[str, Any]:
+        if self.result is None:
+            async with self._lock:
+                if self.result is None:
+                    await self.refresh()
+        return self.result
+
+    async def refresh(self) -> Dict[str, Any]:
+        self.result = await compute()
+        return self.result
+
+    def start(self):
+        if self._task is None and available():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Demand forecast refresh failed: {e}")
+            await asyncio.sleep(settings.forecast_refresh_seconds)
+
+
+demand_forecast = DemandForecast()
@@ -0,0 +1,90 @@
+"""
+Image upload helpers: streamed, size-capped writes and background resizing
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Tuple
+import asyncio
+import hashlib
+import io
+import logging
+
+import aiofiles
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Variant name -> max width in pixels (never upscaled)
+VARIANT_WIDTHS: Dict[str, int] = {
+    "thumb": 160,
+    "480w": 480,
+    "960w": 960,
+}
+
+# Pillow releases the GIL while decoding, resizing and encoding, so a small
+# thread pool keeps this work off the event loop without extra processes.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.image_worker_threads,
+    thread_name_prefix="image-variants",
+)
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size cap"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File exceeds the maximum size of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+async def stream_upload(file: UploadFile, destination: Path, max_bytes: int) -> Tuple[int, str]:
+    """
+    Copy an upload to disk in chunks, aborting once max_bytes is exceeded.
+    Returns (bytes written, SHA-256 hex digest); partial files are removed on error.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        async with aiofiles.open(destination, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    return written, digest.hexdigest()
+
+
+def render_variants(data: bytes) -> Dict[str, bytes]:
+    """Encode a WebP image per VARIANT_WIDTHS entry (blocking)"""
+    variants: Dict[str, bytes] = {}
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        for name, width in VARIANT_WIDTHS.items():
+            resized = image.copy()
+            resized.thumbnail((width, width * 4), Image.LANCZOS)
+            out = io.BytesIO()
+            resized.save(out, "WEBP", quality=80, method=4)
+            variants[name] = out.getvalue()
+    return variants
+
+
+async def generate_variants(data: bytes) -> Dict[str, bytes]:
+    """Render variants on the worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, render_variants, data)
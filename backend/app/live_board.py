@@ -0,0 +1,234 @@
+"""
+Live board: an in-memory materialized view of active (non-terminal) orders.
+
+Loaded once at startup and then kept current from order events (order
+creation, state machine transitions and order_state.update_fields()), or
+from a MongoDB change stream when LIVE_BOARD_CHANGE_STREAM is enabled.
+Events are in-process, so each worker's board only sees that worker's
+writes: run a single worker, or enable the change stream (needs a replica
+set). Order writes that bypass order_state are not seen without the
+change stream either. Admin screens get a
+snapshot and then sequence-numbered deltas, so a refresh costs no
+database reads.
+
+Each admin socket has its own bounded queue drained by its own task, so
+order writes never wait on a slow screen; a client whose queue fills up
+is disconnected and gets a fresh snapshot when it reconnects.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+import asyncio
+import logging
+
+from fastapi import WebSocket
+
+from . import models, order_state
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = [
+    models.OrderStatus.PENDING,
+    models.OrderStatus.CONFIRMED,
+    models.OrderStatus.PREPARING,
+    models.OrderStatus.READY,
+    models.OrderStatus.OUT_FOR_DELIVERY,
+]
+
+# Order fields shown on a board card
+CARD_FIELDS = {
+    "id", "order_number", "status", "order_type", "payment_method", "payment_status",
+    "customer_name", "customer_phone", "delivery_address", "special_instructions",
+    "total_amount", "estimated_delivery_time", "created_at", "confirmed_at", "updated_at",
+}
+CARD_ITEM_FIELDS = {"meal_id", "meal_name", "quantity", "removed_ingredients_names", "special_instructions"}
+
+
+# Close code for clients dropped for falling behind ("try again later")
+CLOSE_TOO_SLOW = 1013
+
+
+@dataclass
+class Subscriber:
+    websocket: WebSocket
+    queue: asyncio.Queue
+    task: Optional[asyncio.Task] = None
+
+
+class LiveBoard:
+    def __init__(self):
+        self._orders: Dict[str, dict] = {}
+        self._subscribers: Dict[WebSocket, Subscriber] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self._watch_task: Optional[asyncio.Task] = None
+        self.seq = 0
+        self.loaded_at: Optional[datetime] = None
+
+    @property
+    def uses_change_stream(self) -> bool:
+        return self._watch_task is not None
+
+    @staticmethod
+    def card(order: models.Order) -> dict:
+        """JSON-ready board card for an order"""
+        card = order.model_dump(mode="json", include=CARD_FIELDS)
+        card["id"] = order.id
+        card["items"] = [
+            {
+                **item.model_dump(mode="json", include=CARD_ITEM_FIELDS),
+                "extras": [ingredient.name for ingredient in item.selected_ingredients],
+            }
+            for item in order.items
+        ]
+        return card
+
+    async def load(self):
+        """(Re)build the board from the database; only active orders are read"""
+        orders = await models.Order.find({"status": {"$in": ACTIVE_STATUSES}}).to_list()
+        self._orders = {order.id: self.card(order) for order in orders}
+        self.loaded_at = datetime.utcnow()
+        self.seq += 1
+        logger.info(f"Live board loaded with {len(self._orders)} active orders")
+        self._broadcast(self.snapshot())
+
+    def snapshot(self) -> dict:
+        return {
+            "type": "board_snapshot",
+            "seq": self.seq,
+            "orders": sorted(self._orders.values(), key=lambda card: card["created_at"]),
+        }
+
+    async def apply(self, orders: List[models.Order]):
+        """Upsert active orders and drop terminal ones, then push one delta"""
+        upserted, removed = [], []
+        for order in orders:
+            if order.status in ACTIVE_STATUSES:
+                card = self.card(order)
+                self._orders[order.id] = card
+                upserted.append(card)
+            elif self._orders.pop(order.id, None) is not None:
+                removed.append(order.id)
+
+        if not upserted and not removed:
+            return
+        self.seq += 1
+        self._broadcast({"type": "board_delta", "seq": self.seq, "upserted": upserted, "removed": removed})
+
+    async def remove(self, order_ids: List[str]):
+        removed = [order_id for order_id in order_ids if self._orders.pop(order_id, None) is not None]
+        if removed:
+            self.seq += 1
+            self._broadcast({"type": "board_delta", "seq": self.seq, "upserted": [], "removed": removed})
+
+    # --- event sources ---
+
+    async def order_created(self, order: models.Order):
+        if not self.uses_change_stream:
+            await self.apply([order])
+
+    async def order_updated(self, order: models.Order):
+        """For non-status edits (status changes arrive as transitions)"""
+        if not self.uses_change_stream:
+            await self.apply([order])
+
+    async def on_transitions(self, events: List[order_state.TransitionEvent]):
+        if not self.uses_change_stream:
+            await self.apply([event.order for event in events])
+
+    async def on_updates(self, orders: List[models.Order]):
+        if not self.uses_change_stream:
+            await self.apply(orders)
+
+    def start_change_stream(self):
+        """Follow the orders collection instead of in-process events (requires a replica set)"""
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        for websocket in list(self._subscribers):
+            self.unsubscribe(websocket)
+
+    async def _watch(self):
+        collection = models.Order.get_motor_collection()
+        while True:
+            try:
+                async with collection.watch(full_document="updateLookup") as stream:
+                    # Anything missed while (re)connecting is picked up by a reload
+                    await self.load()
+                    async for change in stream:
+                        if change["operationType"] == "delete":
+                            await self.remove([change["documentKey"]["_id"]])
+                        elif change.get("fullDocument"):
+                            await self.apply([models.Order.model_validate(change["fullDocument"])])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live board change stream failed, retrying: {e}")
+                await asyncio.sleep(5)
+
+    # --- subscribers ---
+
+    async def subscribe(self, websocket: WebSocket):
+        """Start sending to an accepted socket, beginning with a snapshot"""
+        subscriber = Subscriber(websocket, asyncio.Queue(maxsize=settings.live_board_client_queue_size))
+        self._subscribers[websocket] = subscriber
+        subscriber.task = asyncio.create_task(self._send_loop(subscriber))
+        self.send(websocket, self.snapshot())
+
+    def unsubscribe(self, websocket: WebSocket):
+        subscriber = self._subscribers.pop(websocket, None)
+        if subscriber is not None and subscriber.task is not None:
+            subscriber.task.cancel()
+
+    def send(self, websocket: WebSocket, message: dict):
+        """Queue a message for one subscriber, disconnecting it if its queue is full"""
+        subscriber = self._subscribers.get(websocket)
+        if subscriber is None:
+            return
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Live board client fell behind; disconnecting it")
+            self.unsubscribe(websocket)
+            task = asyncio.create_task(self._close(websocket))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    def _broadcast(self, message: dict):
+        # Queued in seq order without awaiting, so no order write waits on a client
+        for websocket in list(self._subscribers):
+            self.send(websocket, message)
+
+    async def _send_loop(self, subscriber: Subscriber):
+        while True:
+            message = await subscriber.queue.get()
+            try:
+                await subscriber.websocket.send_json(message)
+            except Exception as e:
+                logger.error(f"Error sending board update: {e}")
+                self._subscribers.pop(subscriber.websocket, None)
+                return
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=CLOSE_TOO_SLOW)
+        except Exception as e:
+            logger.error(f"Error closing slow board client: {e}")
+
+
+live_board = LiveBoard()
+order_state.on_transitions(live_board.on_transitions)
+order_state.on_updates(live_board.on_updates)
+
+
+async def start_live_board():
+    """Called from the application lifespan"""
+    if settings.live_board_change_stream:
+        live_board.start_change_stream()
+    else:
+        await live_board.load()
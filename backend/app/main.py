@@ -4,19 +4,30 @@ from contextlib import asynccontextmanager
 
 from .config import settings
 from .database import connect_to_mongo, close_mongo_connection, get_database
+from .middleware import ConditionalGetMiddleware, CompressionMiddleware
+from .live_board import live_board, start_live_board
+from .meal_sales import trending_meals
+from .forecast import demand_forecast
 
 # Import routers
 from .routers import categories, meals, ingredients, auth, orders, users, websocket, analytics, reviews, payments
 from .routers import settings as settings_router
 from .routers import mpesa
+from .routers import media
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     await connect_to_mongo()
+    await start_live_board()
+    trending_meals.start()
+    demand_forecast.start()
     yield
     # Shutdown
+    await demand_forecast.stop()
+    await trending_meals.stop()
+    await live_board.stop()
     await close_mongo_connection()
 
 # Create FastAPI app
@@ -31,14 +42,39 @@ app = FastAPI(
     redirect_slashes=False
 )
 
-# Configure CORS
+# Conditional GET + Cache-Control for public, read-mostly endpoints
+app.add_middleware(
+    ConditionalGetMiddleware,
+    rules={
+        r"^/api/v1/meals/trending$": "trending",
+        r"^/api/v1/meals(/[^/]+)?$": "catalog",
+        r"^/api/v1/categories(/[^/]+(/meals)?)?$": "catalog",
+        r"^/api/v1/ingredients(/[^/]+)?$": "catalog",
+        r"^/api/v1/reviews/meal/[^/]+/stats$": "reviews",
+        r"^/api/v1/reviews/stats$": "reviews",
+    },
+    max_age=settings.catalog_cache_max_age,
+    stale_while_revalidate=settings.catalog_cache_stale_while_revalidate,
+)
+
+# Compress large JSON payloads (outside the conditional GET layer so it sees ETags)
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        cache_entries=settings.compression_cache_entries,
+    )
+
+# Configure CORS (added last so it also wraps 304 responses)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    expose_headers=["*", "X-Next-Cursor"],  # "*" is not honoured for credentialed requests
 )
 
 # Include routers
@@ -54,6 +90,7 @@ app.include_router(websocket.router, prefix="/api/v1", tags=["WebSocket"])
 app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
 app.include_router(payments.router, prefix="/api/v1", tags=["Payments"])
 app.include_router(mpesa.router, prefix="/api/v1", tags=["M-Pesa"])
+app.include_router(media.router, prefix="/api/v1", tags=["Media"])
 
 @app.get("/")
 async def read_root():
@@ -0,0 +1,243 @@
+"""
+Per-meal, per-day sales counters.
+
+When orders become DELIVERED, their items are added with $inc to
+meal_sales_daily (one document per meal and UTC day of the order's
+created_at). Popular-meal rankings for any window are then a $group over
+at most meals x days small documents instead of a scan of every order.
+rebuild() recomputes the counters from the orders (hot and archived) when
+they drift, e.g. after a listener failure.
+
+TrendingMeals keeps the storefront's "trending now" list (top sellers of
+the last TRENDING_WINDOW_DAYS) in memory, refreshed in the background, and
+can keep Meal.is_popular in sync with it.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from pymongo import DESCENDING, ReplaceOne, UpdateOne
+
+from . import models, order_archive, order_codec, order_state
+from .cache import cache_versions
+from .config import settings
+from .money import cents_expr, to_cents
+from .order_totals import MealTotals
+
+logger = logging.getLogger(__name__)
+
+DELIVERED = models.OrderStatus.DELIVERED
+DAY_FORMAT = "%Y-%m-%d"
+
+
+def day_of(at: datetime) -> datetime:
+    return at.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def counter_id(meal_id: str, day: datetime) -> str:
+    return f"{meal_id}:{day:{DAY_FORMAT}}"
+
+
+def sales_incs(orders: List[models.Order]) -> Dict[Tuple[str, datetime], dict]:
+    """Per (meal_id, day) quantity/revenue increments and the latest meal name"""
+    incs: Dict[Tuple[str, datetime], dict] = {}
+    for order in orders:
+        day = day_of(order.created_at)
+        for item in order.items:
+            entry = incs.setdefault((item.meal_id, day), {"quantity": 0, "revenue_cents": 0})
+            entry["quantity"] += item.quantity
+            entry["revenue_cents"] += item.subtotal_cents if item.subtotal_cents is not None else to_cents(item.subtotal)
+            entry["meal_name"] = item.meal_name
+    return incs
+
+
+async def record(orders: List[models.Order]):
+    """Add newly delivered orders to the counters in one bulk write"""
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"_id": counter_id(meal_id, day)},
+            {
+                "$inc": {"quantity": entry["quantity"], "revenue_cents": entry["revenue_cents"]},
+                "$set": {"meal_name": entry["meal_name"], "updated_at": now},
+                "$setOnInsert": {"meal_id": meal_id, "day": day},
+            },
+            upsert=True,
+        )
+        for (meal_id, day), entry in sales_incs(orders).items()
+    ]
+    if operations:
+        await models.MealSalesDaily.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+@order_state.on_transitions
+async def record_deliveries(events: List[order_state.TransitionEvent]):
+    """Transition listener: count each order once, when it becomes DELIVERED"""
+    await record([event.order for event in events if event.to_status == DELIVERED])
+
+
+def _window_match(since: Optional[datetime]) -> dict:
+    return {"day": {"$gte": day_of(since)}} if since is not None else {}
+
+
+async def top_meals(since: Optional[datetime] = None, limit: Optional[int] = None) -> List[Tuple[str, MealTotals]]:
+    """Meals by delivered quantity since the start of `since`'s day, best first"""
+    pipeline = [
+        {"$match": _window_match(since)},
+        {"$sort": {"day": 1}},
+        {"$group": {
+            "_id": "$meal_id",
+            "meal_name": {"$last": "$meal_name"},
+            "quantity": {"$sum": "$quantity"},
+            "revenue_cents": {"$sum": "$revenue_cents"},
+        }},
+        {"$sort": {"quantity": DESCENDING, "_id": 1}},
+    ]
+    if limit:
+        pipeline.append({"$limit": limit})
+    rows = await models.MealSalesDaily.get_motor_collection().aggregate(pipeline).to_list(length=None)
+    return [
+        (row["_id"], MealTotals(meal_name=row["meal_name"], quantity=row["quantity"], revenue_cents=row["revenue_cents"]))
+        for row in rows
+    ]
+
+
+def _rebuild_pipeline(match: dict, *, archived: bool = False) -> list:
+    items = "it" if archived else "items"
+    group = {
+        "_id": {
+            "meal": f"${items}.m" if archived else f"${items}.meal_id",
+            "day": {"$dateToString": {"format": DAY_FORMAT, "date": "$created_at"}},
+        },
+        "quantity": {"$sum": f"${items}.q" if archived else f"${items}.quantity"},
+        "revenue_cents": {"$sum": f"${items}.s" if archived else cents_expr("items.subtotal")},
+    }
+    if not archived:
+        group["meal_name"] = {"$last": f"${items}.meal_name"}
+    return [{"$match": match}, {"$unwind": f"${items}"}, {"$group": group}]
+
+
+async def rebuild(since: Optional[datetime] = None) -> int:
+    """Recompute the counters from delivered orders (all days, or from `since`'s day on)"""
+    start = day_of(since) if since is not None else None
+    match: dict = {"status": DELIVERED}
+    if start is not None:
+        match["created_at"] = {"$gte": start}
+
+    counters: Dict[Tuple[str, str], dict] = {}
+    async for row in models.Order.get_motor_collection().aggregate(_rebuild_pipeline(match)):
+        counters[(row["_id"]["meal"], row["_id"]["day"])] = row
+
+    if order_archive.archive_may_contain(start):
+        rows = await models.ArchivedOrder.get_motor_collection().aggregate(
+            _rebuild_pipeline(match, archived=True)
+        ).to_list(length=None)
+        books = await order_codec.codebooks()
+        if any(row["_id"]["meal"] >= len(books.meals.entries) for row in rows):
+            books = await order_codec.codebooks(refresh=True)
+        for row in rows:
+            meal_id, meal_name = books.meals.entry(row["_id"]["meal"])
+            entry = counters.setdefault(
+                (meal_id, row["_id"]["day"]), {"meal_name": meal_name, "quantity": 0, "revenue_cents": 0}
+            )
+            entry["quantity"] += row["quantity"]
+            entry["revenue_cents"] += row["revenue_cents"]
+
+    now = datetime.utcnow()
+    ids = []
+    operations = []
+    for (meal_id, day_key), row in counters.items():
+        day = datetime.strptime(day_key, DAY_FORMAT)
+        ids.append(counter_id(meal_id, day))
+        operations.append(ReplaceOne(
+            {"_id": ids[-1]},
+            {
+                "meal_id": meal_id,
+                "meal_name": row["meal_name"],
+                "day": day,
+                "quantity": row["quantity"],
+                "revenue_cents": int(round(row["revenue_cents"])),
+                "updated_at": now,
+            },
+            upsert=True,
+        ))
+
+    collection = models.MealSalesDaily.get_motor_collection()
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    # Counters for meal-days that no longer have delivered orders
+    stale: dict = {"_id": {"$nin": ids}}
+    if start is not None:
+        stale["day"] = {"$gte": start}
+    await collection.delete_many(stale)
+    return len(operations)
+
+
+class TrendingMeals:
+    """In-memory "trending now" list, recomputed every trending_refresh_seconds"""
+
+    def __init__(self):
+        self.meals: List[models.Meal] = []
+        self.refreshed_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> List[models.Meal]:
+        if self.refreshed_at is None:
+            async with self._lock:
+                if self.refreshed_at is None:
+                    await self.refresh()
+        return self.meals
+
+    async def refresh(self) -> List[models.Meal]:
+        since = datetime.utcnow() - timedelta(days=settings.trending_window_days)
+        # Over-fetch so unavailable meals can be skipped without a second query
+        ranked = [meal_id for meal_id, _ in await top_meals(since, limit=settings.trending_limit * 2)]
+        found = {
+            meal.id: meal
+            for meal in await models.Meal.find(
+                {"_id": {"$in": ranked}, "is_active": True, "is_available": True}
+            ).to_list()
+        }
+        meals = [found[meal_id] for meal_id in ranked if meal_id in found][:settings.trending_limit]
+
+        changed = [meal.model_dump() for meal in meals] != [meal.model_dump() for meal in self.meals]
+        self.meals = meals
+        self.refreshed_at = datetime.utcnow()
+        if changed:
+            await cache_versions.bump("trending")
+            if settings.trending_sets_popular:
+                await self.sync_popular_flags()
+        return meals
+
+    async def sync_popular_flags(self):
+        """Mark the trending meals popular and clear the flag everywhere else"""
+        ids = [meal.id for meal in self.meals]
+        collection = models.Meal.get_motor_collection()
+        marked = await collection.update_many({"_id": {"$in": ids}, "is_popular": {"$ne": True}}, {"$set": {"is_popular": True}})
+        cleared = await collection.update_many({"_id": {"$nin": ids}, "is_popular": True}, {"$set": {"is_popular": False}})
+        if marked.modified_count or cleared.modified_count:
+            await cache_versions.bump("catalog")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Trending meals refresh failed: {e}")
+            await asyncio.sleep(settings.trending_refresh_seconds)
+
+
+trending_meals = TrendingMeals()
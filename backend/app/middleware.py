@@ -0,0 +1,201 @@
+"""
+HTTP middleware for caching and compressing API responses
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import gzip
+import re
+import logging
+
+try:  # Brotli is optional; gzip is used when it is not installed
+    import brotli  # type: ignore
+except Exception:
+    brotli = None
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .cache import cache_versions, etag_matches
+
+logger = logging.getLogger(__name__)
+
+
+class ConditionalGetMiddleware:
+    """
+    Adds ETag and Cache-Control headers to public GET endpoints and answers
+    If-None-Match with 304 Not Modified without touching the route handler.
+
+    `rules` maps a path regex to a cache scope. The ETag is the scope's
+    version tag (see cache.CacheVersions), so any write that bumps the scope
+    invalidates every cached response under it.
+    """
+
+    def __init__(self, app: ASGIApp, rules: Dict[str, str], max_age: int = 60, stale_while_revalidate: int = 300):
+        self.app = app
+        self.rules = [(re.compile(pattern), scope) for pattern, scope in rules.items()]
+        self.cache_control = f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+
+    def _scope_for(self, path: str):
+        for pattern, cache_scope in self.rules:
+            if pattern.match(path):
+                return cache_scope
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        cache_scope = self._scope_for(scope["path"])
+        if cache_scope is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            etag = f'"{cache_scope}-{await cache_versions.get(cache_scope)}"'
+        except Exception as e:
+            # Never fail a public read because the version lookup failed
+            logger.error(f"Cache version lookup failed for {cache_scope}: {e}")
+            await self.app(scope, receive, send)
+            return
+
+        if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [
+                    (b"etag", etag.encode()),
+                    (b"cache-control", self.cache_control.encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cache_headers(message: Message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                headers["ETag"] = etag
+                headers["Cache-Control"] = self.cache_control
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON/text responses with Brotli or gzip (per Accept-Encoding)
+    once they reach minimum_size bytes.
+
+    Responses that carry an ETag (see ConditionalGetMiddleware) are kept in
+    an LRU of compressed bodies keyed by path, query, ETag and encoding, so
+    a catalog payload is compressed once per catalog version rather than
+    once per request. Streaming responses (no Content-Length) pass through.
+    """
+
+    COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        cache_entries: int = 128,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple[str, bytes, str, str], bytes]" = OrderedDict()
+
+    def _choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for part in accept_encoding.lower().split(","):
+            coding, _, params = part.strip().partition(";")
+            if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(coding.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _cached_compress(self, key: Optional[Tuple[str, bytes, str, str]], body: bytes, encoding: str) -> bytes:
+        if key is None or self.cache_entries <= 0:
+            return self.compress(body, encoding)
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self._cache.move_to_end(key)
+            return compressed
+        compressed = self.compress(body, encoding)
+        self._cache[key] = compressed
+        if len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        return compressed
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                content_length = headers.get("content-length")
+                if (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not content_type.startswith(self.COMPRESSIBLE_TYPES)
+                    or content_length is None
+                    or int(content_length) < self.minimum_size
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers = MutableHeaders(scope=start_message)
+            etag = headers.get("etag")
+            cache_key = (scope["path"], scope.get("query_string", b""), etag, encoding) if etag else None
+            compressed = self._cached_compress(cache_key, body, encoding)
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if etag and not etag.startswith("W/"):
+                # A compressed body is a different representation: downgrade to a weak validator
+                headers["ETag"] = f"W/{etag}"
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,11 +1,13 @@
 from beanie import Document, Indexed, Link, BackLink
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator
 from typing import Optional, List, Union
 from datetime import datetime
 from enum import Enum as PyEnum
 from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
 import uuid
 
+from bson import ObjectId
+
 # Enums
 class UserRole(str, PyEnum):
     CUSTOMER = "CUSTOMER"
@@ -147,6 +149,7 @@ class OrderItemIngredient(BaseModel):
     ingredient_id: str
     name: str
     price: float
+    price_cents: Optional[int] = None  # exact twin of price (see app.money)
 
 class OrderStatusHistory(BaseModel):
     """Track order status changes"""
@@ -160,6 +163,7 @@ class OrderItem(BaseModel):
     meal_id: str
     meal_name: str
     meal_price: float
+    meal_price_cents: Optional[int] = None
     quantity: int = 1
     selected_ingredients: List[OrderItemIngredient] = []
     # Track removed default ingredients
@@ -167,6 +171,7 @@ class OrderItem(BaseModel):
     removed_ingredients_names: List[str] = []  # English names
     special_instructions: Optional[str] = None
     subtotal: float
+    subtotal_cents: Optional[int] = None
 
 class Order(Document):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), alias="_id")
@@ -183,6 +188,12 @@ class Order(Document):
     delivery_fee: float = 0.0
     discount_amount: float = 0.0
     total_amount: float
+    # Exact integer cents for the amounts above; analytics sum these
+    subtotal_cents: Optional[int] = None
+    tax_amount_cents: Optional[int] = None
+    delivery_fee_cents: Optional[int] = None
+    discount_amount_cents: Optional[int] = None
+    total_amount_cents: Optional[int] = None
     
     # Customer information
     customer_name: str
@@ -224,6 +235,22 @@ class Order(Document):
             IndexModel([("payment_status", ASCENDING)]),
             IndexModel([("created_at", DESCENDING)]),
             IndexModel([("order_number", ASCENDING)], unique=True, sparse=True),
+            IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)]),  # archival scan
+            IndexModel([("updated_at", ASCENDING)]),  # incremental exports
+        ]
+
+class ArchivedOrder(Order):
+    """
+    Terminal order moved out of the hot collection by the archival job.
+    Stored packed by app.order_codec; read through app.order_archive.
+    """
+    archived_at: Optional[datetime] = None
+
+    class Settings:
+        name = "orders_archive"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel([("created_at", DESCENDING)]),
         ]
 
 class Coupon(Document):
@@ -262,6 +289,10 @@ class ReviewStatus(str, PyEnum):
     REJECTED = "REJECTED"
     FLAGGED = "FLAGGED"
 
+class ReviewPhoto(BaseModel):
+    url: str
+    variants: dict = {}  # {"thumb": url, "480w": url, "960w": url}; filled in the background
+
 class Review(Document):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), alias="_id")
     user_id: str
@@ -274,6 +305,7 @@ class Review(Document):
     rating: int = Field(..., ge=1, le=5)
     comment: Optional[str] = None
     photos: List[str] = []  # URLs to uploaded photos
+    photo_variants: List[ReviewPhoto] = []  # resized WebP URLs per photo
     
     # Moderation
     status: ReviewStatus = ReviewStatus.PENDING
@@ -305,6 +337,73 @@ class Review(Document):
             IndexModel([("is_verified", ASCENDING)]),
             IndexModel([("created_at", DESCENDING)]),
             IndexModel([("helpful_count", DESCENDING)]),
+            # Public meal listings per sort mode; _id breaks ties for keyset cursors
+            IndexModel([("meal_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("meal_id", ASCENDING), ("status", ASCENDING), ("helpful_count", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("meal_id", ASCENDING), ("status", ASCENDING), ("rating", DESCENDING), ("_id", DESCENDING)]),
+            # Moderation queue: oldest first per status
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        ]
+
+class ReviewVoteType(str, PyEnum):
+    HELPFUL = "helpful"
+    UNHELPFUL = "unhelpful"
+
+class ReviewVote(Document):
+    """One helpful/unhelpful vote per (review, user); backs vote dedup"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), alias="_id")
+    review_id: str
+    user_id: str
+    vote: ReviewVoteType
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = None
+
+    class Settings:
+        name = "review_votes"
+        indexes = [
+            IndexModel([("review_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        ]
+
+class MealRatingStats(Document):
+    """Approved-review rating aggregates per meal, maintained with $inc on review writes"""
+    id: str = Field(..., alias="_id")  # meal_id
+    rating_sum: int = 0
+    rating_count: int = 0
+    histogram: dict = Field(default_factory=lambda: {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0})
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "meal_rating_stats"
+
+class MealSalesDaily(Document):
+    """Delivered quantity and revenue per meal per UTC day (order created_at), maintained with $inc"""
+    id: str = Field(..., alias="_id")  # "<meal_id>:<YYYY-MM-DD>"
+    meal_id: str
+    meal_name: str = ""
+    day: datetime  # midnight UTC
+    quantity: int = 0
+    revenue_cents: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "meal_sales_daily"
+        indexes = [
+            IndexModel([("day", DESCENDING), ("meal_id", ASCENDING)]),
+        ]
+
+class OrderHourly(Document):
+    """Orders, delivered orders and delivered revenue per UTC hour of created_at, maintained with $inc"""
+    id: str = Field(..., alias="_id")  # "YYYY-MM-DDTHH" (UTC)
+    hour: datetime  # start of the hour, UTC
+    orders: int = 0
+    delivered_orders: int = 0
+    revenue_cents: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "order_hourly"
+        indexes = [
+            IndexModel([("hour", DESCENDING)]),
         ]
 
 class Notification(Document):
@@ -347,6 +446,7 @@ class RestaurantSettings(Document):
     # Business Hours
     opening_time: str = "09:00"
     closing_time: str = "22:00"
+    timezone: str = "UTC"  # IANA name, e.g. "Africa/Nairobi"; used by the hour/weekday analytics
     
     # Delivery Settings
     delivery_fee: float = 5.00
@@ -369,6 +469,7 @@ class RestaurantSettings(Document):
     # Other
     is_accepting_orders: bool = True
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    version: int = 1  # bumped on every write; drives the settings ETag
 
     # Theme (customizable site appearance)
     theme_primary: str = "#16a34a"  # green-600
@@ -380,4 +481,81 @@ class RestaurantSettings(Document):
     theme_radius: str = "0.5rem"
 
     class Settings:
-        name = "restaurant_settings"
\ No newline at end of file
+        name = "restaurant_settings"
+
+class MPesaTransactionStatus(str, PyEnum):
+    PENDING = "pending"
+    SUCCESS = "success"
+    FAILED = "failed"
+
+class MPesaTransaction(Document):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), alias="_id")
+    order_id: str
+    phone_number: Optional[str] = None
+    amount: float
+    
+    # STK Push request/response
+    merchant_request_id: Optional[str] = None
+    checkout_request_id: Optional[str] = None
+    response_code: Optional[str] = None
+    response_description: Optional[str] = None
+    customer_message: Optional[str] = None
+    
+    # Callback result
+    status: MPesaTransactionStatus = MPesaTransactionStatus.PENDING
+    result_code: Optional[int] = None
+    result_description: Optional[str] = None
+    mpesa_receipt_number: Optional[str] = None
+    transaction_date: Optional[Union[int, str]] = None
+    
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = None
+    # Rows are removed by the TTL index once this passes (None = keep forever)
+    expires_at: Optional[datetime] = None
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _legacy_object_id(cls, value):
+        # Rows written before this model have ObjectId _ids (see migrate_mpesa_transaction_ids.py)
+        return str(value) if isinstance(value, ObjectId) else value
+
+    class Settings:
+        name = "mpesa_transactions"
+        indexes = [
+            IndexModel(
+                [("checkout_request_id", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"checkout_request_id": {"$type": "string"}},
+            ),
+            IndexModel([("order_id", ASCENDING)]),
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+class OrderCodeBook(Document):
+    """Append-only dictionary ("meal" or "ingredient") used to pack archived orders"""
+    id: str = Field(..., alias="_id")  # kind
+    entries: List[List[str]] = []  # [id, name]; the code is the list position
+    size: int = 0
+
+    class Settings:
+        name = "order_codebooks"
+
+class ExportWatermark(Document):
+    """Upper bound of the last incremental export, per export name"""
+    id: str = Field(..., alias="_id")  # e.g. "orders.parquet"
+    watermark: datetime
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "export_watermarks"
+
+class CacheVersion(Document):
+    """Monotonic version per cache scope (e.g. "catalog"), bumped on writes"""
+    id: str = Field(..., alias="_id")  # scope name
+    version: int = 0
+    token: str = Field(default_factory=lambda: uuid.uuid4().hex[:8])  # changes if the row is recreated
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "cache_versions"
@@ -0,0 +1,65 @@
+"""
+Money as integer minor units (cents).
+
+Prices are still entered and returned as floats, but every amount an order
+stores also has an exact `*_cents` twin computed here, and totals are
+summed as integers (in Python and in aggregation pipelines). Floats are
+only produced at the edges with from_cents().
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional, Union
+
+Cents = int
+
+_ONE = Decimal(1)
+
+
+def to_cents(amount: Union[float, int, str, Decimal, None]) -> Cents:
+    """Round half up to whole cents (12.345 -> 1235); None counts as 0"""
+    if amount is None:
+        return 0
+    return int((Decimal(str(amount)) * 100).quantize(_ONE, rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: Optional[Cents]) -> float:
+    return (cents or 0) / 100
+
+
+def percent_of(cents: Cents, rate: float) -> Cents:
+    """cents * rate rounded half up, e.g. tax on a subtotal"""
+    return int((Decimal(cents) * Decimal(str(rate))).quantize(_ONE, rounding=ROUND_HALF_UP))
+
+
+def to_whole_units(cents: Cents) -> int:
+    """Whole currency units rounded half up, for gateways without decimals (M-Pesa)"""
+    return int((Decimal(cents) / 100).quantize(_ONE, rounding=ROUND_HALF_UP))
+
+
+def cents_expr(field: str) -> dict:
+    """
+    Aggregation expression for a stored amount in cents: the exact
+    `<field>_cents` value, or the float scaled by 100 for documents that
+    migrate_money_cents.py has not backfilled yet.
+    """
+    return {"$ifNull": [f"${field}_cents", {"$multiply": [{"$ifNull": [f"${field}", 0]}, 100]}]}
+
+
+def fill_order_cents(order) -> bool:
+    """Set missing *_cents fields on a models.Order from its floats; returns True if any were missing"""
+    changed = False
+    for field in ("subtotal", "tax_amount", "delivery_fee", "discount_amount", "total_amount"):
+        if getattr(order, f"{field}_cents") is None:
+            setattr(order, f"{field}_cents", to_cents(getattr(order, field)))
+            changed = True
+    for item in order.items:
+        if item.meal_price_cents is None:
+            item.meal_price_cents = to_cents(item.meal_price)
+            changed = True
+        if item.subtotal_cents is None:
+            item.subtotal_cents = to_cents(item.subtotal)
+            changed = True
+        for ingredient in item.selected_ingredients:
+            if ingredient.price_cents is None:
+                ingredient.price_cents = to_cents(ingredient.price)
+                changed = True
+    return changed
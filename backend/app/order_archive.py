@@ -0,0 +1,157 @@
+"""
+Hot/cold order storage.
+
+Orders that have been DELIVERED or CANCELLED for longer than
+ORDER_ARCHIVE_AFTER_DAYS are moved from `orders` to `orders_archive` by
+archive_orders() (run from archive_orders.py or the admin endpoint) and
+stored packed by order_codec. The hot collection then only holds recent
+and active orders, so its indexes stay in memory.
+
+Reads that may reach old orders go through the helpers below, which
+consult the archive only when the requested range can contain archived
+orders and merge the two collections (the hot copy wins if an order is
+briefly present in both while being moved).
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+import heapq
+import logging
+
+from pydantic import ValidationError
+from pymongo import DESCENDING, ReplaceOne
+
+from . import models, order_codec
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = [models.OrderStatus.DELIVERED, models.OrderStatus.CANCELLED]
+
+RECENT_SORT: Sequence[Tuple[str, int]] = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+def archive_cutoff(now: Optional[datetime] = None, older_than_days: Optional[int] = None) -> datetime:
+    days = settings.order_archive_after_days if older_than_days is None else older_than_days
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def archivable_filter(cutoff: datetime) -> dict:
+    """Terminal orders last touched before cutoff (created_at when updated_at was never set)"""
+    return {
+        "status": {"$in": TERMINAL_STATUSES},
+        "$or": [
+            {"updated_at": {"$lt": cutoff}},
+            {"updated_at": None, "created_at": {"$lt": cutoff}},
+        ],
+    }
+
+
+async def archive_orders(
+    *,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> int:
+    """
+    Move archivable orders to orders_archive in batches; returns how many
+    were moved. Each batch is upserted into the archive first and then
+    deleted from the hot collection with the same filter, so an order that
+    changed in between stays hot (and its archive copy is dropped). Orders
+    that no longer match the Order model are logged and left hot.
+    """
+    batch_size = batch_size or settings.order_archive_batch_size
+    query = archivable_filter(archive_cutoff(now, older_than_days))
+    hot = models.Order.get_motor_collection()
+    archive = models.ArchivedOrder.get_motor_collection()
+
+    moved = 0
+    invalid: List = []
+    while True:
+        batch_query = {**query, "_id": {"$nin": invalid}} if invalid else query
+        docs = await hot.find(batch_query).limit(batch_size).to_list(length=None)
+        if not docs:
+            break
+
+        orders = []
+        for doc in docs:
+            try:
+                orders.append(models.Order.model_validate(doc))
+            except ValidationError as e:
+                logger.error(f"Not archiving order {doc['_id']}: it does not match the Order model: {e}")
+                invalid.append(doc["_id"])
+        if orders:
+            ids = [order.id for order in orders]
+            packed = await order_codec.encode_many(orders, extra={"archived_at": datetime.utcnow()})
+            await archive.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in packed],
+                ordered=False
+            )
+            result = await hot.delete_many({**query, "_id": {"$in": ids}})
+            moved += result.deleted_count
+
+            if result.deleted_count < len(ids):
+                still_hot = await hot.find({"_id": {"$in": ids}}, {"_id": 1}).to_list(length=None)
+                await archive.delete_many({"_id": {"$in": [doc["_id"] for doc in still_hot]}})
+        if len(docs) < batch_size:
+            break
+
+    if moved:
+        logger.info(f"Archived {moved} orders")
+    return moved
+
+
+def archive_may_contain(since: Optional[datetime]) -> bool:
+    """Whether orders created at or after `since` can be in the archive"""
+    return since is None or since < archive_cutoff()
+
+
+def _merge(hot: List[models.Order], archived: List[models.Order]) -> List[models.Order]:
+    hot_ids = {order.id for order in hot}
+    return hot + [order for order in archived if order.id not in hot_ids]
+
+
+async def get_order(order_id: str) -> Optional[models.Order]:
+    """Order by ID from the hot collection, falling back to the archive"""
+    order = await models.Order.get(order_id)
+    if order is None:
+        doc = await models.ArchivedOrder.get_motor_collection().find_one({"_id": order_id})
+        if doc is not None:
+            order = (await order_codec.decode_many([doc]))[0]
+    return order
+
+
+async def find_orders(query: dict, since: Optional[datetime] = None) -> List[models.Order]:
+    """All orders matching query; `since` is the query's lower created_at bound, if any"""
+    orders = await models.Order.find(query).to_list()
+    if not archive_may_contain(since):
+        return orders
+    docs = await models.ArchivedOrder.get_motor_collection().find(query).to_list(length=None)
+    return _merge(orders, await order_codec.decode_many(docs))
+
+
+async def count_orders(query: Optional[dict] = None) -> int:
+    query = query or {}
+    archived = await models.ArchivedOrder.get_motor_collection().count_documents(query)
+    return await models.Order.find(query).count() + archived
+
+
+async def find_recent(query: dict, *, skip: int = 0, limit: int = 100, include_archive: bool = True) -> List[models.Order]:
+    """
+    Newest-first page over both collections: the top skip+limit of each
+    (served by their created_at indexes) are merged and sliced.
+    """
+    window = skip + limit
+    hot = await models.Order.find(query).sort(RECENT_SORT).limit(window).to_list()
+    if not include_archive:
+        return hot[skip:window]
+    docs = await models.ArchivedOrder.get_motor_collection().find(query).sort(list(RECENT_SORT)).limit(window).to_list(length=None)
+    archived = await order_codec.decode_many(docs)
+
+    hot_ids = {order.id for order in hot}
+    merged = heapq.merge(
+        hot,
+        [order for order in archived if order.id not in hot_ids],
+        key=lambda order: (order.created_at, order.id),
+        reverse=True
+    )
+    return list(merged)[skip:window]
@@ -0,0 +1,286 @@
+"""
+Compact encoding for archived orders.
+
+Cold orders are never edited, only scanned and occasionally shown, so the
+archive stores them packed:
+- meals and ingredients as small integer codes into append-only code
+  books ((id, name) pairs kept in the order_codebooks collection),
+- every amount as integer cents (total_amount_cents stays a top-level
+  field so revenue pipelines read both collections the same way),
+- status_history as [status, epoch_ms] pairs, with changed_by/notes only
+  kept when they differ from what the state machine would have written,
+- item ids as 16-byte UUIDs.
+
+Fields that archive reads filter or sort on (user_id, status, created_at,
+...) stay at the top level unchanged. decode() turns a packed document back
+into a models.Order; unpacked documents pass straight through.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+import uuid
+
+from pymongo.errors import DuplicateKeyError
+
+from . import models
+from .money import from_cents, to_cents
+
+OrderStatus = models.OrderStatus
+
+CODEC_VERSION = 2  # 1: all five amounts in "m", quantity omitted when 1
+
+# Status codes are positions in this tuple: append only
+STATUS_CODES: Tuple[str, ...] = (
+    "PENDING", "CONFIRMED", "PREPARING", "READY", "OUT_FOR_DELIVERY", "DELIVERED", "CANCELLED",
+)
+STATUS_BY_CODE = {code: OrderStatus(status) for code, status in enumerate(STATUS_CODES)}
+CODE_BY_STATUS = {status: code for code, status in STATUS_BY_CODE.items()}
+
+MONEY_FIELDS = ("subtotal", "tax_amount", "delivery_fee", "discount_amount", "total_amount")
+PACKED_FIELDS = {"items", "status_history", *MONEY_FIELDS, *(f"{field}_cents" for field in MONEY_FIELDS)}
+
+EPOCH = datetime(1970, 1, 1)
+SYSTEM = "system"
+
+
+class CodeBookConflict(Exception):
+    """Another process appended to a code book since it was loaded"""
+
+
+def to_millis(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+
+def from_millis(millis: int) -> datetime:
+    return EPOCH + timedelta(milliseconds=millis)
+
+
+def default_note(previous: Optional[OrderStatus], status: OrderStatus) -> str:
+    """Note written by order creation / the state machine"""
+    if previous is None:
+        return "Order created"
+    return f"Status changed from {previous.value} to {status.value}"
+
+
+def _cents(obj, field: str) -> int:
+    cents = getattr(obj, f"{field}_cents")
+    return cents if cents is not None else to_cents(getattr(obj, field))
+
+
+def _pack_uuid(value: str):
+    try:
+        parsed = uuid.UUID(value)
+    except ValueError:
+        return value
+    return parsed.bytes if str(parsed) == value else value
+
+
+def _unpack_uuid(value) -> str:
+    return str(uuid.UUID(bytes=bytes(value))) if isinstance(value, bytes) else value
+
+
+class CodeBook:
+    """(id, name) pairs numbered in insertion order"""
+
+    def __init__(self, kind: str, entries: Iterable[Iterable[str]] = ()):
+        self.kind = kind
+        self.entries: List[Tuple[str, str]] = [tuple(entry) for entry in entries]
+        self._codes: Dict[Tuple[str, str], int] = {entry: code for code, entry in enumerate(self.entries)}
+        self.saved = len(self.entries)
+
+    def code(self, id: str, name: str) -> int:
+        key = (id, name)
+        code = self._codes.get(key)
+        if code is None:
+            code = len(self.entries)
+            self.entries.append(key)
+            self._codes[key] = code
+        return code
+
+    def entry(self, code: int) -> Tuple[str, str]:
+        """Raises IndexError for codes added elsewhere after this book was loaded"""
+        return self.entries[code]
+
+    @property
+    def pending(self) -> List[Tuple[str, str]]:
+        return self.entries[self.saved:]
+
+
+class CodeBooks:
+    def __init__(self, meals: CodeBook, ingredients: CodeBook):
+        self.meals = meals
+        self.ingredients = ingredients
+
+    @classmethod
+    async def load(cls) -> "CodeBooks":
+        rows = {row.id: row.entries for row in await models.OrderCodeBook.find_all().to_list()}
+        return cls(CodeBook("meal", rows.get("meal", [])), CodeBook("ingredient", rows.get("ingredient", [])))
+
+    async def save(self):
+        """Persist new entries; each append is guarded by the size the book was loaded with"""
+        collection = models.OrderCodeBook.get_motor_collection()
+        for book in (self.meals, self.ingredients):
+            pending = book.pending
+            if not pending:
+                continue
+            try:
+                result = await collection.update_one(
+                    {"_id": book.kind, "size": book.saved},
+                    {
+                        "$push": {"entries": {"$each": [list(entry) for entry in pending]}},
+                        "$set": {"size": len(book.entries)},
+                    },
+                    upsert=True
+                )
+            except DuplicateKeyError as e:
+                raise CodeBookConflict(book.kind) from e
+            if result.matched_count == 0 and result.upserted_id is None:
+                raise CodeBookConflict(book.kind)
+            book.saved = len(book.entries)
+
+
+_books: Optional[CodeBooks] = None
+
+
+async def codebooks(refresh: bool = False) -> CodeBooks:
+    """Process-wide code books, loaded on first use"""
+    global _books
+    if _books is None or refresh:
+        _books = await CodeBooks.load()
+    return _books
+
+
+def _pack_item(item: models.OrderItem, books: CodeBooks) -> dict:
+    packed = {
+        "k": _pack_uuid(item.id),
+        "m": books.meals.code(item.meal_id, item.meal_name),
+        "q": item.quantity,
+        "p": _cents(item, "meal_price"),
+        "s": _cents(item, "subtotal"),
+    }
+    if item.selected_ingredients:
+        packed["x"] = [
+            [books.ingredients.code(ingredient.ingredient_id, ingredient.name), _cents(ingredient, "price")]
+            for ingredient in item.selected_ingredients
+        ]
+    if len(item.removed_ingredients) == len(item.removed_ingredients_names):
+        if item.removed_ingredients:
+            packed["r"] = [
+                books.ingredients.code(ingredient_id, name)
+                for ingredient_id, name in zip(item.removed_ingredients, item.removed_ingredients_names)
+            ]
+    else:
+        # Names were only recorded for some ids; keep both lists as they are
+        packed["ri"] = item.removed_ingredients
+        packed["rn"] = item.removed_ingredients_names
+    if item.special_instructions is not None:
+        packed["n"] = item.special_instructions
+    return packed
+
+
+def _unpack_item(packed: dict, books: CodeBooks) -> dict:
+    meal_id, meal_name = books.meals.entry(packed["m"])
+    selected = []
+    for code, cents in packed.get("x", []):
+        ingredient_id, name = books.ingredients.entry(code)
+        selected.append({"ingredient_id": ingredient_id, "name": name, "price": from_cents(cents), "price_cents": cents})
+    if "r" in packed:
+        removed = [books.ingredients.entry(code) for code in packed["r"]]
+        removed_ids, removed_names = [entry[0] for entry in removed], [entry[1] for entry in removed]
+    else:
+        removed_ids, removed_names = packed.get("ri", []), packed.get("rn", [])
+    return {
+        "id": _unpack_uuid(packed["k"]),
+        "meal_id": meal_id,
+        "meal_name": meal_name,
+        "meal_price": from_cents(packed["p"]),
+        "meal_price_cents": packed["p"],
+        "quantity": packed.get("q", 1),
+        "selected_ingredients": selected,
+        "removed_ingredients": removed_ids,
+        "removed_ingredients_names": removed_names,
+        "special_instructions": packed.get("n"),
+        "subtotal": from_cents(packed["s"]),
+        "subtotal_cents": packed["s"],
+    }
+
+
+def _pack_history(history: List[models.OrderStatusHistory]) -> List[list]:
+    packed = []
+    previous = None
+    for entry in history:
+        row = [CODE_BY_STATUS[entry.status], to_millis(entry.changed_at)]
+        if entry.notes != default_note(previous, entry.status):
+            row += [entry.changed_by, entry.notes]
+        elif entry.changed_by != SYSTEM:
+            row.append(entry.changed_by)
+        packed.append(row)
+        previous = entry.status
+    return packed
+
+
+def _unpack_history(packed: List[list]) -> List[dict]:
+    history = []
+    previous = None
+    for row in packed:
+        status = STATUS_BY_CODE[row[0]]
+        history.append({
+            "status": status,
+            "changed_at": from_millis(row[1]),
+            "changed_by": row[2] if len(row) > 2 else SYSTEM,
+            "notes": row[3] if len(row) > 3 else default_note(previous, status),
+        })
+        previous = status
+    return history
+
+
+def encode(order: models.Order, books: CodeBooks) -> dict:
+    """Packed document for an order; new code book entries stay pending until books.save()"""
+    doc = {"_id": order.id, "v": CODEC_VERSION}
+    doc.update(order.model_dump(exclude=PACKED_FIELDS | {"id", "revision_id"}, exclude_none=True))
+    doc["total_amount_cents"] = _cents(order, "total_amount")
+    doc["m"] = [_cents(order, field) for field in MONEY_FIELDS[:-1]]
+    doc["it"] = [_pack_item(item, books) for item in order.items]
+    doc["h"] = _pack_history(order.status_history)
+    return doc
+
+
+def is_packed(doc: dict) -> bool:
+    return "v" in doc
+
+
+def decode(doc: dict, books: CodeBooks, model: Type[models.Order] = models.Order) -> models.Order:
+    if not is_packed(doc):
+        return model.model_validate(doc)
+    data = {key: value for key, value in doc.items() if key not in ("v", "m", "it", "h")}
+    amounts = doc["m"] if doc["v"] == 1 else doc["m"] + [doc["total_amount_cents"]]
+    for field, cents in zip(MONEY_FIELDS, amounts):
+        data[field] = from_cents(cents)
+        data[f"{field}_cents"] = cents
+    data["items"] = [_unpack_item(item, books) for item in doc.get("it", [])]
+    data["status_history"] = _unpack_history(doc.get("h", []))
+    return model.model_validate(data)
+
+
+async def encode_many(orders: List[models.Order], extra: Optional[dict] = None) -> List[dict]:
+    """Pack orders and persist any new code book entries (reloading the books on a conflict)"""
+    for attempt in range(3):
+        books = await codebooks(refresh=attempt > 0)
+        packed = [{**encode(order, books), **(extra or {})} for order in orders]
+        try:
+            await books.save()
+            return packed
+        except CodeBookConflict:
+            continue
+    raise CodeBookConflict("code books kept changing while encoding")
+
+
+async def decode_many(docs: List[dict], model: Type[models.Order] = models.ArchivedOrder) -> List[models.Order]:
+    books = await codebooks()
+    try:
+        return [decode(doc, books, model) for doc in docs]
+    except IndexError:
+        # Codes appended by another process since the books were loaded
+        books = await codebooks(refresh=True)
+        return [decode(doc, books, model) for doc in docs]
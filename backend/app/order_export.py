@@ -0,0 +1,290 @@
+"""
+Order exports: Parquet / Arrow IPC files for offline analysis, and the
+projected rows behind the streaming GET /orders/export.
+
+Writes two files per run - one row per order and one row per order item
+(exploded, with the order's status and created_at repeated) - so BI tools
+query the files instead of the production database. Orders are read with
+a raw cursor in EXPORT_BATCH_SIZE batches and each batch is written as one
+row group, so memory stays flat however many orders are exported.
+
+Incremental exports select orders changed since the stored watermark
+(updated_at, or created_at for never-updated orders). An order that
+changes again shows up in a later file too; consumers keep the row with
+the latest updated_at per order id.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from . import models, order_archive, order_codec
+from .config import settings
+from .export_stream import cursor_batches
+from .money import to_cents
+
+try:  # pyarrow is only needed for exports
+    import pyarrow as pa  # type: ignore
+    import pyarrow.ipc  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except Exception:
+    pa = None
+    pq = None
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Fields GET /orders/export can stream; nested ones are JSON-encoded in CSV
+STREAM_FIELDS = (
+    "id", "order_number", "user_id", "status", "order_type", "payment_method", "payment_status",
+    "customer_name", "customer_phone", "customer_email", "delivery_address", "coupon_code",
+    *order_codec.MONEY_FIELDS, *(f"{field}_cents" for field in order_codec.MONEY_FIELDS),
+    "items", "status_history", "created_at", "updated_at", "confirmed_at", "completed_at",
+)
+DEFAULT_STREAM_FIELDS = (
+    "id", "order_number", "user_id", "status", "order_type", "payment_method", "payment_status",
+    "customer_name", "customer_phone", "total_amount", "total_amount_cents", "created_at", "updated_at",
+)
+
+# Orders still being written when an incremental export starts are left for the next run
+WATERMARK_LAG = timedelta(minutes=1)
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def order_schema():
+    timestamp = pa.timestamp("ms")
+    return pa.schema([
+        ("id", pa.string()),
+        ("order_number", pa.string()),
+        ("user_id", pa.string()),
+        ("status", pa.string()),
+        ("order_type", pa.string()),
+        ("payment_method", pa.string()),
+        ("payment_status", pa.string()),
+        ("coupon_code", pa.string()),
+        ("item_count", pa.int32()),
+        ("subtotal_cents", pa.int64()),
+        ("tax_amount_cents", pa.int64()),
+        ("delivery_fee_cents", pa.int64()),
+        ("discount_amount_cents", pa.int64()),
+        ("total_amount_cents", pa.int64()),
+        ("created_at", timestamp),
+        ("updated_at", timestamp),
+        ("completed_at", timestamp),
+        ("archived", pa.bool_()),
+    ])
+
+
+def item_schema():
+    return pa.schema([
+        ("order_id", pa.string()),
+        ("item_id", pa.string()),
+        ("meal_id", pa.string()),
+        ("meal_name", pa.string()),
+        ("quantity", pa.int32()),
+        ("meal_price_cents", pa.int64()),
+        ("subtotal_cents", pa.int64()),
+        ("extra_ingredients", pa.int32()),
+        ("removed_ingredients", pa.int32()),
+        ("status", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+    ])
+
+
+def _cents(obj, field: str) -> int:
+    cents = getattr(obj, f"{field}_cents")
+    return cents if cents is not None else to_cents(getattr(obj, field))
+
+
+def order_row(order: models.Order) -> dict:
+    return {
+        "id": order.id,
+        "order_number": order.order_number,
+        "user_id": order.user_id,
+        "status": order.status.value,
+        "order_type": order.order_type.value,
+        "payment_method": order.payment_method.value,
+        "payment_status": order.payment_status.value,
+        "coupon_code": order.coupon_code,
+        "item_count": sum(item.quantity for item in order.items),
+        **{f"{field}_cents": _cents(order, field) for field in order_codec.MONEY_FIELDS},
+        "created_at": order.created_at,
+        "updated_at": order.updated_at,
+        "completed_at": order.completed_at,
+        "archived": isinstance(order, models.ArchivedOrder),
+    }
+
+
+def item_rows(order: models.Order) -> List[dict]:
+    return [
+        {
+            "order_id": order.id,
+            "item_id": item.id,
+            "meal_id": item.meal_id,
+            "meal_name": item.meal_name,
+            "quantity": item.quantity,
+            "meal_price_cents": _cents(item, "meal_price"),
+            "subtotal_cents": _cents(item, "subtotal"),
+            "extra_ingredients": len(item.selected_ingredients),
+            "removed_ingredients": len(item.removed_ingredients),
+            "status": order.status.value,
+            "created_at": order.created_at,
+        }
+        for item in order.items
+    ]
+
+
+class _Writer:
+    """One output file; every write() appends a row group / record batch"""
+
+    def __init__(self, path: Path, schema, fmt: str):
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(str(path), schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(str(path), "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+        self._fmt = fmt
+
+    def write(self, rows: List[dict]):
+        if rows:
+            self._writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+            self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+        if self._fmt != "parquet":
+            self._sink.close()
+
+
+def export_query(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    changed_after: Optional[datetime] = None,
+    changed_until: Optional[datetime] = None
+) -> dict:
+    """created_at range plus, for incremental runs, the (changed_after, changed_until] window"""
+    clauses = []
+    created = {}
+    if since is not None:
+        created["$gte"] = since
+    if until is not None:
+        created["$lt"] = until
+    if created:
+        clauses.append({"created_at": created})
+    if changed_until is not None:
+        changed = {"$lte": changed_until}
+        if changed_after is not None:
+            changed["$gt"] = changed_after
+        clauses.append({"$or": [{"updated_at": changed}, {"updated_at": None, "created_at": changed}]})
+    return {"$and": clauses} if clauses else {}
+
+
+async def order_batches(query: dict, *, include_archive: bool, batch_size: int) -> AsyncIterator[List[models.Order]]:
+    """Orders matching `query` from the hot collection (then the archive), batch by batch"""
+    sources: List[Tuple[type, bool]] = [(models.Order, False)]
+    if include_archive:
+        sources.append((models.ArchivedOrder, True))
+    for model, archived in sources:
+        cursor = model.get_motor_collection().find(query, batch_size=batch_size)
+        async for batch in cursor_batches(cursor, batch_size):
+            yield await _decode(batch, archived)
+
+
+async def order_rows(
+    query: dict,
+    fields: List[str],
+    *,
+    include_archive: bool,
+    batch_size: int
+) -> AsyncIterator[List[dict]]:
+    """Projected order rows for streaming exports (archived orders are unpacked only when needed)"""
+    projection = {"_id" if field == "id" else field: 1 for field in fields}
+    # Orders from before the cents fields get them from the float amounts
+    cents_fields = [field for field in order_codec.MONEY_FIELDS if f"{field}_cents" in fields]
+    projection.update({field: 1 for field in cents_fields})
+    cursor = models.Order.get_motor_collection().find(query, projection, batch_size=batch_size)
+    async for batch in cursor_batches(cursor, batch_size):
+        for doc in batch:
+            doc["id"] = doc.pop("_id")
+            for field in cents_fields:
+                if doc.get(f"{field}_cents") is None:
+                    doc[f"{field}_cents"] = to_cents(doc.get(field))
+        yield batch
+    if not include_archive:
+        return
+
+    # total_amount_cents and the unpacked fields read the same in both collections
+    packed = set(fields) & (order_codec.PACKED_FIELDS - {"total_amount_cents"})
+    cursor = models.ArchivedOrder.get_motor_collection().find(query, None if packed else projection, batch_size=batch_size)
+    async for batch in cursor_batches(cursor, batch_size):
+        if packed:
+            yield [order.model_dump(mode="json", include=set(fields)) for order in await order_codec.decode_many(batch)]
+        else:
+            for doc in batch:
+                doc["id"] = doc.pop("_id")
+            yield batch
+
+
+async def _decode(docs: List[dict], archived: bool) -> List[models.Order]:
+    if archived:
+        return await order_codec.decode_many(docs)
+    return [models.Order.model_validate(doc) for doc in docs]
+
+
+async def export_orders(
+    fmt: str = "parquet",
+    *,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    incremental: bool = False,
+    out_dir: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, object]:
+    """Write orders-<stamp> and order_items-<stamp> files; returns row counts and paths"""
+    if pa is None:
+        raise RuntimeError("pyarrow is required for order exports")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    now = now or datetime.utcnow()
+    batch_size = batch_size or settings.export_batch_size
+
+    watermark_id = f"orders.{fmt}"
+    previous = changed_until = None
+    if incremental:
+        stored = await models.ExportWatermark.get(watermark_id)
+        previous = stored.watermark if stored else None
+        changed_until = now - WATERMARK_LAG
+    query = export_query(since, until, previous, changed_until)
+    # Archived orders no longer change, so later increments only need the hot collection
+    include_archive = previous is None and order_archive.archive_may_contain(since)
+
+    directory = Path(out_dir or settings.export_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = now.strftime("%Y%m%dT%H%M%S")
+    orders = _Writer(directory / f"orders-{stamp}{FORMATS[fmt]}", order_schema(), fmt)
+    items = _Writer(directory / f"order_items-{stamp}{FORMATS[fmt]}", item_schema(), fmt)
+    try:
+        async for batch in order_batches(query, include_archive=include_archive, batch_size=batch_size):
+            order_rows = [order_row(order) for order in batch]
+            exploded = [row for order in batch for row in item_rows(order)]
+            await asyncio.to_thread(orders.write, order_rows)
+            await asyncio.to_thread(items.write, exploded)
+    finally:
+        orders.close()
+        items.close()
+
+    if incremental:
+        await models.ExportWatermark(id=watermark_id, watermark=changed_until, updated_at=now).save()
+    return {
+        "format": fmt,
+        "orders": orders.rows,
+        "items": items.rows,
+        "files": [str(orders.path), str(items.path)],
+        "watermark": changed_until,
+    }
@@ -0,0 +1,198 @@
+"""
+Hourly order rollups.
+
+order_hourly holds one small document per UTC hour: orders created in that
+hour, and how many of them were delivered with what revenue. New orders
+and DELIVERED transitions add to it with $inc, so hour-of-day and
+day-of-week analytics group at most 24 x days rollups instead of every
+order, whatever the date range. rebuild() recomputes rollups from the
+orders (hot and archived) after deploying or when they drift.
+
+Run rebuild_order_rollups.py once after deploying: until then hours before
+the deploy read as zero, and orders created before it but delivered after
+it add delivered_orders to hours whose `orders` count is 0.
+
+Rollups stay in UTC; the restaurant's timezone (RestaurantSettings.timezone)
+is applied when grouping, so changing it needs no rebuild. Zones with a
+non-whole-hour offset place each UTC hour by its start time.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import logging
+
+from pymongo import ReplaceOne, UpdateOne
+
+from . import models, order_archive, order_state
+from .cache import settings_cache
+from .money import cents_expr, from_cents, to_cents
+from .order_totals import Totals
+
+logger = logging.getLogger(__name__)
+
+DELIVERED = models.OrderStatus.DELIVERED
+HOUR_FORMAT = "%Y-%m-%dT%H"
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def hour_of(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def rollup_id(hour: datetime) -> str:
+    return f"{hour:{HOUR_FORMAT}}"
+
+
+async def restaurant_timezone() -> str:
+    """The restaurant's IANA timezone, falling back to UTC for unknown names"""
+    name = (await settings_cache.get()).timezone or "UTC"
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.error(f"Unknown restaurant timezone {name!r}, using UTC")
+        return "UTC"
+    return name
+
+
+async def _apply(incs: Dict[datetime, Dict[str, int]]):
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"_id": rollup_id(hour)},
+            {"$inc": inc, "$set": {"updated_at": now}, "$setOnInsert": {"hour": hour}},
+            upsert=True,
+        )
+        for hour, inc in incs.items()
+    ]
+    if operations:
+        await models.OrderHourly.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+async def record_created(orders: List[models.Order]):
+    """Count new orders; a failure is logged, never raised into order creation"""
+    incs: Dict[datetime, Dict[str, int]] = {}
+    for order in orders:
+        inc = incs.setdefault(hour_of(order.created_at), {"orders": 0})
+        inc["orders"] += 1
+    try:
+        await _apply(incs)
+    except Exception as e:
+        logger.error(f"Order rollup update failed: {e}")
+
+
+@order_state.on_transitions
+async def record_deliveries(events: List[order_state.TransitionEvent]):
+    """Transition listener: add delivered orders to the hour they were created in"""
+    incs: Dict[datetime, Dict[str, int]] = {}
+    for event in events:
+        if event.to_status != DELIVERED:
+            continue
+        order = event.order
+        inc = incs.setdefault(hour_of(order.created_at), {"delivered_orders": 0, "revenue_cents": 0})
+        inc["delivered_orders"] += 1
+        inc["revenue_cents"] += order.total_amount_cents if order.total_amount_cents is not None else to_cents(order.total_amount)
+    await _apply(incs)
+
+
+def _rebuild_pipeline(match: dict) -> list:
+    # total_amount_cents is top-level in both collections (see order_codec)
+    delivered = {"$eq": ["$status", DELIVERED]}
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"$dateToString": {"format": HOUR_FORMAT, "date": "$created_at"}},
+            "orders": {"$sum": 1},
+            "delivered_orders": {"$sum": {"$cond": [delivered, 1, 0]}},
+            "revenue_cents": {"$sum": {"$cond": [delivered, cents_expr("total_amount"), 0]}},
+        }},
+    ]
+
+
+async def rebuild(since: Optional[datetime] = None) -> int:
+    """Recompute rollups from the orders (all hours, or from `since`'s hour on)"""
+    start = hour_of(since) if since is not None else None
+    match = {"created_at": {"$gte": start}} if start is not None else {}
+
+    rollups: Dict[str, Dict[str, int]] = {}
+    collections = [models.Order.get_motor_collection()]
+    if order_archive.archive_may_contain(start):
+        collections.append(models.ArchivedOrder.get_motor_collection())
+    for collection in collections:
+        async for row in collection.aggregate(_rebuild_pipeline(match)):
+            rollup = rollups.setdefault(row["_id"], {"orders": 0, "delivered_orders": 0, "revenue_cents": 0})
+            for field in rollup:
+                rollup[field] += int(round(row[field]))
+
+    now = datetime.utcnow()
+    operations = [
+        ReplaceOne(
+            {"_id": key},
+            {"hour": datetime.strptime(key, HOUR_FORMAT), **rollup, "updated_at": now},
+            upsert=True,
+        )
+        for key, rollup in rollups.items()
+    ]
+    collection = models.OrderHourly.get_motor_collection()
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    stale: dict = {"_id": {"$nin": list(rollups)}}
+    if start is not None:
+        stale["hour"] = {"$gte": start}
+    await collection.delete_many(stale)
+    return len(operations)
+
+
+def _range_match(since: Optional[datetime], until: Optional[datetime]) -> dict:
+    hour = {}
+    if since is not None:
+        hour["$gte"] = hour_of(since)
+    if until is not None:
+        hour["$lt"] = until
+    return {"hour": hour} if hour else {}
+
+
+async def _grouped(match: dict, group_id: dict) -> List[dict]:
+    return await models.OrderHourly.get_motor_collection().aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": group_id,
+            "orders": {"$sum": "$orders"},
+            "delivered_orders": {"$sum": "$delivered_orders"},
+            "revenue_cents": {"$sum": "$revenue_cents"},
+        }},
+    ]).to_list(length=None)
+
+
+def _totals(row: dict) -> Totals:
+    return Totals(orders=row["orders"], delivered_orders=row["delivered_orders"], revenue_cents=row["revenue_cents"])
+
+
+async def totals_by_hour(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    timezone: str = "UTC"
+) -> Dict[int, Totals]:
+    """Totals per local hour of day (0-23)"""
+    rows = await _grouped(_range_match(since, until), {"$hour": {"date": "$hour", "timezone": timezone}})
+    return {row["_id"]: _totals(row) for row in rows}
+
+
+async def heatmap(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    timezone: str = "UTC"
+) -> Tuple[List[List[int]], List[List[float]]]:
+    """7 x 24 (Monday-first weekday x local hour) matrices of order counts and delivered revenue"""
+    rows = await _grouped(_range_match(since, until), {
+        # $dayOfWeek is 1 (Sunday) .. 7 (Saturday)
+        "day": {"$dayOfWeek": {"date": "$hour", "timezone": timezone}},
+        "hour": {"$hour": {"date": "$hour", "timezone": timezone}},
+    })
+    orders = [[0] * 24 for _ in WEEKDAYS]
+    revenue_cents = [[0] * 24 for _ in WEEKDAYS]
+    for row in rows:
+        day = (row["_id"]["day"] + 5) % 7
+        orders[day][row["_id"]["hour"]] += row["orders"]
+        revenue_cents[day][row["_id"]["hour"]] += row["revenue_cents"]
+    return orders, [[from_cents(cents) for cents in day] for day in revenue_cents]
+
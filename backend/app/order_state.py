@@ -0,0 +1,348 @@
+"""
+Order state machine.
+
+Every order status change goes through transition() (or transition_many()
+for batches): the move is checked against TRANSITIONS, applied as a
+conditional write ($set status, timestamps and caller fields; $push a
+status_history entry; filtered on the source status) and then announced
+to registered listeners.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+import logging
+
+from pydantic import ValidationError
+from pymongo import ReturnDocument, UpdateMany
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+OrderStatus = models.OrderStatus
+
+# Allowed moves; DELIVERED and CANCELLED are terminal
+TRANSITIONS: Dict[OrderStatus, FrozenSet[OrderStatus]] = {
+    OrderStatus.PENDING: frozenset({OrderStatus.CONFIRMED, OrderStatus.PREPARING, OrderStatus.CANCELLED}),
+    OrderStatus.CONFIRMED: frozenset({OrderStatus.PREPARING, OrderStatus.CANCELLED}),
+    OrderStatus.PREPARING: frozenset({OrderStatus.READY, OrderStatus.CANCELLED}),
+    OrderStatus.READY: frozenset({OrderStatus.OUT_FOR_DELIVERY, OrderStatus.DELIVERED, OrderStatus.CANCELLED}),
+    OrderStatus.OUT_FOR_DELIVERY: frozenset({OrderStatus.DELIVERED, OrderStatus.CANCELLED}),
+    OrderStatus.DELIVERED: frozenset(),
+    OrderStatus.CANCELLED: frozenset(),
+}
+
+
+class InvalidTransition(Exception):
+    """The order's current status does not allow the requested move"""
+
+    def __init__(self, current: Optional[OrderStatus], target: OrderStatus):
+        self.current = current
+        self.target = target
+        current_name = current.value if current else "unknown"
+        super().__init__(f"Cannot change order status from {current_name} to {target.value}")
+
+
+class TransitionConflict(Exception):
+    """The order left the expected status before the write landed"""
+
+    def __init__(self, expected: OrderStatus, current: OrderStatus):
+        self.expected = expected
+        self.current = current
+        super().__init__(f"Order status is {current.value}, expected {expected.value}")
+
+
+@dataclass
+class TransitionEvent:
+    order: models.Order  # state after the transition
+    from_status: OrderStatus
+    to_status: OrderStatus
+    changed_by: str
+    changed_at: datetime
+
+
+TransitionListener = Callable[[TransitionEvent], Awaitable[None]]
+BatchTransitionListener = Callable[[List[TransitionEvent]], Awaitable[None]]
+UpdateListener = Callable[[List[models.Order]], Awaitable[None]]
+
+_listeners: List[TransitionListener] = []
+_batch_listeners: List[BatchTransitionListener] = []
+_update_listeners: List[UpdateListener] = []
+
+
+def on_transition(listener: TransitionListener) -> TransitionListener:
+    """Register an async listener called once per committed transition (usable as a decorator)"""
+    _listeners.append(listener)
+    return listener
+
+
+def on_transitions(listener: BatchTransitionListener) -> BatchTransitionListener:
+    """Register an async listener called once per batch of committed transitions"""
+    _batch_listeners.append(listener)
+    return listener
+
+
+def on_updates(listener: UpdateListener) -> UpdateListener:
+    """Register an async listener for orders changed by update_fields() (no status change)"""
+    _update_listeners.append(listener)
+    return listener
+
+
+async def _call(listener, arg):
+    try:
+        await listener(arg)
+    except Exception as e:
+        logger.error(f"Order transition listener {getattr(listener, '__name__', listener)} failed: {e}")
+
+
+async def emit_many(events: List[TransitionEvent]):
+    """Run listeners in registration order; a failing listener never fails the transition"""
+    if not events:
+        return
+    for event in events:
+        for listener in list(_listeners):
+            await _call(listener, event)
+    for listener in list(_batch_listeners):
+        await _call(listener, events)
+
+
+async def emit(event: TransitionEvent):
+    await emit_many([event])
+
+
+async def emit_updates(orders: List[models.Order]):
+    for listener in list(_update_listeners):
+        await _call(listener, orders)
+
+
+def can_transition(current: OrderStatus, target: OrderStatus) -> bool:
+    return target in TRANSITIONS.get(current, frozenset())
+
+
+def sources_for(target: OrderStatus) -> List[OrderStatus]:
+    """Statuses an order may be in to move to target"""
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def side_effects(from_status: Optional[OrderStatus], target: OrderStatus, now: datetime) -> dict:
+    """Timestamp fields set by a transition (from_status is None when not known up front)"""
+    fields = {}
+    if target == OrderStatus.CONFIRMED or (target == OrderStatus.PREPARING and from_status == OrderStatus.PENDING):
+        fields["confirmed_at"] = now
+    elif target == OrderStatus.DELIVERED:
+        fields["completed_at"] = now
+    return fields
+
+
+def build_update(
+    from_status: Optional[OrderStatus],
+    target: OrderStatus,
+    *,
+    changed_by: str,
+    notes: Optional[str],
+    now: datetime,
+    set_fields: Optional[dict] = None
+) -> dict:
+    """Update document for one transition"""
+    if notes is None:
+        notes = (
+            f"Status changed from {from_status.value} to {target.value}"
+            if from_status else f"Status changed to {target.value}"
+        )
+    history = models.OrderStatusHistory(status=target, changed_at=now, changed_by=changed_by, notes=notes)
+    return {
+        "$set": {
+            **(set_fields or {}),
+            **side_effects(from_status, target, now),
+            "status": target,
+            "updated_at": now,
+        },
+        "$push": {"status_history": history.model_dump()},
+    }
+
+
+async def transition(
+    order_id: str,
+    target: OrderStatus,
+    *,
+    expected: Optional[OrderStatus] = None,
+    changed_by: str = "system",
+    notes: Optional[str] = None,
+    set_fields: Optional[dict] = None
+) -> Optional[TransitionEvent]:
+    """
+    Move an order to target in one atomic conditional update.
+
+    With `expected`, the order must still be in that status (optimistic
+    concurrency; TransitionConflict otherwise). Without it, any status that
+    may move to target is accepted. Raises InvalidTransition for moves the
+    table does not allow; returns None if the order does not exist.
+    """
+    target = OrderStatus(target)
+    if expected is not None:
+        expected = OrderStatus(expected)
+        if not can_transition(expected, target):
+            raise InvalidTransition(expected, target)
+        sources = [expected]
+    else:
+        sources = sources_for(target)
+
+    now = datetime.utcnow()
+    from_status = sources[0] if len(sources) == 1 else None
+    update = build_update(from_status, target, changed_by=changed_by, notes=notes, now=now, set_fields=set_fields)
+
+    collection = models.Order.get_motor_collection()
+    before = await collection.find_one_and_update(
+        {"_id": order_id, "status": {"$in": sources}},
+        update,
+        return_document=ReturnDocument.BEFORE
+    )
+
+    if before is None:
+        current = await collection.find_one({"_id": order_id}, {"status": 1})
+        if current is None:
+            return None
+        current_status = OrderStatus(current["status"])
+        if expected is not None and current_status != expected:
+            raise TransitionConflict(expected, current_status)
+        raise InvalidTransition(current_status, target)
+
+    from_status = OrderStatus(before["status"])
+    if len(sources) > 1:
+        # Side effects that depend on the source status (e.g. PENDING -> PREPARING
+        # stamps confirmed_at) are only known once the write has matched
+        missing = {
+            field: value for field, value in side_effects(from_status, target, now).items()
+            if field not in update["$set"]
+        }
+        if missing:
+            await collection.update_one({"_id": order_id, "status": target}, {"$set": missing})
+            update["$set"].update(missing)
+
+    # Rebuild the post-update order locally instead of reading it back
+    after = {**before, **update["$set"]}
+    after["status_history"] = before.get("status_history", []) + [update["$push"]["status_history"]]
+    event = TransitionEvent(
+        order=models.Order.model_validate(after),
+        from_status=from_status,
+        to_status=target,
+        changed_by=changed_by,
+        changed_at=now,
+    )
+    await emit(event)
+    return event
+
+
+async def transition_many(
+    order_ids: List[str],
+    target: OrderStatus,
+    *,
+    changed_by: str = "system",
+    notes: Optional[str] = None
+) -> Tuple[List[TransitionEvent], Dict[str, str]]:
+    """
+    Move many orders to target with a single bulk_write (one UpdateMany per
+    current status, each guarded by that status). Returns the committed
+    events and {order_id: reason} for orders that were not moved.
+    """
+    target = OrderStatus(target)
+    order_ids = list(dict.fromkeys(order_ids))
+    collection = models.Order.get_motor_collection()
+
+    docs = await collection.find({"_id": {"$in": order_ids}}).to_list(length=None)
+    found = {doc["_id"]: doc for doc in docs}
+    rejected: Dict[str, str] = {
+        order_id: "Order not found" for order_id in order_ids if order_id not in found
+    }
+
+    by_status: Dict[OrderStatus, List[dict]] = {}
+    for doc in docs:
+        current = OrderStatus(doc["status"])
+        if can_transition(current, target):
+            by_status.setdefault(current, []).append(doc)
+        else:
+            rejected[doc["_id"]] = str(InvalidTransition(current, target))
+
+    if not by_status:
+        return [], rejected
+
+    now = datetime.utcnow()
+    updates = {
+        status: build_update(status, target, changed_by=changed_by, notes=notes, now=now)
+        for status in by_status
+    }
+    result = await collection.bulk_write(
+        [
+            UpdateMany({"_id": {"$in": [doc["_id"] for doc in group]}, "status": status}, updates[status])
+            for status, group in by_status.items()
+        ],
+        ordered=False
+    )
+
+    candidates = [doc for group in by_status.values() for doc in group]
+    applied = {doc["_id"] for doc in candidates}
+    if result.matched_count < len(candidates):
+        # Some orders moved between the read and the write; our write is the
+        # one that stamped updated_at == now
+        moved = await collection.find(
+            {"_id": {"$in": list(applied)}, "status": target, "updated_at": now}, {"_id": 1}
+        ).to_list(length=None)
+        applied = {doc["_id"] for doc in moved}
+        for doc in candidates:
+            if doc["_id"] not in applied:
+                rejected[doc["_id"]] = "Order status changed concurrently"
+
+    events = []
+    for status, group in by_status.items():
+        update = updates[status]
+        for before in group:
+            if before["_id"] not in applied:
+                continue
+            after = {**before, **update["$set"]}
+            after["status_history"] = before.get("status_history", []) + [update["$push"]["status_history"]]
+            events.append(TransitionEvent(
+                order=models.Order.model_validate(after),
+                from_status=status,
+                to_status=target,
+                changed_by=changed_by,
+                changed_at=now,
+            ))
+
+    await emit_many(events)
+    return events, rejected
+
+
+async def transition_or_update(order_id: str, target: OrderStatus, set_fields: dict, **kwargs) -> Optional[TransitionEvent]:
+    """
+    Move to target when the table allows it; otherwise only apply set_fields
+    through update_fields().
+    Used by payment callbacks, which must record the payment outcome even
+    when staff already moved the order on.
+    """
+    try:
+        return await transition(order_id, target, set_fields=set_fields, **kwargs)
+    except InvalidTransition:
+        await update_fields(order_id, set_fields)
+        return None
+
+
+async def update_fields(order_id: Any, set_fields: dict) -> Optional[models.Order]:
+    """
+    $set fields that are not the status (payment details and the like) and
+    announce the updated order to update listeners such as the live board.
+    Returns None if the order does not exist.
+    """
+    doc = await models.Order.get_motor_collection().find_one_and_update(
+        {"_id": order_id},
+        {"$set": {**set_fields, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        return None
+    try:
+        order = models.Order.model_validate(doc)
+    except ValidationError as e:
+        logger.error(f"Updated order {order_id} does not match the Order model: {e}")
+        return None
+    await emit_updates([order])
+    return order
@@ -0,0 +1,193 @@
+"""
+Order totals computed by MongoDB aggregation over integer cents.
+
+Analytics endpoints ask for totals grouped by a named key (day, month,
+hour, status, ...) instead of loading orders into Python: each collection
+runs one $match + $group pipeline and only the grouped rows come back.
+The archive is included when the range can reach it (see order_archive);
+its rows are added to the hot rows with the same key.
+
+With engine="numpy" (or ANALYTICS_ENGINE=numpy) the same totals come from
+app.analytics_engine's in-memory columnar snapshot instead.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from . import models, order_archive, order_codec
+from .config import settings
+from .money import cents_expr, from_cents
+
+DELIVERED = models.OrderStatus.DELIVERED
+ENGINES = ("mongo", "numpy")
+
+# Grouping keys shared by every engine; values are $group _id expressions
+GROUP_KEYS: Dict[str, Any] = {
+    "all": None,
+    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+    "month": {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}},
+    "hour": {"$hour": "$created_at"},
+    "status": "$status",
+    "order_type": "$order_type",
+    "payment_status": "$payment_status",
+}
+
+
+@dataclass
+class Totals:
+    orders: int = 0
+    delivered_orders: int = 0
+    revenue_cents: int = 0  # delivered orders only
+    sold_meals: int = 0  # item quantities of delivered orders
+
+    @property
+    def revenue(self) -> float:
+        return from_cents(self.revenue_cents)
+
+    def add(self, other: "Totals") -> "Totals":
+        self.orders += other.orders
+        self.delivered_orders += other.delivered_orders
+        self.revenue_cents += other.revenue_cents
+        self.sold_meals += other.sold_meals
+        return self
+
+
+@dataclass
+class MealTotals:
+    meal_name: str = ""
+    quantity: int = 0
+    revenue_cents: int = 0  # delivered orders only
+
+    @property
+    def revenue(self) -> float:
+        return from_cents(self.revenue_cents)
+
+
+def _is_delivered() -> dict:
+    return {"$eq": ["$status", DELIVERED]}
+
+
+def range_match(since: Optional[datetime] = None, until: Optional[datetime] = None, extra: Optional[dict] = None) -> dict:
+    match = dict(extra or {})
+    created = {}
+    if since is not None:
+        created["$gte"] = since
+    if until is not None:
+        created["$lt"] = until
+    if created:
+        match["created_at"] = created
+    return match
+
+
+def totals_pipeline(key: str, match: dict, *, archived: bool = False) -> list:
+    quantity = "$it.q" if archived else "$items.quantity"
+    delivered = _is_delivered()
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": GROUP_KEYS[key],
+            "orders": {"$sum": 1},
+            "delivered_orders": {"$sum": {"$cond": [delivered, 1, 0]}},
+            "revenue_cents": {"$sum": {"$cond": [delivered, cents_expr("total_amount"), 0]}},
+            "sold_meals": {"$sum": {"$cond": [delivered, {"$sum": quantity}, 0]}},
+        }},
+    ]
+
+
+def _numpy_engine(engine: Optional[str]):
+    """app.analytics_engine when the numpy engine is selected, else None"""
+    if (engine or settings.analytics_engine) != "numpy":
+        return None
+    from . import analytics_engine  # imports this module for Totals/MealTotals
+    return analytics_engine
+
+
+def _totals(row: dict) -> Totals:
+    return Totals(
+        orders=row["orders"],
+        delivered_orders=row["delivered_orders"],
+        revenue_cents=int(round(row["revenue_cents"])),
+        sold_meals=row["sold_meals"],
+    )
+
+
+async def totals_by(
+    key: str,
+    *,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    match: Optional[dict] = None,
+    engine: Optional[str] = None
+) -> Dict[Any, Totals]:
+    """Totals per group key value ({None: Totals} for key="all").
+
+    Extra `match` filters always run in MongoDB; the snapshot only holds
+    the grouping columns.
+    """
+    columnar = _numpy_engine(engine)
+    if columnar is not None and not match:
+        return columnar.totals_by(await columnar.snapshot(since), key, since, until)
+
+    query = range_match(since, until, match)
+    result: Dict[Any, Totals] = {}
+
+    collections = [(models.Order.get_motor_collection(), False)]
+    if order_archive.archive_may_contain(since):
+        collections.append((models.ArchivedOrder.get_motor_collection(), True))
+    for collection, archived in collections:
+        async for row in collection.aggregate(totals_pipeline(key, query, archived=archived)):
+            result.setdefault(row["_id"], Totals()).add(_totals(row))
+    return result
+
+
+async def grand_total(**kwargs) -> Totals:
+    return (await totals_by("all", **kwargs)).get(None, Totals())
+
+
+def meal_pipeline(match: dict, *, archived: bool = False) -> list:
+    items = "it" if archived else "items"
+    delivered = _is_delivered()
+    item_cents = f"${items}.s" if archived else cents_expr("items.subtotal")
+    group = {
+        "_id": f"${items}.m" if archived else f"${items}.meal_id",
+        "quantity": {"$sum": f"${items}.q" if archived else f"${items}.quantity"},
+        "revenue_cents": {"$sum": {"$cond": [delivered, item_cents, 0]}},
+    }
+    if not archived:
+        group["meal_name"] = {"$last": f"${items}.meal_name"}
+    return [{"$match": match}, {"$unwind": f"${items}"}, {"$group": group}]
+
+
+async def meal_totals(
+    *,
+    since: Optional[datetime] = None,
+    delivered_only: bool = True,
+    engine: Optional[str] = None
+) -> Dict[str, MealTotals]:
+    """Quantity and delivered revenue per meal_id"""
+    columnar = _numpy_engine(engine)
+    if columnar is not None:
+        return columnar.meal_totals(await columnar.snapshot(since), since, delivered_only)
+
+    match = range_match(since, extra={"status": DELIVERED} if delivered_only else None)
+    result: Dict[str, MealTotals] = {}
+
+    async for row in models.Order.get_motor_collection().aggregate(meal_pipeline(match)):
+        totals = result.setdefault(row["_id"], MealTotals())
+        totals.meal_name = row["meal_name"]
+        totals.quantity += row["quantity"]
+        totals.revenue_cents += int(round(row["revenue_cents"]))
+
+    if order_archive.archive_may_contain(since):
+        rows = await models.ArchivedOrder.get_motor_collection().aggregate(
+            meal_pipeline(match, archived=True)
+        ).to_list(length=None)
+        books = await order_codec.codebooks()
+        if any(row["_id"] >= len(books.meals.entries) for row in rows):
+            books = await order_codec.codebooks(refresh=True)
+        for row in rows:
+            meal_id, meal_name = books.meals.entry(row["_id"])
+            totals = result.setdefault(meal_id, MealTotals(meal_name=meal_name))
+            totals.quantity += row["quantity"]
+            totals.revenue_cents += row["revenue_cents"]
+    return result
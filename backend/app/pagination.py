@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token holding the sort-key values of the
+last row on a page. The next page starts strictly after those values, so
+deep pages cost the same as the first one instead of skipping N rows.
+The last sort key should be unique (normally _id) to break ties, and
+every document should store the sort fields: MongoDB sorts a missing field
+as null, which no cursor value can resume from.
+"""
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+import base64
+import json
+
+from pymongo import ASCENDING
+
+SortKeys = Sequence[Tuple[str, int]]
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any):
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(sort_keys: SortKeys, doc: dict, tag: str = "", defaults: Optional[dict] = None) -> str:
+    """Cursor pointing just past `doc` in the given sort order; `defaults` fill missing sort fields"""
+    defaults = defaults or {}
+    values = [doc.get(field) if doc.get(field) is not None else defaults.get(field) for field, _ in sort_keys]
+    payload = {"t": tag, "k": [_encode_value(value) for value in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_keys: SortKeys, tag: str = "") -> List[Any]:
+    """Sort-key values from a cursor; raises ValueError if it is malformed or for another sort"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [_decode_value(value) for value in payload["k"]]
+    except Exception as e:
+        raise ValueError("Malformed cursor") from e
+    if payload.get("t") != tag or len(values) != len(sort_keys):
+        raise ValueError("Cursor does not match this sort order")
+    return values
+
+
+def keyset_filter(sort_keys: SortKeys, values: Sequence[Any]) -> dict:
+    """
+    Filter for rows strictly after `values` in sort order, e.g. for
+    [(a, DESC), (_id, DESC)]: a < va OR (a == va AND _id < vid)
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort_keys):
+        branch = {prefix: values[j] for j, (prefix, _) in enumerate(sort_keys[:i])}
+        branch[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        branches.append(branch)
+    return {"$or": branches}
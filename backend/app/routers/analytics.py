@@ -1,65 +1,65 @@
 """
 Analytics endpoints for sales, revenue, and order statistics
 """
-from fastapi import APIRouter, Depends, Query
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Literal, Optional
 from datetime import datetime, timedelta
 from collections import defaultdict
 
 from ..auth import get_current_admin_user
-from .. import models
+from .. import analytics_engine, forecast, meal_sales, models, order_rollups, order_totals
+from ..config import settings
+from ..order_totals import Totals
 
 router = APIRouter()
 
 
+def since_days(days: Optional[int]) -> Optional[datetime]:
+    return datetime.utcnow() - timedelta(days=days) if days else None
+
+
+def select_engine(
+    engine: Optional[Literal["mongo", "numpy"]] = Query(
+        default=None, description="Analytics engine; defaults to ANALYTICS_ENGINE"
+    )
+) -> str:
+    engine = engine or settings.analytics_engine
+    if engine == "numpy" and not analytics_engine.available():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The numpy analytics engine is not installed"
+        )
+    return engine
+
+
 @router.get("/sales/overview")
 async def get_sales_overview(
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Get overall sales statistics"""
     
-    # Total orders
-    total_orders = await models.Order.count()
-    
-    # Total revenue (delivered orders only)
-    delivered_orders = await models.Order.find(
-        models.Order.status == models.OrderStatus.DELIVERED
-    ).to_list()
-    total_revenue = sum(order.total_amount for order in delivered_orders)
+    # All-time totals (revenue from delivered orders only)
+    overall = await order_totals.grand_total(engine=engine)
     
-    # Today's stats
+    # Today, this week and this month from one per-day grouping
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_orders = await models.Order.find(
-        models.Order.created_at >= today
-    ).to_list()
-    today_count = len(today_orders)
-    today_revenue = sum(
-        order.total_amount for order in today_orders 
-        if order.status == models.OrderStatus.DELIVERED
-    )
-    
-    # This week
     week_start = today - timedelta(days=today.weekday())
-    week_orders = await models.Order.find(
-        models.Order.created_at >= week_start
-    ).to_list()
-    week_revenue = sum(
-        order.total_amount for order in week_orders 
-        if order.status == models.OrderStatus.DELIVERED
-    )
-    
-    # This month
     month_start = today.replace(day=1)
-    month_orders = await models.Order.find(
-        models.Order.created_at >= month_start
-    ).to_list()
-    month_revenue = sum(
-        order.total_amount for order in month_orders 
-        if order.status == models.OrderStatus.DELIVERED
-    )
+    daily = await order_totals.totals_by("day", since=min(week_start, month_start), engine=engine)
+    
+    def totals_since(start: datetime) -> Totals:
+        first_day = start.strftime("%Y-%m-%d")
+        totals = Totals()
+        for day, day_totals in daily.items():
+            if day >= first_day:
+                totals.add(day_totals)
+        return totals
+    
+    today_totals = totals_since(today)
     
     # Average order value
-    avg_order_value = total_revenue / len(delivered_orders) if delivered_orders else 0
+    avg_order_value = overall.revenue / overall.delivered_orders if overall.delivered_orders else 0
     
     # Total customers
     total_customers = await models.User.find(
@@ -67,12 +67,12 @@ async def get_sales_overview(
     ).count()
     
     return {
-        "total_orders": total_orders,
-        "total_revenue": round(total_revenue, 2),
-        "today_orders": today_count,
-        "today_revenue": round(today_revenue, 2),
-        "week_revenue": round(week_revenue, 2),
-        "month_revenue": round(month_revenue, 2),
+        "total_orders": overall.orders,
+        "total_revenue": overall.revenue,
+        "today_orders": today_totals.orders,
+        "today_revenue": today_totals.revenue,
+        "week_revenue": totals_since(week_start).revenue,
+        "month_revenue": totals_since(month_start).revenue,
         "avg_order_value": round(avg_order_value, 2),
         "total_customers": total_customers,
     }
@@ -81,6 +81,7 @@ async def get_sales_overview(
 @router.get("/sales/daily")
 async def get_daily_sales(
     days: int = Query(default=30, ge=1, le=365),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Get daily sales data for the last N days.
@@ -91,30 +92,20 @@ async def get_daily_sales(
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     start_date = today - timedelta(days=days)
 
-    orders = await models.Order.find(
-        models.Order.created_at >= start_date
-    ).to_list()
-
-    # Group by date
-    daily_stats = defaultdict(lambda: {"orders": 0, "delivered_orders": 0, "revenue": 0})
-
-    for order in orders:
-        date_key = order.created_at.strftime("%Y-%m-%d")
-        daily_stats[date_key]["orders"] += 1
-        if order.status == models.OrderStatus.DELIVERED:
-            daily_stats[date_key]["delivered_orders"] += 1
-            daily_stats[date_key]["revenue"] += float(order.total_amount)
+    # Grouped by date in the database
+    daily_stats = await order_totals.totals_by("day", since=start_date, engine=engine)
 
     # Format response
     result = []
     for i in range(days):
         date = today - timedelta(days=days - i - 1)
         date_key = date.strftime("%Y-%m-%d")
+        totals = daily_stats.get(date_key, Totals())
         result.append({
             "date": date_key,
-            "orders": daily_stats[date_key]["orders"],
-            "delivered_orders": daily_stats[date_key]["delivered_orders"],
-            "revenue": round(daily_stats[date_key]["revenue"], 2)
+            "orders": totals.orders,
+            "delivered_orders": totals.delivered_orders,
+            "revenue": totals.revenue
         })
 
     return result
@@ -123,6 +114,7 @@ async def get_daily_sales(
 @router.get("/sales/weekly")
 async def get_weekly_sales(
     weeks: int = Query(default=12, ge=1, le=52),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Get weekly sales data"""
@@ -130,20 +122,12 @@ async def get_weekly_sales(
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     start_date = today - timedelta(weeks=weeks)
     
-    orders = await models.Order.find(
-        models.Order.created_at >= start_date
-    ).to_list()
-    
-    # Group by week
-    weekly_stats = defaultdict(lambda: {"orders": 0, "revenue": 0})
-    
-    for order in orders:
-        # Get week number
-        week_start = order.created_at - timedelta(days=order.created_at.weekday())
-        week_key = week_start.strftime("%Y-W%U")
-        weekly_stats[week_key]["orders"] += 1
-        if order.status == models.OrderStatus.DELIVERED:
-            weekly_stats[week_key]["revenue"] += float(order.total_amount)
+    # Grouped by date in the database, then rolled up into weeks
+    weekly_stats = defaultdict(Totals)
+    for day, totals in (await order_totals.totals_by("day", since=start_date, engine=engine)).items():
+        date = datetime.strptime(day, "%Y-%m-%d")
+        week_start = date - timedelta(days=date.weekday())
+        weekly_stats[week_start.strftime("%Y-W%U")].add(totals)
     
     # Format response
     result = []
@@ -153,8 +137,8 @@ async def get_weekly_sales(
         result.append({
             "week": week_key,
             "week_start": week_start.strftime("%Y-%m-%d"),
-            "orders": weekly_stats[week_key]["orders"],
-            "revenue": round(weekly_stats[week_key]["revenue"], 2)
+            "orders": weekly_stats[week_key].orders,
+            "revenue": weekly_stats[week_key].revenue
         })
     
     return result
@@ -163,40 +147,28 @@ async def get_weekly_sales(
 @router.get("/sales/monthly")
 async def get_monthly_sales(
     months: int = Query(default=12, ge=1, le=24),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Get monthly sales data"""
     
     today = datetime.utcnow()
+    month_starts = [
+        (today - timedelta(days=30 * (months - i - 1))).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        for i in range(months)
+    ]
+    
+    # One grouping for the whole range instead of a query per month
+    monthly_stats = await order_totals.totals_by("month", since=month_starts[0], engine=engine)
     
     result = []
-    for i in range(months):
-        # Calculate month
-        month_date = today - timedelta(days=30 * (months - i - 1))
-        month_start = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Get next month start for range query
-        if month_start.month == 12:
-            month_end = month_start.replace(year=month_start.year + 1, month=1)
-        else:
-            month_end = month_start.replace(month=month_start.month + 1)
-        
-        # Query orders in this month
-        orders = await models.Order.find(
-            models.Order.created_at >= month_start,
-            models.Order.created_at < month_end
-        ).to_list()
-        
-        month_revenue = sum(
-            order.total_amount for order in orders 
-            if order.status == models.OrderStatus.DELIVERED
-        )
-        
+    for month_start in month_starts:
+        totals = monthly_stats.get(month_start.strftime("%Y-%m"), Totals())
         result.append({
             "month": month_start.strftime("%Y-%m"),
             "month_name": month_start.strftime("%B %Y"),
-            "orders": len(orders),
-            "revenue": round(month_revenue, 2)
+            "orders": totals.orders,
+            "revenue": totals.revenue
         })
     
     return result
@@ -207,51 +179,31 @@ async def get_popular_meals(
     limit: int = Query(default=10, ge=1, le=50),
     days: Optional[int] = Query(default=None, ge=1, le=365),
     delivered_only: bool = Query(default=True),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Get most popular meals by order count.
 
-    By default counts SOLD items only from DELIVERED orders so it matches delivered revenue.
+    By default counts SOLD items only from DELIVERED orders so it matches delivered revenue,
+    read from the per-meal daily sales counters (whole days: the window starts at midnight UTC).
     Set delivered_only=false to include all orders regardless of status.
     """
-    # Build query
-    query = {}
-    if days:
-        start_date = datetime.utcnow() - timedelta(days=days)
-        query["created_at"] = {"$gte": start_date}
-
-    orders = await models.Order.find(query).to_list()
-
-    # Count meal occurrences
-    meal_stats = defaultdict(lambda: {"name": "", "count": 0, "revenue": 0})
-
-    for order in orders:
-        # Skip non-delivered orders when delivered_only is true
-        if delivered_only and order.status != models.OrderStatus.DELIVERED:
-            continue
-        for item in order.items:
-            meal_id = item.meal_id
-            meal_stats[meal_id]["name"] = item.meal_name
-            meal_stats[meal_id]["count"] += item.quantity
-            if order.status == models.OrderStatus.DELIVERED:
-                meal_stats[meal_id]["revenue"] += float(item.subtotal)
-
-    # Sort by count and limit
-    sorted_meals = sorted(
-        [
-            {
-                "meal_id": meal_id,
-                "meal_name": stats["name"],
-                "order_count": stats["count"],
-                "revenue": round(stats["revenue"], 2),
-            }
-            for meal_id, stats in meal_stats.items()
-        ],
-        key=lambda x: x["order_count"],
-        reverse=True,
-    )[:limit]
-
-    return sorted_meals
+    if delivered_only:
+        ranked = await meal_sales.top_meals(since=since_days(days), limit=limit)
+    else:
+        # Quantity per meal over all statuses, grouped from the orders themselves
+        meal_stats = await order_totals.meal_totals(since=since_days(days), delivered_only=False, engine=engine)
+        ranked = sorted(meal_stats.items(), key=lambda entry: entry[1].quantity, reverse=True)[:limit]
+
+    return [
+        {
+            "meal_id": meal_id,
+            "meal_name": stats.meal_name,
+            "order_count": stats.quantity,
+            "revenue": stats.revenue,
+        }
+        for meal_id, stats in ranked
+    ]
 
 
 @router.get("/orders/peak-hours")
@@ -259,18 +211,15 @@ async def get_peak_hours(
     days: int = Query(default=30, ge=1, le=365),
     current_user: models.User = Depends(get_current_admin_user)
 ):
-    """Get order distribution by hour of day"""
-    
-    start_date = datetime.utcnow() - timedelta(days=days)
-    orders = await models.Order.find(
-        models.Order.created_at >= start_date
-    ).to_list()
+    """Get order distribution by hour of day in the restaurant's timezone.
+
+    Built from the hourly rollups: hours before the deploy read as zero until
+    rebuild_order_rollups.py has run.
+    """
     
-    # Count orders by hour
-    hourly_stats = defaultdict(int)
-    for order in orders:
-        hour = order.created_at.hour
-        hourly_stats[hour] += 1
+    # Count orders by local hour from the hourly rollups
+    timezone = await order_rollups.restaurant_timezone()
+    hourly_stats = await order_rollups.totals_by_hour(since=since_days(days), timezone=timezone)
     
     # Format response (all 24 hours)
     result = []
@@ -278,42 +227,71 @@ async def get_peak_hours(
         result.append({
             "hour": hour,
             "hour_label": f"{hour:02d}:00",
-            "orders": hourly_stats[hour]
+            "orders": hourly_stats.get(hour, Totals()).orders
         })
     
     return result
 
 
+@router.get("/orders/heatmap")
+async def get_orders_heatmap(
+    days: int = Query(default=90, ge=1, le=365),
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Orders and delivered revenue by weekday x hour in the restaurant's timezone.
+
+    Rows are Monday..Sunday, columns are hours 0..23; built from the hourly
+    rollups, so hours before the deploy read as zero until
+    rebuild_order_rollups.py has run.
+    """
+    timezone = await order_rollups.restaurant_timezone()
+    orders, revenue = await order_rollups.heatmap(since=since_days(days), timezone=timezone)
+    
+    return {
+        "timezone": timezone,
+        "days": days,
+        "weekdays": list(order_rollups.WEEKDAYS),
+        "hours": list(range(24)),
+        "orders": orders,
+        "revenue": revenue,
+    }
+
+
+@router.get("/forecast")
+async def get_forecast(
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Forecast orders and revenue by hour, and meal quantities, for tomorrow and the next week.
+
+    Served from the background forecast job (hourly rollups and meal sales counters);
+    nothing is computed per request once the first forecast exists.
+    """
+    if not forecast.available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Forecasting needs numpy, which is not installed"
+        )
+    return await forecast.demand_forecast.get()
+
+
 @router.get("/orders/by-type")
 async def get_orders_by_type(
     days: Optional[int] = Query(default=None, ge=1, le=365),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Get order distribution by type (Delivery, Dine-in, Take-away)"""
     
-    query = {}
-    if days:
-        start_date = datetime.utcnow() - timedelta(days=days)
-        query["created_at"] = {"$gte": start_date}
-    
-    orders = await models.Order.find(query).to_list()
-    
-    # Count by type
-    type_stats = defaultdict(lambda: {"count": 0, "revenue": 0})
-    
-    for order in orders:
-        order_type = order.order_type
-        type_stats[order_type]["count"] += 1
-        if order.status == models.OrderStatus.DELIVERED:
-            type_stats[order_type]["revenue"] += float(order.total_amount)
+    type_stats = await order_totals.totals_by("order_type", since=since_days(days), engine=engine)
     
     # Format response
     result = []
     for order_type in models.OrderType:
+        totals = type_stats.get(order_type.value, Totals())
         result.append({
             "type": order_type,
-            "count": type_stats[order_type]["count"],
-            "revenue": round(type_stats[order_type]["revenue"], 2)
+            "count": totals.orders,
+            "revenue": totals.revenue
         })
     
     return result
@@ -322,28 +300,19 @@ async def get_orders_by_type(
 @router.get("/orders/by-status")
 async def get_orders_by_status(
     days: Optional[int] = Query(default=None, ge=1, le=365),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Get order distribution by status; optional days filter."""
 
-    query = {}
-    if days:
-        start_date = datetime.utcnow() - timedelta(days=days)
-        query["created_at"] = {"$gte": start_date}
-
-    orders = await models.Order.find(query).to_list()
-
-    # Count by status
-    status_stats = defaultdict(int)
-    for order in orders:
-        status_stats[order.status] += 1
+    status_stats = await order_totals.totals_by("status", since=since_days(days), engine=engine)
 
     # Format response
     result = []
     for status in models.OrderStatus:
         result.append({
             "status": status,
-            "count": status_stats[status]
+            "count": status_stats.get(status.value, Totals()).orders
         })
 
     return result
@@ -352,33 +321,29 @@ async def get_orders_by_status(
 @router.get("/payments/summary")
 async def get_payments_summary(
     days: Optional[int] = Query(default=None, ge=1, le=365),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Payment analytics: counts by payment_status and simple failure/refund totals."""
 
-    query = {}
-    if days:
-        start_date = datetime.utcnow() - timedelta(days=days)
-        query["created_at"] = {"$gte": start_date}
+    payment_stats = await order_totals.totals_by("payment_status", since=since_days(days), engine=engine)
 
-    orders = await models.Order.find(query).to_list()
-
-    counts = defaultdict(int)
-    for order in orders:
-        counts[order.payment_status] += 1
+    def count(status: models.PaymentStatus) -> int:
+        return payment_stats.get(status.value, Totals()).orders
 
     return {
-        "pending": counts[models.PaymentStatus.PENDING],
-        "paid": counts[models.PaymentStatus.PAID],
-        "failed": counts[models.PaymentStatus.FAILED],
-        "refunded": counts[models.PaymentStatus.REFUNDED],
-        "total": len(orders),
+        "pending": count(models.PaymentStatus.PENDING),
+        "paid": count(models.PaymentStatus.PAID),
+        "failed": count(models.PaymentStatus.FAILED),
+        "refunded": count(models.PaymentStatus.REFUNDED),
+        "total": sum(totals.orders for totals in payment_stats.values()),
     }
 
 
 @router.get("/summary")
 async def get_analytics_summary(
     days: Optional[int] = Query(default=None, ge=1, le=365),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Unified summary for dashboard top strip.
@@ -388,39 +353,30 @@ async def get_analytics_summary(
     If days is None, computes all-time.
     """
 
-    query = {}
-    if days:
-        start_date = datetime.utcnow() - timedelta(days=days)
-        query["created_at"] = {"$gte": start_date}
-
-    orders = await models.Order.find(query).to_list()
-
-    total_orders = len(orders)
-    delivered_orders = [o for o in orders if o.status == models.OrderStatus.DELIVERED]
-    delivered_count = len(delivered_orders)
-    revenue_delivered = sum(float(o.total_amount) for o in delivered_orders)
-    sold_meals_delivered = sum(
-        sum(item.quantity for item in o.items) for o in delivered_orders
-    )
-    aov_delivered = revenue_delivered / delivered_count if delivered_count else 0.0
+    start_date = since_days(days)
+    payment_stats = await order_totals.totals_by("payment_status", since=start_date, engine=engine)
 
-    failed_count = len([o for o in orders if o.payment_status == models.PaymentStatus.FAILED])
-    refunded_count = len([o for o in orders if o.payment_status == models.PaymentStatus.REFUNDED])
+    # Every order has one payment status, so the groups add up to the range totals
+    totals = Totals()
+    for payment_totals in payment_stats.values():
+        totals.add(payment_totals)
+    aov_delivered = totals.revenue / totals.delivered_orders if totals.delivered_orders else 0.0
 
     return {
-        "orders_total": total_orders,
-        "orders_delivered": delivered_count,
-        "revenue_delivered": round(revenue_delivered, 2),
+        "orders_total": totals.orders,
+        "orders_delivered": totals.delivered_orders,
+        "revenue_delivered": totals.revenue,
         "aov_delivered": round(aov_delivered, 2),
-        "sold_meals_delivered": sold_meals_delivered,
-        "payment_failures": failed_count,
-        "refunds": refunded_count,
+        "sold_meals_delivered": totals.sold_meals,
+        "payment_failures": payment_stats.get(models.PaymentStatus.FAILED.value, Totals()).orders,
+        "refunds": payment_stats.get(models.PaymentStatus.REFUNDED.value, Totals()).orders,
     }
 
 
 @router.get("/revenue/trends")
 async def get_revenue_trends(
     days: int = Query(default=30, ge=1, le=365),
+    engine: str = Depends(select_engine),
     current_user: models.User = Depends(get_current_admin_user)
 ):
     """Get revenue trends with comparisons"""
@@ -430,37 +386,24 @@ async def get_revenue_trends(
     previous_start = current_start - timedelta(days=days)
     
     # Current period
-    current_orders = await models.Order.find(
-        models.Order.created_at >= current_start
-    ).to_list()
-    current_revenue = sum(
-        order.total_amount for order in current_orders 
-        if order.status == models.OrderStatus.DELIVERED
-    )
+    current = await order_totals.grand_total(since=current_start, engine=engine)
     
     # Previous period
-    previous_orders = await models.Order.find(
-        models.Order.created_at >= previous_start,
-        models.Order.created_at < current_start
-    ).to_list()
-    previous_revenue = sum(
-        order.total_amount for order in previous_orders 
-        if order.status == models.OrderStatus.DELIVERED
-    )
+    previous = await order_totals.grand_total(since=previous_start, until=current_start, engine=engine)
     
     # Calculate growth
     growth = 0
-    if previous_revenue > 0:
-        growth = ((current_revenue - previous_revenue) / previous_revenue) * 100
+    if previous.revenue_cents > 0:
+        growth = ((current.revenue_cents - previous.revenue_cents) / previous.revenue_cents) * 100
     
     return {
         "current_period": {
-            "orders": len([o for o in current_orders if o.status == models.OrderStatus.DELIVERED]),
-            "revenue": round(current_revenue, 2)
+            "orders": current.delivered_orders,
+            "revenue": current.revenue
         },
         "previous_period": {
-            "orders": len([o for o in previous_orders if o.status == models.OrderStatus.DELIVERED]),
-            "revenue": round(previous_revenue, 2)
+            "orders": previous.delivered_orders,
+            "revenue": previous.revenue
         },
         "growth_percentage": round(growth, 2),
         "days": days
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from typing import List, Optional
 
 from ..auth import get_current_admin_user
+from ..config import settings
+from ..images import UploadTooLarge
+from ..meal_sales import trending_meals
+from ..storage import image_store
 from .. import crud, models, schemas
 
 router = APIRouter()
@@ -38,6 +42,11 @@ async def create_meal(
     
     return await crud.crud_meal.create(obj_in=meal_in)
 
+@router.get("/trending", response_model=List[schemas.Meal])
+async def read_trending_meals():
+    """Best-selling available meals of the last few days, from the in-memory trending list."""
+    return await trending_meals.get()
+
 @router.get("/{meal_id}", response_model=schemas.Meal)
 async def read_meal(meal_id: str):
     """Get meal by ID."""
@@ -67,6 +76,28 @@ async def update_meal(
     meal = await crud.crud_meal.update(db_obj=meal, obj_in=meal_in)
     return meal
 
+@router.post("/{meal_id}/image", response_model=schemas.Meal)
+async def upload_meal_image(
+    *,
+    meal_id: str,
+    file: UploadFile = File(...),
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Upload a meal image into the content-addressed image store (Admin only)."""
+    meal = await crud.crud_meal.get(id=meal_id)
+    if not meal:
+        raise HTTPException(status_code=404, detail="Meal not found")
+    
+    if file.content_type not in settings.allowed_image_types:
+        raise HTTPException(status_code=400, detail=f"File {file.filename} is not an allowed image type")
+    
+    try:
+        stored = await image_store.save_upload(file, max_bytes=settings.max_file_size)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"File {file.filename} is too large: {e}")
+    
+    return await crud.crud_meal.update(db_obj=meal, obj_in=schemas.MealUpdate(image=stored.url))
+
 @router.delete("/{meal_id}", response_model=schemas.Meal)
 async def delete_meal(
     *,
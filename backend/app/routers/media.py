@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from ..cache import etag_matches
+from ..storage import IMMUTABLE_CACHE_CONTROL, KEY_PATTERN, LocalImageBackend, image_store
+
+router = APIRouter()
+
+@router.get("/media/{key:path}")
+async def get_media(key: str, request: Request):
+    """Serve a content-addressed image from the local store (public, cacheable forever)."""
+    backend = image_store.backend
+    if not KEY_PATTERN.match(key) or not isinstance(backend, LocalImageBackend):
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    path = backend.path(key)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    # The key already names the content, so it doubles as a strong validator
+    etag = f'"{key.rsplit("/", 1)[-1]}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(path, media_type=image_store.content_type_for(key), headers=headers)
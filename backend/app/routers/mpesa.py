@@ -3,18 +3,19 @@ M-Pesa payment integration router.
 Handles STK Push, payment callbacks, and M-Pesa transactions.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Query
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
-from datetime import datetime
+from typing import Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta
+import asyncio
 import hmac
 import hashlib
 import base64
 import requests
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 
-from ..database import get_database
 from ..config import settings
+from .. import models, money, order_state
 
 router = APIRouter()
 
@@ -69,6 +70,43 @@ class MPesaConfig:
         return "https://api.safaricom.co.ke"
 
 
+class TransactionWaiters:
+    """
+    In-process registry of long-poll waiters keyed by checkout request id.
+    The callback handler sets the event so waiting requests resolve at once.
+    """
+    
+    def __init__(self):
+        self._events: Dict[str, Tuple[asyncio.Event, int]] = {}
+    
+    def acquire(self, checkout_request_id: str) -> asyncio.Event:
+        """Register a waiter and return the event it should wait on"""
+        event, count = self._events.get(checkout_request_id, (None, 0))
+        if event is None:
+            event = asyncio.Event()
+        self._events[checkout_request_id] = (event, count + 1)
+        return event
+    
+    def release(self, checkout_request_id: str):
+        """Unregister a waiter, dropping the event once nobody waits on it"""
+        event, count = self._events.get(checkout_request_id, (None, 0))
+        if event is None:
+            return
+        if count <= 1:
+            del self._events[checkout_request_id]
+        else:
+            self._events[checkout_request_id] = (event, count - 1)
+    
+    def notify(self, checkout_request_id: str):
+        """Wake every waiter for this checkout request"""
+        event, _ = self._events.get(checkout_request_id, (None, 0))
+        if event is not None:
+            event.set()
+
+
+waiters = TransactionWaiters()
+
+
 def generate_password(business_short_code: str, passkey: str, timestamp: str) -> str:
     """Generate M-Pesa password for STK Push"""
     data_to_encode = f"{business_short_code}{passkey}{timestamp}"
@@ -76,6 +114,13 @@ def generate_password(business_short_code: str, passkey: str, timestamp: str) ->
     return encoded.decode('utf-8')
 
 
+def settled_expiry(now: datetime) -> Optional[datetime]:
+    """Expiry for a settled transaction, or None to keep it forever"""
+    if settings.mpesa_settled_retention_days is None:
+        return None
+    return now + timedelta(days=settings.mpesa_settled_retention_days)
+
+
 async def get_access_token() -> str:
     """Get M-Pesa OAuth access token"""
     consumer_key = MPesaConfig.get_consumer_key()
@@ -104,10 +149,7 @@ async def get_access_token() -> str:
 
 
 @router.post("/mpesa/stk-push")
-async def initiate_stk_push(
-    payment_request: MPesaPaymentRequest,
-    db: AsyncIOMotorDatabase = Depends(get_database)
-):
+async def initiate_stk_push(payment_request: MPesaPaymentRequest):
     """
     Initiate M-Pesa STK Push payment.
     Sends a payment prompt to the customer's phone.
@@ -134,7 +176,7 @@ async def initiate_stk_push(
             "Password": password,
             "Timestamp": timestamp,
             "TransactionType": "CustomerPayBillOnline",
-            "Amount": int(payment_request.amount),
+            "Amount": money.to_whole_units(money.to_cents(payment_request.amount)),
             "PartyA": payment_request.phone_number,
             "PartyB": business_short_code,
             "PhoneNumber": payment_request.phone_number,
@@ -149,21 +191,24 @@ async def initiate_stk_push(
         result = response.json()
         
         # Store transaction in database
-        transaction = {
-            "order_id": payment_request.order_id,
-            "phone_number": payment_request.phone_number,
-            "amount": payment_request.amount,
-            "merchant_request_id": result.get("MerchantRequestID"),
-            "checkout_request_id": result.get("CheckoutRequestID"),
-            "response_code": result.get("ResponseCode"),
-            "response_description": result.get("ResponseDescription"),
-            "customer_message": result.get("CustomerMessage"),
-            "status": "pending",
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
+        now = datetime.utcnow()
+        transaction = models.MPesaTransaction(
+            order_id=payment_request.order_id,
+            phone_number=payment_request.phone_number,
+            amount=payment_request.amount,
+            merchant_request_id=result.get("MerchantRequestID"),
+            checkout_request_id=result.get("CheckoutRequestID"),
+            response_code=result.get("ResponseCode"),
+            response_description=result.get("ResponseDescription"),
+            customer_message=result.get("CustomerMessage"),
+            status=models.MPesaTransactionStatus.PENDING,
+            created_at=now,
+            updated_at=now,
+            # Pending rows that never get a callback expire on their own
+            expires_at=now + timedelta(hours=settings.mpesa_pending_ttl_hours)
+        )
         
-        await db.mpesa_transactions.insert_one(transaction)
+        await transaction.insert()
         
         return {
             "success": True,
@@ -185,10 +230,7 @@ async def initiate_stk_push(
 
 
 @router.post("/mpesa/callback")
-async def mpesa_callback(
-    request: Request,
-    db: AsyncIOMotorDatabase = Depends(get_database)
-):
+async def mpesa_callback(request: Request):
     """
     Handle M-Pesa payment callback.
     Called by Safaricom when payment is completed or fails.
@@ -211,35 +253,42 @@ async def mpesa_callback(
                 callback_metadata[item.get("Name")] = item.get("Value")
         
         # Update transaction in database
+        now = datetime.utcnow()
         update_data = {
             "result_code": result_code,
             "result_description": result_desc,
-            "status": "success" if result_code == 0 else "failed",
+            "status": models.MPesaTransactionStatus.SUCCESS if result_code == 0 else models.MPesaTransactionStatus.FAILED,
             "mpesa_receipt_number": callback_metadata.get("MpesaReceiptNumber"),
             "transaction_date": callback_metadata.get("TransactionDate"),
-            "phone_number": callback_metadata.get("PhoneNumber"),
-            "updated_at": datetime.utcnow()
+            "updated_at": now,
+            "expires_at": settled_expiry(now)
         }
+        if callback_metadata.get("PhoneNumber"):
+            update_data["phone_number"] = str(callback_metadata.get("PhoneNumber"))
         
-        transaction = await db.mpesa_transactions.find_one_and_update(
+        collection = models.MPesaTransaction.get_motor_collection()
+        transaction = await collection.find_one_and_update(
             {"checkout_request_id": checkout_request_id},
             {"$set": update_data},
-            return_document=True
+            return_document=ReturnDocument.AFTER
         )
         
-        # Update order status if payment was successful
+        # Wake long-poll requests waiting on this checkout
+        if checkout_request_id:
+            waiters.notify(checkout_request_id)
+        
+        # Record the payment and confirm the order if it is still pending
         if result_code == 0 and transaction:
-            order_id = transaction.get("order_id")
-            await db.orders.update_one(
-                {"_id": order_id},
+            await order_state.transition_or_update(
+                transaction.get("order_id"),
+                models.OrderStatus.CONFIRMED,
                 {
-                    "$set": {
-                        "payment_status": "paid",
-                        "payment_method": "mpesa",
-                        "mpesa_receipt": callback_metadata.get("MpesaReceiptNumber"),
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+                    "payment_status": models.PaymentStatus.PAID,
+                    "payment_method": models.PaymentMethod.MPESA,
+                    "payment_reference": callback_metadata.get("MpesaReceiptNumber"),
+                },
+                changed_by="mpesa",
+                notes="Payment received via M-Pesa"
             )
         
         return {
@@ -269,17 +318,21 @@ async def get_mpesa_config():
     }
 
 
-@router.get("/mpesa/transaction/{checkout_request_id}")
-async def get_transaction_status(
-    checkout_request_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
-):
-    """
-    Check M-Pesa transaction status.
-    Returns the current status of a transaction.
-    """
-    transaction = await db.mpesa_transactions.find_one(
-        {"checkout_request_id": checkout_request_id}
+def transaction_status_payload(transaction: models.MPesaTransaction) -> dict:
+    """Public view of a transaction's status"""
+    return {
+        "status": transaction.status,
+        "result_code": transaction.result_code,
+        "result_description": transaction.result_description,
+        "mpesa_receipt_number": transaction.mpesa_receipt_number,
+        "amount": transaction.amount,
+        "phone_number": transaction.phone_number
+    }
+
+
+async def find_transaction(checkout_request_id: str) -> models.MPesaTransaction:
+    transaction = await models.MPesaTransaction.find_one(
+        models.MPesaTransaction.checkout_request_id == checkout_request_id
     )
     
     if not transaction:
@@ -287,12 +340,50 @@ async def get_transaction_status(
             status_code=404,
             detail="Transaction not found"
         )
-    
-    return {
-        "status": transaction.get("status"),
-        "result_code": transaction.get("result_code"),
-        "result_description": transaction.get("result_description"),
-        "mpesa_receipt_number": transaction.get("mpesa_receipt_number"),
-        "amount": transaction.get("amount"),
-        "phone_number": transaction.get("phone_number")
-    }
+    return transaction
+
+
+@router.get("/mpesa/transaction/{checkout_request_id}")
+async def get_transaction_status(checkout_request_id: str):
+    """
+    Check M-Pesa transaction status.
+    Returns the current status of a transaction.
+    """
+    transaction = await find_transaction(checkout_request_id)
+    return transaction_status_payload(transaction)
+
+
+@router.get("/mpesa/transaction/{checkout_request_id}/wait")
+async def wait_for_transaction_status(
+    checkout_request_id: str,
+    timeout: int = Query(default=25, ge=1, le=60, description="Seconds to wait for the callback")
+):
+    """
+    Long-poll M-Pesa transaction status.
+    Returns as soon as the transaction leaves "pending" or when the timeout
+    elapses (still pending). Clients simply re-issue the request on timeout.
+    """
+    # Register before the first read so a callback landing in between is not missed
+    event = waiters.acquire(checkout_request_id)
+    try:
+        transaction = await find_transaction(checkout_request_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        while transaction.status == models.MPesaTransactionStatus.PENDING:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                # The periodic re-read covers callbacks handled by another worker process
+                await asyncio.wait_for(
+                    event.wait(),
+                    timeout=min(remaining, settings.mpesa_wait_recheck_seconds)
+                )
+            except asyncio.TimeoutError:
+                pass
+            transaction = await find_transaction(checkout_request_id)
+        
+        return transaction_status_payload(transaction)
+    finally:
+        waiters.release(checkout_request_id)
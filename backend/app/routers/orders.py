@@ -1,12 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 
 from ..auth import get_current_active_user, get_current_admin_user
-from .. import crud, models, schemas
+from .. import crud, export_stream, models, order_archive, order_export, order_state, order_totals, schemas
+from ..config import settings
+from ..live_board import live_board
 from ..websocket import manager
 
 router = APIRouter()
 
+@order_state.on_transitions
+async def notify_order_status_changes(events: List[order_state.TransitionEvent]):
+    """Push committed status changes to customers and admins (one message per recipient)"""
+    if len(events) == 1:
+        await manager.notify_order_status_update(
+            order_id=str(events[0].order.id),
+            status=events[0].to_status,
+            customer_id=str(events[0].order.user_id)
+        )
+        return
+    
+    await manager.notify_order_status_batch([
+        {"order_id": str(event.order.id), "status": event.to_status, "customer_id": str(event.order.user_id)}
+        for event in events
+    ])
+
 @router.post("", response_model=models.Order)
 async def create_order(
     *,
@@ -31,6 +50,7 @@ async def create_order(
                 )
     
     order = await crud.crud_order.create(obj_in=order_in, user_id=current_user.id)
+    await live_board.order_created(order)
     
     # Notify admins via WebSocket about new order
     try:
@@ -71,6 +91,50 @@ async def read_my_orders(
     )
     return orders
 
+@router.get("/board")
+async def read_live_board(
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Active orders from the in-memory live board (Admin only); no database reads."""
+    return live_board.snapshot()
+
+@router.get("/export")
+async def stream_orders_export(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns; defaults to a flat order summary"),
+    status: Optional[schemas.OrderStatus] = Query(None),
+    order_type: Optional[models.OrderType] = Query(None),
+    payment_status: Optional[models.PaymentStatus] = Query(None),
+    user_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None, description="Orders created at or after"),
+    until: Optional[datetime] = Query(None, description="Orders created before"),
+    batch_size: Optional[int] = Query(None, ge=100, le=10000, description="Documents per cursor batch"),
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Stream matching orders (archived ones included) as NDJSON or CSV (Admin only)."""
+    try:
+        columns = export_stream.parse_fields(fields, order_export.STREAM_FIELDS, order_export.DEFAULT_STREAM_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filters = {
+        "status": status.value if status else None,
+        "order_type": order_type.value if order_type else None,
+        "payment_status": payment_status.value if payment_status else None,
+        "user_id": user_id,
+    }
+    query = order_totals.range_match(since, until, {key: value for key, value in filters.items() if value is not None})
+    include_archive = order_archive.archive_may_contain(since) and (
+        status is None or status.value in order_archive.TERMINAL_STATUSES
+    )
+    rows = order_export.order_rows(
+        query,
+        columns,
+        include_archive=include_archive,
+        batch_size=batch_size or settings.export_batch_size
+    )
+    return export_stream.export_response(rows, columns, format, "orders")
+
 @router.get("/{order_id}", response_model=models.Order)
 async def read_order(
     *,
@@ -116,22 +180,62 @@ async def update_order(
     order = await crud.crud_order.get(id=order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    if isinstance(order, models.ArchivedOrder):
+        raise HTTPException(status_code=409, detail="Archived orders cannot be changed")
+    previous_status = order.status
     
-    order = await crud.crud_order.update(db_obj=order, obj_in=order_in)
-    
-    # Notify customer via WebSocket about status update
-    if order_in.status:
-        try:
-            await manager.notify_order_status_update(
-                order_id=str(order.id),
-                status=order_in.status,
-                customer_id=str(order.user_id)
-            )
-        except Exception as e:
-            print(f"WebSocket notification error: {e}")
+    try:
+        order = await crud.crud_order.update(db_obj=order, obj_in=order_in, changed_by=current_user.id)
+    except order_state.InvalidTransition as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if order is None:
+        raise HTTPException(status_code=409, detail="Order status was changed by someone else; reload and try again")
     
+    # Status changes reach notifications and the live board as transitions
+    if order.status == previous_status:
+        await live_board.order_updated(order)
     return order
 
+@router.patch("/bulk-status", response_model=schemas.OrderBulkStatusResult)
+async def bulk_update_order_status(
+    *,
+    update_in: schemas.OrderBulkStatusUpdate,
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Move many orders to one status in a single write (Admin only)."""
+    events, rejected = await order_state.transition_many(
+        update_in.order_ids,
+        update_in.status,
+        changed_by=current_user.id,
+        notes=update_in.notes
+    )
+    return schemas.OrderBulkStatusResult(
+        updated=[str(event.order.id) for event in events],
+        rejected=rejected
+    )
+
+@router.post("/admin/archive")
+async def archive_old_orders(
+    older_than_days: Optional[int] = Query(None, ge=1),
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Move long-finished orders to the archive collection (Admin only); they stay readable."""
+    archived = await order_archive.archive_orders(older_than_days=older_than_days)
+    return {"archived": archived}
+
+@router.post("/admin/export")
+async def export_orders(
+    format: Literal["parquet", "arrow"] = Query("parquet"),
+    since: Optional[datetime] = Query(None, description="Orders created at or after"),
+    until: Optional[datetime] = Query(None, description="Orders created before"),
+    incremental: bool = Query(False, description="Only orders changed since the last incremental export"),
+    current_user: models.User = Depends(get_current_admin_user)
+):
+    """Write orders and order items to Parquet / Arrow IPC files under EXPORT_DIR (Admin only)."""
+    if not order_export.available():
+        raise HTTPException(status_code=400, detail="Exports need pyarrow installed on the server")
+    return await order_export.export_orders(format, since=since, until=until, incremental=incremental)
+
 @router.get("/stats/dashboard", response_model=schemas.DashboardStats)
 async def get_dashboard_stats(
     current_user: models.User = Depends(get_current_admin_user)
@@ -30,6 +30,7 @@ except Exception:  # pragma: no cover
     class SignatureVerificationError(StripeError):
         pass
 from ..database import get_db
+from .. import models, money, order_state
 from bson import ObjectId
 from datetime import datetime
 
@@ -79,15 +80,8 @@ async def create_payment_intent(request: CreatePaymentIntentRequest, db=Depends(
             pi_id = f"pi_{uuid.uuid4().hex[:24]}"
             secret = uuid.uuid4().hex[:24]
             simulated_client_secret = f"{pi_id}_secret_{secret}"
-            await orders_col.update_one(
-                _build_id_filter(request.order_id),
-                {
-                    "$set": {
-                        "payment_intent_id": pi_id,
-                        "payment_status": "PENDING",
-                        "updated_at": datetime.utcnow(),
-                    }
-                }
+            await order_state.update_fields(
+                order["_id"], {"payment_intent_id": pi_id, "payment_status": "PENDING"}
             )
             return PaymentIntentResponse(client_secret=simulated_client_secret, payment_intent_id=pi_id)
 
@@ -96,21 +90,14 @@ async def create_payment_intent(request: CreatePaymentIntentRequest, db=Depends(
             raise HTTPException(status_code=500, detail="Stripe SDK is not installed on the server")
 
         payment_intent = stripe.PaymentIntent.create(
-            amount=int(request.amount * 100),
+            amount=money.to_cents(request.amount),  # int(x * 100) loses a cent on e.g. 19.99
             currency=request.currency,
             metadata={"order_id": request.order_id, "integration_check": "accept_a_payment"},
             automatic_payment_methods={"enabled": True},
         )
 
-        await orders_col.update_one(
-            _build_id_filter(request.order_id),
-            {
-                "$set": {
-                    "payment_intent_id": payment_intent.id,
-                    "payment_status": "PENDING",
-                    "updated_at": datetime.utcnow()
-                }
-            }
+        await order_state.update_fields(
+            order["_id"], {"payment_intent_id": payment_intent.id, "payment_status": "PENDING"}
         )
         return PaymentIntentResponse(client_secret=payment_intent.client_secret, payment_intent_id=payment_intent.id)
 
@@ -143,18 +130,13 @@ async def stripe_webhook(request: Request, stripe_signature: Optional[str] = Hea
         order_id = payment_intent['metadata'].get('order_id')
         
         if order_id:
-            # Update order status
-            orders_col = db["orders"]
-            await orders_col.update_one(
-                _build_id_filter(order_id),
-                {
-                    "$set": {
-                        "payment_status": "PAID",
-                        "status": "CONFIRMED",
-                        "paid_at": datetime.utcnow(),
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+            # Mark paid and confirm the order (if it is still awaiting confirmation)
+            await order_state.transition_or_update(
+                order_id,
+                models.OrderStatus.CONFIRMED,
+                {"payment_status": models.PaymentStatus.PAID, "paid_at": datetime.utcnow()},
+                changed_by="stripe",
+                notes="Payment received via Stripe"
             )
     
     elif event['type'] == 'payment_intent.payment_failed':
@@ -162,17 +144,13 @@ async def stripe_webhook(request: Request, stripe_signature: Optional[str] = Hea
         order_id = payment_intent['metadata'].get('order_id')
         
         if order_id:
-            # Update order with failed payment
-            orders_col = db["orders"]
-            await orders_col.update_one(
-                _build_id_filter(order_id),
-                {
-                    "$set": {
-                        "payment_status": "FAILED",
-                        "status": "CANCELLED",
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+            # Record the failed payment and cancel the order where that is still allowed
+            await order_state.transition_or_update(
+                order_id,
+                models.OrderStatus.CANCELLED,
+                {"payment_status": models.PaymentStatus.FAILED},
+                changed_by="stripe",
+                notes="Payment failed"
             )
     
     return JSONResponse(content={"status": "success"})
@@ -202,16 +180,12 @@ async def confirm_payment(request: ConfirmPaymentRequest, db=Depends(get_db)):
     # If in simulation mode (no real keys or placeholder key), and payment_intent_id is fake
     if (not publishable_key or not secret_key or publishable_key == "pk_test_demo_placeholder") and request.payment_intent_id.startswith("pi_"):
         # Mark order as paid
-        await orders_col.update_one(
-            _build_id_filter(request.order_id),
-            {
-                "$set": {
-                    "payment_status": "PAID",
-                    "status": "CONFIRMED",
-                    "paid_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow(),
-                }
-            }
+        await order_state.transition_or_update(
+            order["_id"],
+            models.OrderStatus.CONFIRMED,
+            {"payment_status": models.PaymentStatus.PAID, "paid_at": datetime.utcnow()},
+            changed_by="stripe",
+            notes="Simulated payment confirmed"
         )
         return ConfirmPaymentResponse(status="succeeded", message="Simulated payment confirmed.")
 
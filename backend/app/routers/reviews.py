@@ -1,14 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Query, BackgroundTasks, Response
+from typing import Dict, List, Literal, Optional
+from typing_extensions import TypedDict
 from datetime import datetime
-from pydantic import BaseModel, Field
-from app.models import Review, ReviewStatus, User, Meal, Order
-from app.auth import get_current_user, get_current_admin_user
+from enum import Enum
+from pydantic import BaseModel, Field, TypeAdapter
+from app.models import Review, ReviewPhoto, ReviewStatus, ReviewVote, ReviewVoteType, User, Meal
+from app.auth import get_current_user, get_current_admin_user, get_current_user_optional
+from app.config import settings
+from app.crud import crud_meal_rating_stats, crud_order
+from app.export_stream import cursor_batches, export_response, parse_fields
+from app.images import UploadTooLarge
+from app.pagination import SortKeys, decode_cursor, encode_cursor, keyset_filter
+from app.storage import StoredImage, image_store
 from beanie import PydanticObjectId
 from beanie.operators import In, And
-import os
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateMany
+from pymongo.errors import DuplicateKeyError
 import uuid
-from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -27,9 +38,29 @@ class ReviewModeration(BaseModel):
     status: ReviewStatus
     moderation_notes: Optional[str] = None
 
+class BulkReviewModeration(ReviewModeration):
+    review_ids: List[str] = Field(..., min_length=1, max_length=500)
+
 class AdminResponse(BaseModel):
     admin_response: str
 
+class ReviewSort(str, Enum):
+    NEWEST = "newest"
+    MOST_HELPFUL = "most_helpful"
+    HIGHEST_RATING = "highest_rating"
+    LOWEST_RATING = "lowest_rating"
+
+# Each mode is served by a (meal_id, status, <field>, _id) index on reviews
+REVIEW_SORT_KEYS = {
+    ReviewSort.NEWEST: [("created_at", DESCENDING), ("_id", DESCENDING)],
+    ReviewSort.MOST_HELPFUL: [("helpful_count", DESCENDING), ("_id", DESCENDING)],
+    ReviewSort.HIGHEST_RATING: [("rating", DESCENDING), ("_id", DESCENDING)],
+    ReviewSort.LOWEST_RATING: [("rating", ASCENDING), ("_id", ASCENDING)],
+}
+
+# Moderation queue order, served by the (status, created_at, _id) index
+REVIEW_QUEUE_SORT_KEYS = [("created_at", ASCENDING), ("_id", ASCENDING)]
+
 class ReviewResponse(BaseModel):
     id: str
     user_id: str
@@ -40,6 +71,7 @@ class ReviewResponse(BaseModel):
     rating: int
     comment: Optional[str]
     photos: List[str]
+    photo_variants: List[ReviewPhoto] = []
     status: ReviewStatus
     is_verified: bool
     helpful_count: int
@@ -55,25 +87,139 @@ class MealRatingStats(BaseModel):
     total_reviews: int
     rating_distribution: dict  # {1: count, 2: count, ...}
 
-# Helper function to save uploaded photo
-async def save_review_photo(file: UploadFile) -> str:
-    """Save uploaded review photo and return the URL"""
-    # Create reviews directory if it doesn't exist
-    upload_dir = Path("uploads/reviews")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = upload_dir / unique_filename
-    
-    # Save file
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+def build_rating_stats(meal_id: str, stats) -> MealRatingStats:
+    """Build the public stats view from a MealRatingStats document (or None)"""
+    if not stats or stats.rating_count <= 0:
+        return MealRatingStats(
+            meal_id=meal_id,
+            average_rating=0.0,
+            total_reviews=0,
+            rating_distribution={1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+        )
     
-    # Return relative URL
-    return f"/uploads/reviews/{unique_filename}"
+    return MealRatingStats(
+        meal_id=meal_id,
+        average_rating=round(stats.rating_sum / stats.rating_count, 1),
+        total_reviews=stats.rating_count,
+        rating_distribution={rating: stats.histogram.get(str(rating), 0) for rating in range(1, 6)}
+    )
+
+# Review list responses are built straight from projected documents:
+# one bulk validation (or none, for approved public reviews) and one
+# dump_json per page, instead of a Review plus a ReviewResponse per row.
+REVIEW_RESPONSE_PROJECTION = {field: 1 for field in ReviewResponse.model_fields if field != "id"}
+
+# Fields that may be missing on documents written before they were added
+REVIEW_ROW_DEFAULTS = {
+    "order_id": None,
+    "comment": None,
+    "is_verified": False,
+    "helpful_count": 0,
+    "unhelpful_count": 0,
+    "admin_response": None,
+    "admin_response_at": None,
+    "updated_at": None,
+}
+
+review_responses_adapter = TypeAdapter(List[ReviewResponse])
+
+# Columns GET /reviews/export can stream; photo lists are JSON-encoded in CSV
+REVIEW_EXPORT_FIELDS = list(ReviewResponse.model_fields)
+REVIEW_EXPORT_DEFAULT_FIELDS = [field for field in REVIEW_EXPORT_FIELDS if field not in ("photos", "photo_variants")]
+
+class PublicReviewPhoto(TypedDict):
+    url: str
+    variants: Dict[str, str]
+
+class PublicReviewRow(TypedDict):
+    """Serialization-only mirror of ReviewResponse for already-validated rows"""
+    id: str
+    user_id: str
+    user_name: str
+    meal_id: str
+    meal_name: str
+    order_id: Optional[str]
+    rating: int
+    comment: Optional[str]
+    photos: List[str]
+    photo_variants: List[PublicReviewPhoto]
+    status: str
+    is_verified: bool
+    helpful_count: int
+    unhelpful_count: int
+    admin_response: Optional[str]
+    admin_response_at: Optional[datetime]
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+public_review_rows_adapter = TypeAdapter(List[PublicReviewRow])
+
+def review_row(doc: dict) -> dict:
+    """Shape a raw review document like ReviewResponse (in place)"""
+    doc["id"] = doc.pop("_id")
+    doc["user_name"] = doc.get("user_name") or "Anonymous"
+    doc["meal_name"] = doc.get("meal_name") or "Unknown"
+    doc.setdefault("photos", [])
+    doc.setdefault("photo_variants", [])
+    for field, default in REVIEW_ROW_DEFAULTS.items():
+        doc.setdefault(field, default)
+    return doc
+
+def review_response(review: Review) -> ReviewResponse:
+    """Response for a single review document"""
+    return ReviewResponse.model_validate(review_row(review.model_dump(by_alias=True)))
+
+async def review_list_response(
+    query: dict,
+    skip: int,
+    limit: int,
+    trusted: bool = False,
+    sort_keys: SortKeys = REVIEW_SORT_KEYS[ReviewSort.NEWEST],
+    cursor_tag: Optional[str] = None
+) -> Response:
+    """
+    Page of reviews as a ready-to-send JSON response (newest first by default).
+    trusted=True skips validation; use it only for approved public reviews,
+    whose documents were validated by the Review model when written.
+    With a cursor_tag, a full page carries an X-Next-Cursor header.
+    """
+    docs = await Review.get_motor_collection().find(
+        query, REVIEW_RESPONSE_PROJECTION
+    ).sort(list(sort_keys)).skip(skip).limit(limit).to_list(length=None)
+    
+    headers = {}
+    if cursor_tag is not None and docs and len(docs) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(sort_keys, docs[-1], tag=cursor_tag, defaults=REVIEW_ROW_DEFAULTS)
+    rows = [review_row(doc) for doc in docs]
+    
+    if trusted:
+        body = public_review_rows_adapter.dump_json(rows)
+    else:
+        body = review_responses_adapter.dump_json(review_responses_adapter.validate_python(rows))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Helper function to save uploaded photo
+async def save_review_photo(file: UploadFile) -> StoredImage:
+    """Stream an uploaded review photo into the image store (size-capped, deduplicated)"""
+    try:
+        return await image_store.save_upload(file, max_bytes=settings.max_file_size)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"File {file.filename} is too large: {e}")
+
+async def build_review_photo_variants(review_id: str, photo: StoredImage):
+    """Background task: render resized WebP variants (once per image) and attach their URLs"""
+    try:
+        variants = await image_store.ensure_variants(photo.key)
+    except Exception as e:
+        logger.error(f"Could not build variants for {photo.key}: {e}")
+        return
+    
+    # The same image may appear more than once, so update every matching entry
+    await Review.get_motor_collection().update_one(
+        {"_id": review_id},
+        {"$set": {"photo_variants.$[photo].variants": variants}},
+        array_filters=[{"photo.url": photo.url}]
+    )
 
 @router.post("", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 async def create_review(
@@ -89,7 +235,7 @@ async def create_review(
     # Check if order exists and belongs to user (if order_id provided)
     is_verified = False
     if review_data.order_id:
-        order = await Order.get(review_data.order_id)
+        order = await crud_order.get(review_data.order_id)  # older orders may be archived
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         if order.user_id != current_user.id:
@@ -127,30 +273,15 @@ async def create_review(
     )
     
     await review.insert()
+    if review.status == ReviewStatus.APPROVED:
+        await crud_meal_rating_stats.apply(review.meal_id, added=review.rating)
     
-    return ReviewResponse(
-        id=review.id,
-        user_id=review.user_id,
-        user_name=review.user_name or "Anonymous",
-        meal_id=review.meal_id,
-        meal_name=review.meal_name or "Unknown",
-        order_id=review.order_id,
-        rating=review.rating,
-        comment=review.comment,
-        photos=review.photos,
-        status=review.status,
-        is_verified=review.is_verified,
-        helpful_count=review.helpful_count,
-        unhelpful_count=review.unhelpful_count,
-        admin_response=review.admin_response,
-        admin_response_at=review.admin_response_at,
-        created_at=review.created_at,
-        updated_at=review.updated_at
-    )
+    return review_response(review)
 
 @router.post("/{review_id}/photos")
 async def upload_review_photos(
     review_id: str,
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user)
 ):
@@ -165,20 +296,31 @@ async def upload_review_photos(
     if len(review.photos) + len(files) > 5:
         raise HTTPException(status_code=400, detail="Maximum 5 photos allowed per review")
     
-    # Save photos
-    photo_urls = []
+    # Save photos (identical images are stored once and share a URL)
+    stored_photos = []
     for file in files:
         # Validate file type
         if not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail=f"File {file.filename} is not an image")
         
-        photo_url = await save_review_photo(file)
-        photo_urls.append(photo_url)
+        stored_photos.append(await save_review_photo(file))
+    photo_urls = [photo.url for photo in stored_photos]
+    
+    # Update review without rewriting the whole document
+    await Review.get_motor_collection().update_one(
+        {"_id": review_id},
+        {
+            "$push": {
+                "photos": {"$each": photo_urls},
+                "photo_variants": {"$each": [ReviewPhoto(url=url).model_dump() for url in photo_urls]},
+            },
+            "$set": {"updated_at": datetime.utcnow()},
+        }
+    )
     
-    # Update review
-    review.photos.extend(photo_urls)
-    review.updated_at = datetime.utcnow()
-    await review.save()
+    # Thumbnails and responsive sizes are rendered off the request path
+    for photo in stored_photos:
+        background_tasks.add_task(build_review_photo_variants, review_id, photo)
     
     return {"message": "Photos uploaded successfully", "photos": photo_urls}
 
@@ -187,74 +329,45 @@ async def get_meal_reviews(
     meal_id: str,
     skip: int = 0,
     limit: int = 20,
-    status_filter: Optional[ReviewStatus] = None
+    status_filter: Optional[ReviewStatus] = None,
+    sort: ReviewSort = ReviewSort.NEWEST,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; replaces skip")
 ):
     """Get all reviews for a specific meal"""
-    query = Review.find(Review.meal_id == meal_id)
-    
-    # Filter by status (default to APPROVED for public view)
-    if status_filter:
-        query = query.find(Review.status == status_filter)
-    else:
-        query = query.find(Review.status == ReviewStatus.APPROVED)
-    
-    reviews = await query.sort(-Review.created_at).skip(skip).limit(limit).to_list()
-    
-    return [
-        ReviewResponse(
-            id=review.id,
-            user_id=review.user_id,
-            user_name=review.user_name or "Anonymous",
-            meal_id=review.meal_id,
-            meal_name=review.meal_name or "Unknown",
-            order_id=review.order_id,
-            rating=review.rating,
-            comment=review.comment,
-            photos=review.photos,
-            status=review.status,
-            is_verified=review.is_verified,
-            helpful_count=review.helpful_count,
-            unhelpful_count=review.unhelpful_count,
-            admin_response=review.admin_response,
-            admin_response_at=review.admin_response_at,
-            created_at=review.created_at,
-            updated_at=review.updated_at
-        )
-        for review in reviews
-    ]
+    # Default to APPROVED for public view; one compound filter instead of chained finds
+    review_status = status_filter or ReviewStatus.APPROVED
+    query = {"meal_id": meal_id, "status": review_status.value}
+    
+    sort_keys = REVIEW_SORT_KEYS[sort]
+    if cursor:
+        try:
+            query.update(keyset_filter(sort_keys, decode_cursor(cursor, sort_keys, tag=sort.value)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        skip = 0
+    
+    return await review_list_response(
+        query,
+        skip=skip,
+        limit=limit,
+        trusted=review_status == ReviewStatus.APPROVED,
+        sort_keys=sort_keys,
+        cursor_tag=sort.value
+    )
 
 @router.get("/meal/{meal_id}/stats", response_model=MealRatingStats)
 async def get_meal_rating_stats(meal_id: str):
     """Get rating statistics for a meal"""
-    reviews = await Review.find(
-        Review.meal_id == meal_id,
-        Review.status == ReviewStatus.APPROVED
-    ).to_list()
-    
-    if not reviews:
-        return MealRatingStats(
-            meal_id=meal_id,
-            average_rating=0.0,
-            total_reviews=0,
-            rating_distribution={1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        )
-    
-    # Calculate stats
-    total_reviews = len(reviews)
-    total_rating = sum(review.rating for review in reviews)
-    average_rating = round(total_rating / total_reviews, 1)
-    
-    # Rating distribution
-    rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-    for review in reviews:
-        rating_distribution[review.rating] += 1
-    
-    return MealRatingStats(
-        meal_id=meal_id,
-        average_rating=average_rating,
-        total_reviews=total_reviews,
-        rating_distribution=rating_distribution
-    )
+    stats = await crud_meal_rating_stats.get(meal_id)
+    return build_rating_stats(meal_id, stats)
+
+@router.get("/stats", response_model=List[MealRatingStats])
+async def get_meals_rating_stats(
+    meal_ids: List[str] = Query(..., max_length=200, description="Repeat for each meal id")
+):
+    """Get rating statistics for many meals at once"""
+    stats = await crud_meal_rating_stats.get_many(meal_ids)
+    return [build_rating_stats(meal_id, stats.get(meal_id)) for meal_id in meal_ids]
 
 @router.get("/user/me", response_model=List[ReviewResponse])
 async def get_my_reviews(
@@ -263,32 +376,7 @@ async def get_my_reviews(
     limit: int = 20
 ):
     """Get current user's reviews"""
-    reviews = await Review.find(
-        Review.user_id == current_user.id
-    ).sort(-Review.created_at).skip(skip).limit(limit).to_list()
-    
-    return [
-        ReviewResponse(
-            id=review.id,
-            user_id=review.user_id,
-            user_name=review.user_name or "Anonymous",
-            meal_id=review.meal_id,
-            meal_name=review.meal_name or "Unknown",
-            order_id=review.order_id,
-            rating=review.rating,
-            comment=review.comment,
-            photos=review.photos,
-            status=review.status,
-            is_verified=review.is_verified,
-            helpful_count=review.helpful_count,
-            unhelpful_count=review.unhelpful_count,
-            admin_response=review.admin_response,
-            admin_response_at=review.admin_response_at,
-            created_at=review.created_at,
-            updated_at=review.updated_at
-        )
-        for review in reviews
-    ]
+    return await review_list_response({"user_id": current_user.id}, skip=skip, limit=limit)
 
 @router.put("/{review_id}", response_model=ReviewResponse)
 async def update_review(
@@ -304,34 +392,23 @@ async def update_review(
     if review.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this review")
     
-    # Update fields
-    if review_data.rating is not None:
-        review.rating = review_data.rating
-    if review_data.comment is not None:
-        review.comment = review_data.comment
-    
-    review.updated_at = datetime.utcnow()
-    await review.save()
-    
-    return ReviewResponse(
-        id=review.id,
-        user_id=review.user_id,
-        user_name=review.user_name or "Anonymous",
-        meal_id=review.meal_id,
-        meal_name=review.meal_name or "Unknown",
-        order_id=review.order_id,
-        rating=review.rating,
-        comment=review.comment,
-        photos=review.photos,
-        status=review.status,
-        is_verified=review.is_verified,
-        helpful_count=review.helpful_count,
-        unhelpful_count=review.unhelpful_count,
-        admin_response=review.admin_response,
-        admin_response_at=review.admin_response_at,
-        created_at=review.created_at,
-        updated_at=review.updated_at
+    # $set only the edited fields, so a concurrent moderation or vote is kept;
+    # the pre-image gives the status and rating the rating aggregate holds
+    edits = review_data.model_dump(exclude_none=True)
+    edits["updated_at"] = datetime.utcnow()
+    previous = await Review.get_motor_collection().find_one_and_update(
+        {"_id": review_id},
+        {"$set": edits},
+        return_document=ReturnDocument.BEFORE
     )
+    if not previous:
+        raise HTTPException(status_code=404, detail="Review not found")
+    
+    rating = edits.get("rating", previous["rating"])
+    if previous["status"] == ReviewStatus.APPROVED and rating != previous["rating"]:
+        await crud_meal_rating_stats.apply(previous["meal_id"], added=rating, removed=previous["rating"])
+    
+    return review_response(Review.model_validate({**previous, **edits}))
 
 @router.delete("/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_review(
@@ -348,32 +425,124 @@ async def delete_review(
         raise HTTPException(status_code=403, detail="Not authorized to delete this review")
     
     await review.delete()
+    if review.status == ReviewStatus.APPROVED:
+        await crud_meal_rating_stats.apply(review.meal_id, removed=review.rating)
+
+async def record_review_vote(review_id: str, vote: ReviewVoteType, user: Optional[User]) -> dict:
+    """
+    Count a helpful/unhelpful vote with a single atomic $inc.
+    With dedup enabled, a signed-in user's repeat vote is a no-op and
+    switching sides moves the vote from one counter to the other.
+    """
+    field = "helpful_count" if vote == ReviewVoteType.HELPFUL else "unhelpful_count"
+    other = "unhelpful_count" if vote == ReviewVoteType.HELPFUL else "helpful_count"
+    inc = {field: 1}
+    
+    if settings.review_vote_dedup and user is not None:
+        now = datetime.utcnow()
+        try:
+            previous = await ReviewVote.get_motor_collection().find_one_and_update(
+                {"review_id": review_id, "user_id": user.id},
+                {
+                    "$set": {"vote": vote, "updated_at": now},
+                    "$setOnInsert": {"_id": str(uuid.uuid4()), "created_at": now},
+                },
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # A concurrent request from the same user inserted the vote first
+            previous = {"vote": vote}
+        
+        if previous and previous["vote"] == vote:
+            inc = {}
+        elif previous:
+            inc = {field: 1, other: -1}
+    
+    counts_projection = {"helpful_count": 1, "unhelpful_count": 1}
+    collection = Review.get_motor_collection()
+    if inc:
+        counts = await collection.find_one_and_update(
+            {"_id": review_id},
+            {"$inc": inc},
+            projection=counts_projection,
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        counts = await collection.find_one({"_id": review_id}, counts_projection)
+    
+    if not counts:
+        if user is not None:
+            await ReviewVote.find_one(ReviewVote.review_id == review_id, ReviewVote.user_id == user.id).delete()
+        raise HTTPException(status_code=404, detail="Review not found")
+    return counts
 
 @router.post("/{review_id}/helpful")
-async def mark_review_helpful(review_id: str):
+async def mark_review_helpful(
+    review_id: str,
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
     """Mark a review as helpful"""
-    review = await Review.get(review_id)
-    if not review:
-        raise HTTPException(status_code=404, detail="Review not found")
-    
-    review.helpful_count += 1
-    await review.save()
+    counts = await record_review_vote(review_id, ReviewVoteType.HELPFUL, current_user)
     
-    return {"message": "Review marked as helpful", "helpful_count": review.helpful_count}
+    return {"message": "Review marked as helpful", "helpful_count": counts["helpful_count"]}
 
 @router.post("/{review_id}/unhelpful")
-async def mark_review_unhelpful(review_id: str):
+async def mark_review_unhelpful(
+    review_id: str,
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
     """Mark a review as unhelpful"""
-    review = await Review.get(review_id)
-    if not review:
-        raise HTTPException(status_code=404, detail="Review not found")
-    
-    review.unhelpful_count += 1
-    await review.save()
+    counts = await record_review_vote(review_id, ReviewVoteType.UNHELPFUL, current_user)
     
-    return {"message": "Review marked as unhelpful", "unhelpful_count": review.unhelpful_count}
+    return {"message": "Review marked as unhelpful", "unhelpful_count": counts["unhelpful_count"]}
 
 # Admin endpoints
+@router.get("/export")
+async def export_reviews(
+    current_admin: User = Depends(get_current_admin_user),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns; defaults to everything but photos"),
+    status_filter: Optional[ReviewStatus] = None,
+    meal_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    max_rating: Optional[int] = Query(None, ge=1, le=5),
+    since: Optional[datetime] = Query(None, description="Reviews created at or after"),
+    until: Optional[datetime] = Query(None, description="Reviews created before"),
+    batch_size: Optional[int] = Query(None, ge=100, le=10000, description="Documents per cursor batch")
+):
+    """Stream matching reviews as NDJSON or CSV (admin only)"""
+    try:
+        columns = parse_fields(fields, REVIEW_EXPORT_FIELDS, REVIEW_EXPORT_DEFAULT_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query: dict = {}
+    if status_filter:
+        query["status"] = status_filter.value
+    if meal_id:
+        query["meal_id"] = meal_id
+    if user_id:
+        query["user_id"] = user_id
+    rating = {key: value for key, value in (("$gte", min_rating), ("$lte", max_rating)) if value is not None}
+    if rating:
+        query["rating"] = rating
+    created = {key: value for key, value in (("$gte", since), ("$lt", until)) if value is not None}
+    if created:
+        query["created_at"] = created
+    
+    batch_size = batch_size or settings.export_batch_size
+    cursor = Review.get_motor_collection().find(
+        query, {field: 1 for field in columns if field != "id"}, batch_size=batch_size
+    )
+    
+    async def rows():
+        async for batch in cursor_batches(cursor, batch_size):
+            yield [review_row(doc) for doc in batch]
+    
+    return export_response(rows(), columns, format, "reviews")
+
 @router.get("/admin/all", response_model=List[ReviewResponse])
 async def get_all_reviews_admin(
     current_admin: User = Depends(get_current_admin_user),
@@ -382,35 +551,58 @@ async def get_all_reviews_admin(
     limit: int = 50
 ):
     """Get all reviews (admin only)"""
-    query = Review.find()
+    query = {"status": status_filter.value} if status_filter else {}
     
-    if status_filter:
-        query = query.find(Review.status == status_filter)
-    
-    reviews = await query.sort(-Review.created_at).skip(skip).limit(limit).to_list()
-    
-    return [
-        ReviewResponse(
-            id=review.id,
-            user_id=review.user_id,
-            user_name=review.user_name or "Anonymous",
-            meal_id=review.meal_id,
-            meal_name=review.meal_name or "Unknown",
-            order_id=review.order_id,
-            rating=review.rating,
-            comment=review.comment,
-            photos=review.photos,
-            status=review.status,
-            is_verified=review.is_verified,
-            helpful_count=review.helpful_count,
-            unhelpful_count=review.unhelpful_count,
-            admin_response=review.admin_response,
-            admin_response_at=review.admin_response_at,
-            created_at=review.created_at,
-            updated_at=review.updated_at
-        )
-        for review in reviews
-    ]
+    return await review_list_response(query, skip=skip, limit=limit)
+
+@router.get("/admin/queue", response_model=List[ReviewResponse])
+async def get_moderation_queue(
+    current_admin: User = Depends(get_current_admin_user),
+    status_filter: ReviewStatus = ReviewStatus.PENDING,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page")
+):
+    """Reviews awaiting moderation, oldest first (admin only)"""
+    query = {"status": status_filter.value}
+    if cursor:
+        try:
+            query.update(keyset_filter(
+                REVIEW_QUEUE_SORT_KEYS,
+                decode_cursor(cursor, REVIEW_QUEUE_SORT_KEYS, tag="queue")
+            ))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return await review_list_response(
+        query,
+        skip=0,
+        limit=limit,
+        sort_keys=REVIEW_QUEUE_SORT_KEYS,
+        cursor_tag="queue"
+    )
+
+def moderation_update(moderation: ReviewModeration, admin_id: str) -> dict:
+    """$set document for a moderation decision"""
+    update = {
+        "status": moderation.status,
+        "moderation_notes": moderation.moderation_notes,
+        "moderated_by": admin_id,
+        "moderated_at": datetime.utcnow(),
+    }
+    if moderation.status == ReviewStatus.FLAGGED:
+        update["flagged_reason"] = moderation.moderation_notes
+    return update
+
+def rating_transition(previous_status: str, rating: int, new_status: ReviewStatus) -> dict:
+    """Rating aggregate $inc for moving a review between statuses"""
+    was_approved = previous_status == ReviewStatus.APPROVED
+    is_approved = new_status == ReviewStatus.APPROVED
+    if was_approved == is_approved:
+        return {}
+    return crud_meal_rating_stats.build_inc(
+        added=rating if is_approved else None,
+        removed=rating if was_approved else None
+    )
 
 @router.put("/admin/{review_id}/moderate")
 async def moderate_review(
@@ -419,21 +611,77 @@ async def moderate_review(
     current_admin: User = Depends(get_current_admin_user)
 ):
     """Moderate a review (admin only)"""
-    review = await Review.get(review_id)
-    if not review:
+    # Single atomic write; the previous document tells us which status we left
+    previous = await Review.get_motor_collection().find_one_and_update(
+        {"_id": review_id},
+        {"$set": moderation_update(moderation, current_admin.id)},
+        projection={"meal_id": 1, "rating": 1, "status": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not previous:
         raise HTTPException(status_code=404, detail="Review not found")
     
-    review.status = moderation.status
-    review.moderation_notes = moderation.moderation_notes
-    review.moderated_by = current_admin.id
-    review.moderated_at = datetime.utcnow()
-    
-    if moderation.status == ReviewStatus.FLAGGED:
-        review.flagged_reason = moderation.moderation_notes
-    
-    await review.save()
+    inc = rating_transition(previous["status"], previous["rating"], moderation.status)
+    if inc:
+        await crud_meal_rating_stats.apply_many({previous["meal_id"]: inc})
     
-    return {"message": "Review moderated successfully", "status": review.status}
+    return {"message": "Review moderated successfully", "status": moderation.status}
+
+@router.post("/admin/moderate/bulk")
+async def bulk_moderate_reviews(
+    moderation: BulkReviewModeration,
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Apply one moderation decision to many reviews (admin only)"""
+    review_ids = list(dict.fromkeys(moderation.review_ids))
+    collection = Review.get_motor_collection()
+    
+    # Observe the current status of every review, then write one UpdateMany per
+    # observed status guarded by that status, so rating deltas stay exact
+    previous = await collection.find(
+        {"_id": {"$in": review_ids}},
+        {"meal_id": 1, "rating": 1, "status": 1}
+    ).to_list(length=None)
+    
+    by_status: Dict[str, List[str]] = {}
+    for doc in previous:
+        by_status.setdefault(doc["status"], []).append(doc["_id"])
+    
+    update = moderation_update(moderation, current_admin.id)
+    matched = 0
+    if by_status:
+        result = await collection.bulk_write(
+            [
+                UpdateMany({"_id": {"$in": ids}, "status": previous_status}, {"$set": update})
+                for previous_status, ids in by_status.items()
+            ],
+            ordered=False
+        )
+        matched = result.matched_count
+    
+    # Merge per-review deltas into one $inc per meal
+    incs: Dict[str, dict] = {}
+    for doc in previous:
+        inc = rating_transition(doc["status"], doc["rating"], moderation.status)
+        meal_inc = incs.setdefault(doc["meal_id"], {})
+        for field, value in inc.items():
+            meal_inc[field] = meal_inc.get(field, 0) + value
+    incs = {meal_id: inc for meal_id, inc in incs.items() if inc}
+    
+    if matched == len(previous):
+        await crud_meal_rating_stats.apply_many(incs)
+    elif incs:
+        # A review changed status (or was deleted) between the read and the
+        # write, so the observed deltas may be wrong: rebuild those meals
+        await crud_meal_rating_stats.recompute(meal_ids=list(incs))
+    
+    found = {doc["_id"] for doc in previous}
+    return {
+        "message": "Reviews moderated successfully",
+        "status": moderation.status,
+        "moderated": matched,
+        "not_found": [review_id for review_id in review_ids if review_id not in found],
+    }
 
 @router.post("/admin/{review_id}/respond")
 async def respond_to_review(
@@ -442,13 +690,27 @@ async def respond_to_review(
     current_admin: User = Depends(get_current_admin_user)
 ):
     """Add admin response to a review"""
-    review = await Review.get(review_id)
-    if not review:
+    # Only the response fields are written; status and vote counters are left alone
+    result = await Review.get_motor_collection().update_one(
+        {"_id": review_id},
+        {
+            "$set": {
+                "admin_response": response.admin_response,
+                "admin_response_at": datetime.utcnow(),
+                "admin_responder_id": current_admin.id,
+            }
+        }
+    )
+    if not result.matched_count:
         raise HTTPException(status_code=404, detail="Review not found")
     
-    review.admin_response = response.admin_response
-    review.admin_response_at = datetime.utcnow()
-    review.admin_responder_id = current_admin.id
-    await review.save()
-    
-    return {"message": "Response added successfully", "admin_response": review.admin_response}
+    return {"message": "Response added successfully", "admin_response": response.admin_response}
+
+@router.post("/admin/stats/recompute")
+async def recompute_rating_stats(
+    meal_ids: Optional[List[str]] = None,
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Rebuild meal rating aggregates from approved reviews (admin only)"""
+    meals = await crud_meal_rating_stats.recompute(meal_ids=meal_ids)
+    return {"message": "Rating stats recomputed", "meals": meals}
@@ -1,25 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import Optional
 from datetime import datetime
+from pymongo import ReturnDocument
 
 from ..auth import get_current_admin_user
+from ..cache import settings_cache, etag_matches
 from .. import models, schemas
 
 router = APIRouter()
 
 @router.get("", response_model=schemas.RestaurantSettings)
-async def get_settings():
+async def get_settings(request: Request, response: Response):
     """Get restaurant settings (public)."""
-    # Try to get existing settings
-    settings = await models.RestaurantSettings.find_one()
+    # Served from the process-local cache (defaults are created on first load)
+    settings = await settings_cache.get()
     
-    # If no settings exist, create default settings
-    if not settings:
-        settings = models.RestaurantSettings()
-        await settings.insert()
+    # Let browsers revalidate with If-None-Match instead of re-downloading
+    etag = settings_cache.etag(settings)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
     
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
     return settings
 
+async def apply_settings_update(settings_id: str, update_data: dict) -> models.RestaurantSettings:
+    """$set the fields and $inc the version in one write, so concurrent saves never share a version"""
+    doc = await models.RestaurantSettings.get_motor_collection().find_one_and_update(
+        {"_id": settings_id},
+        {"$set": {**update_data, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Settings not found. Please create settings first.")
+    return models.RestaurantSettings.model_validate(doc)
+
 @router.post("", response_model=schemas.RestaurantSettings)
 async def update_settings(
     *,
@@ -36,14 +51,9 @@ async def update_settings(
         await settings.insert()
     else:
         # Update existing settings
-        update_data = settings_in.dict()
-        update_data["updated_at"] = datetime.utcnow()
-        
-        for field, value in update_data.items():
-            setattr(settings, field, value)
-        
-        await settings.save()
+        settings = await apply_settings_update(settings.id, settings_in.dict())
     
+    await settings_cache.saved(settings)
     return settings
 
 @router.put("", response_model=schemas.RestaurantSettings)
@@ -60,12 +70,7 @@ async def partial_update_settings(
         raise HTTPException(status_code=404, detail="Settings not found. Please create settings first.")
     
     # Update only provided fields
-    update_data = settings_in.dict(exclude_unset=True)
-    update_data["updated_at"] = datetime.utcnow()
-    
-    for field, value in update_data.items():
-        setattr(settings, field, value)
-    
-    await settings.save()
+    settings = await apply_settings_update(settings.id, settings_in.dict(exclude_unset=True))
     
+    await settings_cache.saved(settings)
     return settings
@@ -5,7 +5,10 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from typing import Optional
 import logging
 
+from ..auth import verify_token
+from ..live_board import live_board
 from ..websocket import manager
+from .. import crud, models
 
 logger = logging.getLogger(__name__)
 
@@ -86,3 +89,43 @@ async def websocket_customer_endpoint(
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         manager.disconnect(websocket, client_type="customer", user_id=user_id)
+
+
+@router.websocket("/ws/admin/board")
+async def websocket_admin_board(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None)
+):
+    """
+    Live board of active orders for kitchen/admin screens
+    Connect with: ws://localhost:8000/api/v1/ws/admin/board?token=<jwt_token>
+    
+    The first message is {"type": "board_snapshot", "seq", "orders"}; after
+    that {"type": "board_delta", "seq", "upserted", "removed"} messages follow.
+    Ignore deltas whose seq is not greater than the last one applied; a new
+    board_snapshot replaces the whole board.
+    """
+    phone = verify_token(token) if token else None
+    user = await crud.crud_user.get_by_phone(phone=phone) if phone else None
+    if user is None or user.role != models.UserRole.ADMIN:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    await live_board.subscribe(websocket)
+    
+    try:
+        while True:
+            data = await websocket.receive_text()
+            
+            # Replies share the board's send queue so they stay ordered with deltas
+            if data == "ping":
+                live_board.send(websocket, {"type": "pong"})
+            elif data == "snapshot":
+                live_board.send(websocket, live_board.snapshot())
+    except WebSocketDisconnect:
+        logger.info("Admin board WebSocket disconnected")
+    except Exception as e:
+        logger.error(f"Board WebSocket error: {e}")
+    finally:
+        live_board.unsubscribe(websocket)
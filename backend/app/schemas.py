@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 # Enums
 class UserRole(str, Enum):
@@ -233,6 +234,15 @@ class OrderUpdate(BaseModel):
     payment_status: Optional[PaymentStatus] = None
     estimated_delivery_time: Optional[datetime] = None
 
+class OrderBulkStatusUpdate(BaseModel):
+    order_ids: List[str] = Field(..., min_length=1, max_length=200)
+    status: OrderStatus
+    notes: Optional[str] = None
+
+class OrderBulkStatusResult(BaseModel):
+    updated: List[str]
+    rejected: Dict[str, str]  # order_id -> reason
+
 class Order(OrderBase):
     id: str
     user_id: str
@@ -297,6 +307,14 @@ class PaginatedResponse(BaseModel):
     pages: int
 
 # Restaurant Settings
+def check_timezone(value: Optional[str]) -> Optional[str]:
+    if value is not None:
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {value}")
+    return value
+
 class RestaurantSettingsBase(BaseModel):
     restaurant_name: str
     restaurant_name_en: Optional[str] = None
@@ -314,6 +332,7 @@ class RestaurantSettingsBase(BaseModel):
     restaurant_address_he: Optional[str] = None
     opening_time: str
     closing_time: str
+    timezone: str = "UTC"
     delivery_fee: float
     minimum_order_amount: float
     delivery_radius_km: int
@@ -336,6 +355,8 @@ class RestaurantSettingsBase(BaseModel):
     theme_accent_foreground: Optional[str] = None
     theme_radius: Optional[str] = None
 
+    _timezone = field_validator("timezone")(check_timezone)
+
 class RestaurantSettingsUpdate(BaseModel):
     restaurant_name: Optional[str] = None
     restaurant_name_en: Optional[str] = None
@@ -353,6 +374,7 @@ class RestaurantSettingsUpdate(BaseModel):
     restaurant_address_he: Optional[str] = None
     opening_time: Optional[str] = None
     closing_time: Optional[str] = None
+    timezone: Optional[str] = None
     delivery_fee: Optional[float] = None
     minimum_order_amount: Optional[float] = None
     delivery_radius_km: Optional[int] = None
@@ -375,9 +397,12 @@ class RestaurantSettingsUpdate(BaseModel):
     theme_accent_foreground: Optional[str] = None
     theme_radius: Optional[str] = None
 
+    _timezone = field_validator("timezone")(check_timezone)
+
 class RestaurantSettings(RestaurantSettingsBase):
     id: str
     updated_at: datetime
+    version: int = 1
 
     class Config:
         from_attributes = True
\ No newline at end of file
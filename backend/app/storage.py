@@ -0,0 +1,193 @@
+"""
+Content-addressed image storage shared by meal and review images.
+
+Files are keyed by the SHA-256 of their bytes ("ab/abcdef...jpg"), so an
+identical upload is stored once and every URL is immutable and can be
+cached forever. Resized variants are keyed by their source hash
+("ab/abcdef..._thumb.webp") and are only rendered once per source.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+import asyncio
+import os
+import re
+import uuid
+
+from fastapi import UploadFile
+
+from .config import settings
+from .images import VARIANT_WIDTHS, generate_variants, stream_upload
+
+try:  # boto3 is only needed for the S3 backend
+    import boto3  # type: ignore
+except Exception:
+    boto3 = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Only keys produced by ImageStore are accepted back from clients
+KEY_PATTERN = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{64}(_[a-z0-9]+)?\.[a-z0-9]{1,5}$")
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+
+EXTENSION_CONTENT_TYPES = {ext: content_type for content_type, ext in CONTENT_TYPE_EXTENSIONS.items()}
+
+
+@dataclass
+class StoredImage:
+    key: str
+    url: str
+    size: int
+    deduplicated: bool = False
+
+
+class LocalImageBackend:
+    """Stores objects as files under a root directory"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    async def exists(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    async def put_file(self, key: str, source: Path, content_type: str):
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, target)  # atomic on the same filesystem
+
+    async def put_bytes(self, key: str, data: bytes, content_type: str):
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(f".{uuid.uuid4().hex}.tmp")
+        await asyncio.to_thread(temp.write_bytes, data)
+        os.replace(temp, target)
+
+    async def get_bytes(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.path(key).read_bytes)
+
+    def url(self, key: str) -> str:
+        return f"{settings.image_store_url_prefix}/{key}"
+
+
+class S3ImageBackend:
+    """Stores objects in an S3-compatible bucket (AWS S3, MinIO, R2, ...)"""
+
+    def __init__(self, bucket: str, public_base_url: str, **client_options):
+        if boto3 is None:
+            raise RuntimeError("boto3 is required for IMAGE_STORE_BACKEND=s3")
+        self.bucket = bucket
+        self.public_base_url = public_base_url.rstrip("/")
+        self.client = boto3.client("s3", **client_options)
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def _extra_args(self, content_type: str) -> dict:
+        return {"ContentType": content_type, "CacheControl": IMMUTABLE_CACHE_CONTROL}
+
+    async def put_file(self, key: str, source: Path, content_type: str):
+        try:
+            await asyncio.to_thread(
+                self.client.upload_file, str(source), self.bucket, key,
+                ExtraArgs=self._extra_args(content_type),
+            )
+        finally:
+            source.unlink(missing_ok=True)
+
+    async def put_bytes(self, key: str, data: bytes, content_type: str):
+        await asyncio.to_thread(
+            self.client.put_object, Bucket=self.bucket, Key=key, Body=data,
+            **self._extra_args(content_type),
+        )
+
+    async def get_bytes(self, key: str) -> bytes:
+        response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+        return await asyncio.to_thread(response["Body"].read)
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base_url}/{key}"
+
+
+class ImageStore:
+    """Deduplicating front end over a storage backend"""
+
+    def __init__(self, backend, temp_dir: Path):
+        self.backend = backend
+        self.temp_dir = temp_dir
+
+    @staticmethod
+    def extension_for(file: UploadFile) -> str:
+        ext = CONTENT_TYPE_EXTENSIONS.get((file.content_type or "").lower())
+        if ext:
+            return ext
+        name_ext = (file.filename or "").rsplit(".", 1)[-1].lower()
+        return name_ext if re.fullmatch(r"[a-z0-9]{1,5}", name_ext) else "jpg"
+
+    @staticmethod
+    def content_type_for(key: str) -> str:
+        return EXTENSION_CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+    @staticmethod
+    def variant_key(key: str, name: str) -> str:
+        return f"{key.rsplit('.', 1)[0]}_{name}.webp"
+
+    def url(self, key: str) -> str:
+        return self.backend.url(key)
+
+    async def save_upload(self, file: UploadFile, max_bytes: int) -> StoredImage:
+        """Stream an upload, hashing as it goes, and store it once per content hash"""
+        temp = self.temp_dir / f"{uuid.uuid4().hex}.upload"
+        size, digest = await stream_upload(file, temp, max_bytes=max_bytes)
+        key = f"{digest[:2]}/{digest}.{self.extension_for(file)}"
+
+        if await self.backend.exists(key):
+            temp.unlink(missing_ok=True)
+            return StoredImage(key=key, url=self.url(key), size=size, deduplicated=True)
+
+        await self.backend.put_file(key, temp, self.content_type_for(key))
+        return StoredImage(key=key, url=self.url(key), size=size)
+
+    async def ensure_variants(self, key: str) -> Dict[str, str]:
+        """Render (once) and store resized WebP variants; returns {name: url}"""
+        keys = {name: self.variant_key(key, name) for name in VARIANT_WIDTHS}
+        missing = [name for name, variant_key in keys.items() if not await self.backend.exists(variant_key)]
+
+        if missing:
+            rendered = await generate_variants(await self.backend.get_bytes(key))
+            for name in missing:
+                await self.backend.put_bytes(keys[name], rendered[name], "image/webp")
+
+        return {name: self.url(variant_key) for name, variant_key in keys.items()}
+
+
+def build_image_store() -> ImageStore:
+    """Create the store configured by IMAGE_STORE_BACKEND"""
+    temp_dir = Path(settings.upload_dir) / "tmp"
+    if settings.image_store_backend == "s3":
+        backend = S3ImageBackend(
+            bucket=settings.s3_bucket,
+            public_base_url=settings.s3_public_base_url,
+            endpoint_url=settings.s3_endpoint_url,
+            region_name=settings.s3_region,
+            aws_access_key_id=settings.s3_access_key_id,
+            aws_secret_access_key=settings.s3_secret_access_key,
+        )
+    else:
+        backend = LocalImageBackend(Path(settings.upload_dir) / "cas")
+    return ImageStore(backend, temp_dir)
+
+
+image_store = build_image_store()
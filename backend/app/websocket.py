@@ -1,7 +1,7 @@
 """
 WebSocket Manager for real-time notifications
 """
-from typing import Dict, Set
+from typing import Dict, List, Set
 from fastapi import WebSocket, WebSocketDisconnect
 import json
 import logging
@@ -120,6 +120,35 @@ class ConnectionManager:
         await self.broadcast_to_admins(message)
         logger.info(f"Notified about order {order_id} status: {status}")
 
+    
+    async def notify_order_status_batch(self, updates: List[dict]):
+        """
+        Notify about many status changes at once: one message per customer
+        (a plain order_status_update when they have a single order in the
+        batch) and one order_status_batch message for admins.
+        """
+        by_customer: Dict[str, List[dict]] = {}
+        for update in updates:
+            if update.get("customer_id"):
+                by_customer.setdefault(update["customer_id"], []).append(
+                    {"order_id": update["order_id"], "status": update["status"]}
+                )
+        
+        for customer_id, orders in by_customer.items():
+            if len(orders) == 1:
+                message = {"type": "order_status_update", "data": orders[0]}
+            else:
+                message = {"type": "order_status_batch", "data": {"orders": orders}}
+            await self.send_to_customer(customer_id, message)
+        
+        await self.broadcast_to_admins({
+            "type": "order_status_batch",
+            "data": {
+                "orders": [{"order_id": update["order_id"], "status": update["status"]} for update in updates]
+            }
+        })
+        logger.info(f"Notified about {len(updates)} order status changes")
+
 
 # Global connection manager instance
 manager = ConnectionManager()
@@ -0,0 +1,27 @@
+"""
+Move delivered/cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS from
+`orders` to `orders_archive`. Safe to run repeatedly (e.g. nightly from cron).
+
+Usage: python archive_orders.py [older_than_days]
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.database import connect_to_mongo, close_mongo_connection
+from app.order_archive import archive_orders
+
+async def main():
+    await connect_to_mongo()
+    older_than_days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    
+    print("🔄 Archiving finished orders...")
+    moved = await archive_orders(older_than_days=older_than_days)
+    print(f"✅ Moved {moved} order(s) to orders_archive")
+    
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
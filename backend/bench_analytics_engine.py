@@ -0,0 +1,137 @@
+"""
+Benchmark the analytics engines on synthetic orders.
+- loops: models.Order materialization + per-order Python loops (the old endpoints)
+- numpy: projected raw documents -> columnar snapshot -> vectorized group-bys
+- mongo: the order_totals aggregation pipelines, when a MongoDB is reachable
+  at MONGODB_URL (a throwaway database is created and dropped)
+
+Every engine computes all grouping keys plus per-meal totals.
+
+Usage: python bench_analytics_engine.py [order_count]
+"""
+import os
+import random
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+import bson
+
+from app import analytics_engine, models, money, order_totals
+from app.config import settings
+from bench_order_codec import build_orders, timed
+
+KEYS = list(order_totals.GROUP_KEYS)
+
+
+def loop_engine(raw: bytes):
+    orders = [models.Order.model_validate(doc) for doc in bson.decode_all(raw)]
+    results = {}
+    for key in KEYS:
+        groups = defaultdict(order_totals.Totals)
+        for order in orders:
+            group = {
+                "all": None,
+                "day": order.created_at.strftime("%Y-%m-%d"),
+                "month": order.created_at.strftime("%Y-%m"),
+                "hour": order.created_at.hour,
+                "status": order.status.value,
+                "order_type": order.order_type.value,
+                "payment_status": order.payment_status.value,
+            }[key]
+            totals = groups[group]
+            totals.orders += 1
+            if order.status == models.OrderStatus.DELIVERED:
+                totals.delivered_orders += 1
+                totals.revenue_cents += money.to_cents(order.total_amount)
+                totals.sold_meals += sum(item.quantity for item in order.items)
+        results[key] = dict(groups)
+    meals = {}
+    for order in orders:
+        if order.status != models.OrderStatus.DELIVERED:
+            continue
+        for item in order.items:
+            meal = meals.setdefault(item.meal_id, order_totals.MealTotals(meal_name=item.meal_name))
+            meal.quantity += item.quantity
+            meal.revenue_cents += money.to_cents(item.subtotal)
+    return results, meals
+
+
+def numpy_engine(raw_projected: bytes):
+    columns = analytics_engine.columns_from_docs(bson.decode_all(raw_projected))
+    return numpy_compute(columns)
+
+
+def numpy_compute(columns):
+    return {key: analytics_engine.totals_by(columns, key) for key in KEYS}, analytics_engine.meal_totals(columns)
+
+
+def mongo_engine(collection):
+    results = {}
+    for key in KEYS:
+        rows = collection.aggregate(order_totals.totals_pipeline(key, {}))
+        results[key] = {row["_id"]: order_totals._totals(row) for row in rows}
+    meals = list(collection.aggregate(order_totals.meal_pipeline({"status": order_totals.DELIVERED})))
+    return results, meals
+
+
+def connect_mongo():
+    try:
+        from pymongo import MongoClient
+        client = MongoClient(settings.mongodb_url, serverSelectionTimeoutMS=1000)
+        client.admin.command("ping")
+        return client
+    except Exception:
+        return None
+
+
+def main():
+    order_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(1)
+    orders = build_orders(order_count)
+    for order in orders:
+        order.status = rng.choice([models.OrderStatus.DELIVERED] * 4 + [models.OrderStatus.CANCELLED])
+        order.order_type = rng.choice(list(models.OrderType))
+    docs = [order.model_dump(by_alias=True, exclude={"revision_id"}) for order in orders]
+    raw = b"".join(bson.encode(doc) for doc in docs)
+    projected = b"".join(
+        bson.encode({field: doc[field] for field in analytics_engine.HOT_PROJECTION if "." not in field and field in doc}
+                    | {"items": [{f: item[f] for f in ("meal_id", "meal_name", "quantity", "subtotal", "subtotal_cents")}
+                                 for item in doc["items"]]})
+        for doc in docs
+    )
+
+    loop_results, loop_meals = loop_engine(raw)
+    numpy_results, numpy_meals = numpy_engine(projected)
+    assert numpy_results == loop_results and numpy_meals == loop_meals
+
+    columns = analytics_engine.columns_from_docs(bson.decode_all(projected))
+    rows = [
+        ("loops (models + Python)", timed(lambda: loop_engine(raw), repeat=2)),
+        ("numpy (decode + snapshot)", timed(lambda: numpy_engine(projected), repeat=3)),
+        ("numpy (cached snapshot)", timed(lambda: numpy_compute(columns), repeat=10)),
+    ]
+
+    client = connect_mongo()
+    if client is not None:
+        database = client[f"bench_analytics_{os.getpid()}"]
+        try:
+            database.orders.insert_many(docs)
+            mongo_results, _ = mongo_engine(database.orders)
+            assert mongo_results == loop_results
+            rows.append(("mongo (aggregation)", timed(lambda: mongo_engine(database.orders), repeat=3)))
+        finally:
+            client.drop_database(database.name)
+    else:
+        print(f"mongo: skipped (no MongoDB at {settings.mongodb_url})")
+
+    print(f"{order_count} orders, {len(KEYS)} groupings + meal totals per run\n")
+    print(f"{'engine':<28}{'ms/run':>10}{'orders/s':>14}")
+    for label, seconds in rows:
+        print(f"{label:<28}{seconds * 1000:>10.1f}{order_count / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
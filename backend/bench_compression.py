@@ -0,0 +1,121 @@
+"""
+Benchmark response compression for full menu payloads.
+Prints payload sizes per encoding and the per-request latency through
+CompressionMiddleware with and without the precompressed cache.
+
+Usage: python bench_compression.py [meal_count]
+"""
+import asyncio
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+import httpx
+from fastapi import FastAPI, Response
+
+from app.middleware import CompressionMiddleware, brotli
+
+
+def build_menu(meal_count: int) -> list:
+    """Synthetic multilingual menu shaped like GET /meals"""
+    return [
+        {
+            "id": f"5f1c7e2a-0000-4000-8000-{i:012d}",
+            "name": {"en": f"Grilled Chicken Plate {i}", "ar": f"طبق دجاج مشوي {i}", "he": f"צלחת עוף בגריל {i}"},
+            "description": {
+                "en": "Marinated chicken breast, grilled and served with rice, salad and garlic sauce",
+                "ar": "صدر دجاج متبل مشوي يقدم مع الأرز والسلطة وصلصة الثوم",
+                "he": "חזה עוף במרינדה, צלוי ומוגש עם אורז, סלט ורוטב שום",
+            },
+            "price": 12.5 + i % 7,
+            "image": f"/uploads/meals/{i:04d}.jpg",
+            "category_id": f"cat-{i % 8}",
+            "ingredients": [
+                {"ingredient_id": f"ing-{(i + j) % 40}", "ingredient_type": "removable" if j % 3 else "extra", "extra_price": 1.5}
+                for j in range(8)
+            ],
+            "is_vegetarian": i % 4 == 0,
+            "is_vegan": False,
+            "is_gluten_free": i % 5 == 0,
+            "is_spicy": i % 3 == 0,
+            "is_popular": i % 10 == 0,
+            "is_active": True,
+            "is_available": True,
+            "created_at": "2024-05-01T12:00:00",
+            "updated_at": None,
+        }
+        for i in range(meal_count)
+    ]
+
+
+def timed(fn, repeat: int = 50) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def size_table(body: bytes):
+    print(f"\n{'encoding':<16}{'bytes':>10}{'ratio':>8}{'compress ms':>14}")
+    print(f"{'identity':<16}{len(body):>10}{1.0:>8.2f}{0.0:>14.3f}")
+    for level in (1, 6, 9):
+        out = gzip.compress(body, compresslevel=level, mtime=0)
+        ms = timed(lambda: gzip.compress(body, compresslevel=level, mtime=0))
+        print(f"{'gzip-' + str(level):<16}{len(out):>10}{len(body) / len(out):>8.2f}{ms:>14.3f}")
+    if brotli is None:
+        print("brotli not installed; skipping br rows")
+        return
+    for quality in (4, 5, 11):
+        out = brotli.compress(body, quality=quality)
+        ms = timed(lambda: brotli.compress(body, quality=quality), repeat=5 if quality == 11 else 50)
+        print(f"{'br-' + str(quality):<16}{len(out):>10}{len(body) / len(out):>8.2f}{ms:>14.3f}")
+
+
+async def latency_table(menu: list, requests: int = 300):
+    app = FastAPI()
+
+    @app.get("/menu")
+    async def read_menu(response: Response):
+        response.headers["ETag"] = '"catalog-bench-1"'
+        return menu
+
+    variants = [
+        ("no middleware", app, "identity"),
+        ("gzip, uncached", CompressionMiddleware(app, cache_entries=0), "gzip"),
+        ("gzip, cached", CompressionMiddleware(app), "gzip"),
+    ]
+    if brotli is not None:
+        variants += [
+            ("br, uncached", CompressionMiddleware(app, cache_entries=0), "br"),
+            ("br, cached", CompressionMiddleware(app), "br"),
+        ]
+
+    print(f"\n{'variant':<18}{'wire bytes':>12}{'ms/request':>12}")
+    for label, asgi_app, encoding in variants:
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            headers = {"Accept-Encoding": encoding}
+            first = await client.get("/menu", headers=headers)
+            wire = int(first.headers["content-length"])
+            start = time.perf_counter()
+            for _ in range(requests):
+                await client.get("/menu", headers=headers)
+            ms = (time.perf_counter() - start) / requests * 1000
+        print(f"{label:<18}{wire:>12}{ms:>12.3f}")
+
+
+def main():
+    meal_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    menu = build_menu(meal_count)
+    body = json.dumps(menu, ensure_ascii=False, separators=(",", ":")).encode()
+    print(f"Menu with {meal_count} meals")
+    size_table(body)
+    asyncio.run(latency_table(menu))
+
+
+if __name__ == "__main__":
+    main()
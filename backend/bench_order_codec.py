@@ -0,0 +1,150 @@
+"""
+Benchmark the packed archive encoding against plain order documents.
+Prints BSON bytes per order and scan throughput for a raw revenue scan
+(BSON decode + sum of totals) and for full models.Order materialization.
+
+Usage: python bench_order_codec.py [order_count]
+"""
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+import bson
+
+from app import models, money, order_codec
+from app.order_codec import CodeBook, CodeBooks
+
+# Beanie's Document.__init__ only touches the collection handle; parsing
+# needs no database, so stub the lookup instead of calling init_beanie.
+models.Order.get_motor_collection = classmethod(lambda cls: None)
+
+STATUS_PATH = [
+    models.OrderStatus.PENDING,
+    models.OrderStatus.CONFIRMED,
+    models.OrderStatus.PREPARING,
+    models.OrderStatus.READY,
+    models.OrderStatus.OUT_FOR_DELIVERY,
+    models.OrderStatus.DELIVERED,
+]
+
+
+def build_orders(order_count: int) -> list:
+    """Synthetic delivered orders shaped like CRUDOrder.create + the state machine output"""
+    rng = random.Random(42)
+    meals = [(str(uuid.uuid4()), f"Grilled Chicken Plate {i}", 8.5 + i % 9) for i in range(60)]
+    ingredients = [(str(uuid.uuid4()), f"Ingredient {i}", 0.5 * (i % 5)) for i in range(40)]
+    start = datetime(2024, 1, 1)
+    orders = []
+    for i in range(order_count):
+        created = start + timedelta(minutes=17 * i)
+        items = []
+        for _ in range(rng.randint(1, 4)):
+            meal_id, meal_name, price = rng.choice(meals)
+            extras = rng.sample(ingredients, rng.randint(0, 2))
+            removed = rng.sample(ingredients, rng.randint(0, 2))
+            quantity = rng.randint(1, 3)
+            items.append(models.OrderItem(
+                meal_id=meal_id,
+                meal_name=meal_name,
+                meal_price=price,
+                quantity=quantity,
+                selected_ingredients=[
+                    models.OrderItemIngredient(ingredient_id=ing_id, name=name, price=ing_price)
+                    for ing_id, name, ing_price in extras
+                ],
+                removed_ingredients=[ing_id for ing_id, _, _ in removed],
+                removed_ingredients_names=[name for _, name, _ in removed],
+                subtotal=(price + sum(ing_price for _, _, ing_price in extras)) * quantity,
+            ))
+        subtotal = round(sum(item.subtotal for item in items), 2)
+        history = []
+        previous = None
+        for step, status in enumerate(STATUS_PATH):
+            history.append(models.OrderStatusHistory(
+                status=status,
+                changed_at=created + timedelta(minutes=6 * step),
+                changed_by="system" if step == 0 else "admin-1",
+                notes=order_codec.default_note(previous, status),
+            ))
+            previous = status
+        order = models.Order(
+            id=str(uuid.uuid4()),
+            user_id=f"user-{i % 500}",
+            status=models.OrderStatus.DELIVERED,
+            order_type=models.OrderType.DELIVERY,
+            payment_method=models.PaymentMethod.MPESA,
+            payment_status=models.PaymentStatus.PAID,
+            items=items,
+            subtotal=subtotal,
+            tax_amount=round(subtotal * 0.16, 2),
+            delivery_fee=2.0,
+            total_amount=round(subtotal * 1.16 + 2.0, 2),
+            customer_name=f"Customer {i % 500}",
+            customer_phone="0712345678",
+            delivery_address="Kenyatta Avenue 12, Nairobi",
+            order_number=f"ORD-{created:%Y%m%d}-{i:06d}",
+            created_at=created,
+            updated_at=history[-1].changed_at,
+            confirmed_at=history[1].changed_at,
+            completed_at=history[-1].changed_at,
+            status_history=history,
+        )
+        money.fill_order_cents(order)
+        orders.append(order)
+    return orders
+
+
+def timed(fn, repeat: int = 5) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    order_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    orders = build_orders(order_count)
+    books = CodeBooks(CodeBook("meal"), CodeBook("ingredient"))
+
+    plain = b"".join(bson.encode(order.model_dump(by_alias=True, exclude={"revision_id"})) for order in orders)
+    packed = b"".join(bson.encode(order_codec.encode(order, books)) for order in orders)
+    book_bytes = sum(len(bson.encode({"_id": book.kind, "entries": [list(e) for e in book.entries]}))
+                     for book in (books.meals, books.ingredients))
+
+    def revenue_plain():
+        return sum(doc["total_amount_cents"] for doc in bson.decode_all(plain))
+
+    def revenue_packed():
+        return sum(doc["total_amount_cents"] for doc in bson.decode_all(packed))
+
+    def models_plain():
+        return [models.Order.model_validate(doc) for doc in bson.decode_all(plain)]
+
+    def models_packed():
+        return [order_codec.decode(doc, books) for doc in bson.decode_all(packed)]
+
+    assert revenue_plain() == revenue_packed()
+    assert [o.model_dump() for o in models_packed()[:50]] == [o.model_dump() for o in models_plain()[:50]]
+
+    print(f"{order_count} delivered orders; code books: {len(books.meals.entries)} meals, "
+          f"{len(books.ingredients.entries)} ingredients ({book_bytes} bytes)")
+    print(f"\n{'format':<10}{'bytes/order':>13}{'ratio':>8}")
+    print(f"{'plain':<10}{len(plain) / order_count:>13.0f}{1.0:>8.2f}")
+    print(f"{'packed':<10}{len(packed) / order_count:>13.0f}{len(plain) / len(packed):>8.2f}")
+
+    print(f"\n{'scan':<24}{'plain ord/s':>14}{'packed ord/s':>14}")
+    for label, plain_fn, packed_fn in (
+        ("revenue (raw BSON)", revenue_plain, revenue_packed),
+        ("models.Order", models_plain, models_packed),
+    ):
+        print(f"{label:<24}{order_count / timed(plain_fn):>14,.0f}{order_count / timed(packed_fn):>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
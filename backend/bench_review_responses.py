@@ -0,0 +1,136 @@
+"""
+Benchmark building a page of review responses.
+Compares the old per-row path (Review + ReviewResponse per document, then
+FastAPI's response_model validation and JSON encoding) with the bulk
+TypeAdapter path and the trusted fast path for approved public reviews.
+
+Usage: python bench_review_responses.py [review_count]
+"""
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.models import Review
+from app.routers.reviews import (
+    REVIEW_RESPONSE_PROJECTION,
+    ReviewResponse,
+    public_review_rows_adapter,
+    review_responses_adapter,
+    review_row,
+)
+
+# Beanie's Document.__init__ only touches the collection handle; parsing
+# needs no database, so stub the lookup instead of calling init_beanie.
+Review.get_motor_collection = classmethod(lambda cls: None)
+
+
+def build_documents(review_count: int) -> list:
+    """Synthetic approved review documents as stored in MongoDB"""
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": str(uuid.uuid4()),
+            "user_id": f"user-{i % 300}",
+            "user_name": f"Customer {i % 300}",
+            "meal_id": "meal-1",
+            "meal_name": "Grilled Chicken Plate",
+            "order_id": str(uuid.uuid4()) if i % 2 else None,
+            "rating": 1 + i % 5,
+            "comment": "Tasty, generous portion and it arrived hot. Would order again." * (1 + i % 3),
+            "photos": [f"/api/v1/media/ab/{i:064x}.jpg"] if i % 4 == 0 else [],
+            "photo_variants": [
+                {"url": f"/api/v1/media/ab/{i:064x}.jpg", "variants": {"thumb": f"/api/v1/media/ab/{i:064x}_thumb.webp"}}
+            ] if i % 4 == 0 else [],
+            "status": "APPROVED",
+            "is_verified": i % 3 == 0,
+            "flagged_reason": None,
+            "moderation_notes": None,
+            "moderated_by": None,
+            "moderated_at": None,
+            "helpful_count": i % 17,
+            "unhelpful_count": i % 5,
+            "admin_response": None,
+            "admin_response_at": None,
+            "admin_responder_id": None,
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": None,
+        }
+        for i in range(review_count)
+    ]
+
+
+def per_row(docs: list) -> bytes:
+    reviews = [Review.model_validate(dict(doc)) for doc in docs]
+    responses = [
+        ReviewResponse(
+            id=review.id,
+            user_id=review.user_id,
+            user_name=review.user_name or "Anonymous",
+            meal_id=review.meal_id,
+            meal_name=review.meal_name or "Unknown",
+            order_id=review.order_id,
+            rating=review.rating,
+            comment=review.comment,
+            photos=review.photos,
+            photo_variants=review.photo_variants,
+            status=review.status,
+            is_verified=review.is_verified,
+            helpful_count=review.helpful_count,
+            unhelpful_count=review.unhelpful_count,
+            admin_response=review.admin_response,
+            admin_response_at=review.admin_response_at,
+            created_at=review.created_at,
+            updated_at=review.updated_at
+        )
+        for review in reviews
+    ]
+    # What FastAPI does with response_model=List[ReviewResponse]
+    prepared = [response.model_dump() for response in responses]
+    validated = review_responses_adapter.validate_python(prepared)
+    content = review_responses_adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def project(docs: list) -> list:
+    """Stand-in for the server-side projection plus review_row"""
+    return [review_row({key: doc[key] for key in ("_id", *REVIEW_RESPONSE_PROJECTION) if key in doc}) for doc in docs]
+
+
+def bulk_validated(docs: list) -> bytes:
+    rows = project(docs)
+    return review_responses_adapter.dump_json(review_responses_adapter.validate_python(rows))
+
+
+def trusted(docs: list) -> bytes:
+    return public_review_rows_adapter.dump_json(project(docs))
+
+
+def timed(fn, docs: list, repeat: int = 20) -> float:
+    fn(docs)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(docs)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    review_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    docs = build_documents(review_count)
+
+    expected = json.loads(per_row(docs))
+    for fn in (bulk_validated, trusted):
+        assert json.loads(fn(docs)) == expected, f"{fn.__name__} output differs"
+
+    print(f"Page of {review_count} reviews")
+    print(f"\n{'path':<18}{'ms/page':>10}{'bytes':>10}")
+    for label, fn in (("per-row (old)", per_row), ("bulk validated", bulk_validated), ("trusted public", trusted)):
+        print(f"{label:<18}{timed(fn, docs):>10.2f}{len(fn(docs)):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Shared test fixtures.
+
+Database tests run against an in-memory MongoDB (mongomock-motor, in
+requirements.txt) initialised with every app document, and are written as
+async tests on pytest-asyncio (@pytest.mark.asyncio, @pytest_asyncio.fixture).
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Sequence, Union
+
+import pytest
+import pytest_asyncio
+
+from app import analytics_engine, models, money, order_codec
+from app.cache import cache_versions, settings_cache
+from app.database import document_models
+from app.models import OrderStatus
+
+ItemSpec = Union[models.OrderItem, tuple]  # OrderItem, or (meal_id, quantity[, meal_price])
+
+
+def build_order(
+    order_id: Optional[str] = None,
+    status: OrderStatus = OrderStatus.PENDING,
+    *,
+    days_ago: float = 0,
+    created_at: Optional[datetime] = None,
+    items: Sequence[ItemSpec] = (),
+    total: Optional[float] = None,
+    cents: bool = False,
+    **fields
+) -> models.Order:
+    """
+    An unsaved delivery order. Tuple items get a title-cased meal name and
+    a 2.50 price by default; the total defaults to the item subtotals (10.00
+    without items). cents=True fills the integer-cents fields like new orders.
+    """
+    at = created_at or datetime.utcnow() - timedelta(days=days_ago)
+    order_items = []
+    for item in items:
+        if isinstance(item, tuple):
+            meal_id, quantity, *price = item
+            price = price[0] if price else 2.5
+            item = models.OrderItem(
+                meal_id=meal_id, meal_name=meal_id.title(), meal_price=price, quantity=quantity,
+                subtotal=round(price * quantity, 2)
+            )
+        order_items.append(item)
+    if total is None:
+        total = round(sum(item.subtotal for item in order_items), 2) if order_items else 10.0
+    values = dict(
+        user_id="user-1",
+        status=status,
+        order_type=models.OrderType.DELIVERY,
+        payment_method=models.PaymentMethod.CASH,
+        items=order_items,
+        subtotal=total,
+        total_amount=total,
+        customer_name="Test",
+        customer_phone="0500000000",
+        created_at=at,
+        updated_at=at,
+    )
+    if order_id is not None:
+        values["id"] = order_id
+    order = models.Order(**{**values, **fields})
+    if cents:
+        money.fill_order_cents(order)
+    return order
+
+
+@pytest.fixture
+def make_order():
+    return build_order
+
+
+@pytest_asyncio.fixture
+async def db():
+    """A fresh in-memory database with Beanie initialised and process caches cleared"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from beanie import init_beanie
+
+    database = mongomock_motor.AsyncMongoMockClient()["test"]
+    await init_beanie(database=database, document_models=document_models())
+    order_codec._books = None
+    cache_versions.invalidate()
+    settings_cache.invalidate()
+    analytics_engine.invalidate()
+    yield database
+    cache_versions.invalidate()
+    settings_cache.invalidate()
+    analytics_engine.invalidate()
@@ -0,0 +1,54 @@
+"""
+Export orders and order items to Parquet (or Arrow IPC) files for offline
+analysis. Files go to EXPORT_DIR unless --out is given.
+
+Usage:
+    python export_orders.py                                   # everything
+    python export_orders.py --since 2024-01-01 --until 2024-04-01
+    python export_orders.py --incremental                     # changes since the last --incremental run
+    python export_orders.py --format arrow --out /tmp/exports
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.database import connect_to_mongo, close_mongo_connection
+from app.order_export import FORMATS, export_orders
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export orders to Parquet / Arrow IPC")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="orders created at or after (ISO date)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="orders created before (ISO date)")
+    parser.add_argument("--incremental", action="store_true", help="only orders changed since the last incremental export")
+    parser.add_argument("--out", help="output directory (default: EXPORT_DIR)")
+    parser.add_argument("--batch-size", type=int, help="documents per batch (default: EXPORT_BATCH_SIZE)")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    await connect_to_mongo()
+
+    print(f"🔄 Exporting orders to {args.format}...")
+    result = await export_orders(
+        args.format,
+        since=args.since,
+        until=args.until,
+        incremental=args.incremental,
+        out_dir=args.out,
+        batch_size=args.batch_size
+    )
+    print(f"✅ Exported {result['orders']} order(s) and {result['items']} item(s)")
+    for path in result["files"]:
+        print(f"   {path}")
+    if result["watermark"]:
+        print(f"   watermark: {result['watermark'].isoformat()}")
+
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""
+Backfill the integer-cents amounts added alongside the float prices.
+
+- orders: sets subtotal_cents/.../total_amount_cents and the per-item
+  meal_price_cents, subtotal_cents and ingredient price_cents from the
+  stored floats (rounded half up), for orders that do not have them yet
+- orders_archive: repacks documents written by an older order codec so
+  total_amount_cents and item quantities are available to analytics
+
+Safe to run repeatedly; only documents missing the fields are touched.
+
+Usage: python migrate_money_cents.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from pymongo import ReplaceOne, UpdateOne
+
+from app.database import connect_to_mongo, close_mongo_connection
+from app import models, money, order_codec
+
+BATCH_SIZE = 500
+
+async def backfill_orders() -> int:
+    collection = models.Order.get_motor_collection()
+    updated = 0
+    batch = []
+    async for doc in collection.find({"total_amount_cents": None}):
+        order = models.Order.model_validate(doc)
+        money.fill_order_cents(order)
+        fields = order.model_dump(include={
+            "subtotal_cents", "tax_amount_cents", "delivery_fee_cents",
+            "discount_amount_cents", "total_amount_cents", "items",
+        })
+        batch.append(UpdateOne({"_id": order.id, "total_amount_cents": None}, {"$set": fields}))
+        if len(batch) >= BATCH_SIZE:
+            updated += (await collection.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await collection.bulk_write(batch, ordered=False)).modified_count
+    return updated
+
+async def repack_archive() -> int:
+    collection = models.ArchivedOrder.get_motor_collection()
+    repacked = 0
+    query = {"v": {"$ne": order_codec.CODEC_VERSION}}
+    while True:
+        docs = await collection.find(query).limit(BATCH_SIZE).to_list(length=None)
+        if not docs:
+            break
+        orders = await order_codec.decode_many(docs)
+        packed = await order_codec.encode_many(orders)  # archived_at is carried over
+        await collection.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc) for doc in packed], ordered=False)
+        repacked += len(packed)
+    return repacked
+
+async def main():
+    await connect_to_mongo()
+    
+    print("🔄 Backfilling order amounts in cents...")
+    updated = await backfill_orders()
+    print(f"✅ {updated} order(s) updated")
+    
+    print("🔄 Repacking archived orders...")
+    repacked = await repack_archive()
+    print(f"✅ {repacked} archived order(s) repacked")
+    
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
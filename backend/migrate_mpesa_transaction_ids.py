@@ -0,0 +1,42 @@
+"""
+Rewrite legacy mpesa_transactions rows whose _id is an ObjectId to string ids.
+
+Rows created before the MPesaTransaction model used ObjectId _ids; the
+model reads them as strings, and this one-off migration makes the stored
+ids match. checkout_request_id is unique, so each row is removed before
+its string-keyed copy is inserted.
+
+Safe to run repeatedly; only ObjectId-keyed rows are touched.
+
+Usage: python migrate_mpesa_transaction_ids.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.database import connect_to_mongo, close_mongo_connection
+from app import models
+
+async def migrate() -> int:
+    collection = models.MPesaTransaction.get_motor_collection()
+    migrated = 0
+    async for doc in collection.find({"_id": {"$type": "objectId"}}):
+        legacy_id = doc["_id"]
+        await collection.delete_one({"_id": legacy_id})
+        await collection.insert_one({**doc, "_id": str(legacy_id)})
+        migrated += 1
+    return migrated
+
+async def main():
+    await connect_to_mongo()
+
+    print("🔄 Converting ObjectId M-Pesa transaction ids to strings...")
+    migrated = await migrate()
+    print(f"✅ {migrated} transaction(s) migrated")
+
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+"""
+Backfill helpful_count / unhelpful_count on reviews written before the
+vote counters existed.
+
+The "most helpful" sort and its keyset cursors need the field stored:
+MongoDB sorts a missing field as null, so such reviews could be skipped
+between pages. Safe to run repeatedly; only reviews missing a counter are
+touched.
+
+Usage: python migrate_review_counts.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.database import connect_to_mongo, close_mongo_connection
+from app.models import Review
+
+COUNTERS = ("helpful_count", "unhelpful_count")
+
+async def backfill() -> int:
+    collection = Review.get_motor_collection()
+    updated = 0
+    for field in COUNTERS:
+        result = await collection.update_many({field: None}, {"$set": {field: 0}})
+        updated += result.modified_count
+    return updated
+
+async def main():
+    await connect_to_mongo()
+
+    print("🔄 Backfilling review vote counters...")
+    updated = await backfill()
+    print(f"✅ {updated} counter(s) set to 0")
+
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+"""
+Rebuild the meal_sales_daily counters from delivered orders (hot and archived).
+Run once after deploying the counters, or any time they drift.
+
+Usage: python rebuild_meal_sales.py [since_days]
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.database import connect_to_mongo, close_mongo_connection
+from app.meal_sales import rebuild
+
+async def main():
+    await connect_to_mongo()
+    since = datetime.utcnow() - timedelta(days=int(sys.argv[1])) if len(sys.argv) > 1 else None
+
+    print("🔄 Rebuilding meal sales counters...")
+    counters = await rebuild(since=since)
+    print(f"✅ {counters} meal/day counter(s) rebuilt")
+
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,27 @@
+"""
+Rebuild the meal_rating_stats collection from approved reviews.
+Run once after deploying rating aggregates, or any time the counters drift.
+
+Usage: python recompute_rating_stats.py [meal_id ...]
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.database import connect_to_mongo, close_mongo_connection
+from app.crud import crud_meal_rating_stats
+
+async def main():
+    await connect_to_mongo()
+    meal_ids = sys.argv[1:] or None
+    
+    print("🔄 Recomputing meal rating stats...")
+    meals = await crud_meal_rating_stats.recompute(meal_ids=meal_ids)
+    print(f"✅ Rating stats rebuilt for {meals} meal(s)")
+    
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
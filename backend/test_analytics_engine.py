@@ -0,0 +1,124 @@
+"""
+NumPy analytics engine tests
+Checks that engine="numpy" returns exactly what the Mongo aggregation
+engine returns (and what a plain loop over the orders computes) for every
+grouping key, over hot and archived orders. Runs against the in-memory
+database from conftest.py; skipped without numpy.
+    pytest test_analytics_engine.py
+"""
+import asyncio
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from app import analytics_engine, models, money, order_archive, order_totals
+from app.models import OrderStatus
+
+pytest.importorskip("numpy")
+
+
+def random_order(make_order, rng, i, now):
+    created = now - timedelta(days=rng.randint(0, 300), hours=rng.randint(0, 23), minutes=rng.randint(0, 59))
+    status = rng.choice([OrderStatus.DELIVERED] * 3 + [OrderStatus.CANCELLED, OrderStatus.PENDING, OrderStatus.PREPARING])
+    items = [
+        (f"meal-{rng.randint(0, 5)}", rng.randint(1, 3), rng.choice([4.99, 7.5, 12.35, 0.1]))
+        for _ in range(rng.randint(1, 3))
+    ]
+    return make_order(
+        f"order-{i}",
+        status,
+        created_at=created,
+        items=items,
+        user_id=f"user-{i % 7}",
+        order_type=rng.choice(list(models.OrderType)),
+        payment_status=rng.choice(list(models.PaymentStatus)),
+        cents=bool(i % 3),  # every third order predates the cents fields
+    )
+
+
+@pytest_asyncio.fixture
+async def orders(db, make_order):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    orders = [random_order(make_order, rng, i, now) for i in range(150)]
+    for order in orders:
+        await order.insert()
+    assert await order_archive.archive_orders(older_than_days=90) > 0
+    return orders
+
+
+def loop_totals(orders, key):
+    """The per-order Python loops the analytics endpoints used to run"""
+    result = defaultdict(order_totals.Totals)
+    for order in orders:
+        group = {
+            "all": None,
+            "day": order.created_at.strftime("%Y-%m-%d"),
+            "month": order.created_at.strftime("%Y-%m"),
+            "hour": order.created_at.hour,
+            "status": order.status.value,
+            "order_type": order.order_type.value,
+            "payment_status": order.payment_status.value,
+        }[key]
+        totals = result[group]
+        totals.orders += 1
+        if order.status == OrderStatus.DELIVERED:
+            totals.delivered_orders += 1
+            totals.revenue_cents += money.to_cents(order.total_amount)
+            totals.sold_meals += sum(item.quantity for item in order.items)
+    return dict(result)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("key", list(order_totals.GROUP_KEYS))
+async def test_numpy_engine_matches_mongo_and_loops(orders, key):
+    mongo = await order_totals.totals_by(key, engine="mongo")
+    columnar = await order_totals.totals_by(key, engine="numpy")
+    assert columnar == mongo == loop_totals(orders, key)
+
+
+@pytest.mark.asyncio
+async def test_numpy_engine_windows_and_meals(orders):
+    since = datetime.utcnow() - timedelta(days=120)
+    until = datetime.utcnow() - timedelta(days=30)
+    assert await order_totals.totals_by("day", since=since, until=until, engine="numpy") == \
+        await order_totals.totals_by("day", since=since, until=until, engine="mongo")
+
+    for delivered_only in (True, False):
+        for window in (None, since):
+            assert await order_totals.meal_totals(since=window, delivered_only=delivered_only, engine="numpy") == \
+                await order_totals.meal_totals(since=window, delivered_only=delivered_only, engine="mongo")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_reused_for_covered_windows(orders):
+    first = await analytics_engine.snapshot(datetime.utcnow() - timedelta(days=60))
+    assert await analytics_engine.snapshot(datetime.utcnow() - timedelta(days=7)) is first
+    assert await analytics_engine.snapshot(None) is not first
+
+
+@pytest.mark.asyncio
+async def test_concurrent_snapshots_share_one_load(orders, monkeypatch):
+    loads = []
+    load_columns = analytics_engine.load_columns
+
+    async def counting_load(since):
+        loads.append(since)
+        await asyncio.sleep(0.01)  # let the other callers queue up behind the lock
+        return await load_columns(since)
+
+    monkeypatch.setattr(analytics_engine, "load_columns", counting_load)
+    wide = datetime.utcnow() - timedelta(days=60)
+    snapshots = await asyncio.gather(*(
+        analytics_engine.snapshot(wide + timedelta(days=day)) for day in range(5)
+    ))
+    assert loads == [wide]
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+
+    # A stale reload for a narrower window keeps the wider one
+    monkeypatch.setattr(analytics_engine.settings, "analytics_snapshot_ttl_seconds", 0)
+    reloaded = await analytics_engine.snapshot(datetime.utcnow() - timedelta(days=7))
+    assert loads == [wide, wide] and reloaded.since == wide
@@ -0,0 +1,94 @@
+"""
+Compression middleware tests
+Runs against a small in-process app; no server or database needed.
+    pytest test_compression.py
+"""
+import gzip
+import json
+
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from app.middleware import CompressionMiddleware, brotli
+
+MENU = [
+    {
+        "id": f"meal-{i}",
+        "name": {"en": f"Meal {i}", "ar": f"وجبة {i}", "he": f"מנה {i}"},
+        "description": {"en": "Grilled chicken with fresh herbs", "ar": "دجاج مشوي", "he": "עוף בגריל"},
+        "price": 12.5,
+        "ingredients": [{"ingredient_id": f"ing-{j}", "ingredient_type": "removable"} for j in range(5)],
+    }
+    for i in range(50)
+]
+
+
+def build_client(**options):
+    app = FastAPI()
+    calls = {"compress": 0}
+
+    @app.get("/menu")
+    async def menu(response: Response):
+        response.headers["ETag"] = '"catalog-abc-1"'
+        return MENU
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    middleware = CompressionMiddleware(app, **options)
+    original = middleware.compress
+
+    def counting_compress(body, encoding):
+        calls["compress"] += 1
+        return original(body, encoding)
+
+    middleware.compress = counting_compress
+    return TestClient(middleware), calls
+
+
+def test_gzip_roundtrip_and_headers():
+    client, _ = build_client(minimum_size=500)
+    r = client.get("/menu", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.headers["etag"] == 'W/"catalog-abc-1"'
+    # httpx transparently decodes; compare with the original payload
+    assert r.json() == MENU
+    assert int(r.headers["content-length"]) < len(json.dumps(MENU, ensure_ascii=False).encode())
+
+
+def test_small_responses_are_not_compressed():
+    client, calls = build_client(minimum_size=500)
+    r = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert calls["compress"] == 0
+
+
+def test_identity_when_client_does_not_accept():
+    client, calls = build_client(minimum_size=500)
+    r = client.get("/menu", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+    assert calls["compress"] == 0
+
+
+def test_precompressed_cache_compresses_once_per_etag():
+    client, calls = build_client(minimum_size=500, cache_entries=8)
+    for _ in range(5):
+        client.get("/menu", headers={"Accept-Encoding": "gzip"})
+    assert calls["compress"] == 1
+
+
+def test_brotli_preferred_when_available():
+    client, _ = build_client(minimum_size=500)
+    r = client.get("/menu", headers={"Accept-Encoding": "gzip, br"})
+    expected = "br" if brotli is not None else "gzip"
+    assert r.headers["content-encoding"] == expected
+
+
+def test_gzip_is_deterministic():
+    middleware = CompressionMiddleware(FastAPI())
+    body = json.dumps(MENU).encode()
+    assert middleware.compress(body, "gzip") == middleware.compress(body, "gzip")
+    assert gzip.decompress(middleware.compress(body, "gzip")) == body
@@ -0,0 +1,93 @@
+"""
+Conditional GET tests
+Exercises ConditionalGetMiddleware, CacheVersions and the settings ETag
+through the app against the in-memory database from conftest.py.
+    pytest test_conditional_get.py
+"""
+import pytest
+import pytest_asyncio
+
+from app.cache import CacheVersions
+
+CATEGORY = {"name": {"en": "Soups", "ar": "", "he": ""}}
+
+
+@pytest_asyncio.fixture
+async def client(db):
+    from fastapi.testclient import TestClient
+
+    from app.auth import get_current_admin_user
+    from app.main import app
+
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    yield TestClient(app, headers={"Accept-Encoding": "identity"})  # keep strong ETags (see CompressionMiddleware)
+    app.dependency_overrides.clear()
+
+
+def assert_not_modified(client, path, etag, cache_control):
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"] == cache_control
+
+
+def test_catalog_etag_and_not_modified(client):
+    response = client.get("/api/v1/categories")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('"catalog-')
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+    assert_not_modified(client, "/api/v1/categories", etag, response.headers["cache-control"])
+    assert client.get("/api/v1/categories", headers={"If-None-Match": '"catalog-old"'}).status_code == 200
+
+
+def test_catalog_write_changes_the_etag(client):
+    etag = client.get("/api/v1/categories").headers["etag"]
+
+    created = client.post("/api/v1/categories", json=CATEGORY)
+    assert created.status_code == 200
+    assert "etag" not in created.headers  # non-GET responses pass through untouched
+
+    response = client.get("/api/v1/categories", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [category["name"]["en"] for category in response.json()] == ["Soups"]
+    renamed_etag = response.headers["etag"]
+    assert renamed_etag != etag
+
+    category_id = created.json()["id"]
+    assert client.put(f"/api/v1/categories/{category_id}", json={"order": 2}).status_code == 200
+    response = client.get(f"/api/v1/categories/{category_id}", headers={"If-None-Match": renamed_etag})
+    assert response.status_code == 200 and response.headers["etag"] not in (etag, renamed_etag)
+
+
+def test_errors_pass_through_without_cache_headers(client):
+    response = client.get("/api/v1/categories/missing", headers={"If-None-Match": '"nothing"'})
+    assert response.status_code == 404
+    assert "etag" not in response.headers and "cache-control" not in response.headers
+
+
+def test_settings_etag_and_not_modified(client):
+    response = client.get("/api/v1/settings")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag == f'"{response.json()["id"]}-1"'
+    assert_not_modified(client, "/api/v1/settings", etag, "no-cache")
+
+    assert client.put("/api/v1/settings", json={"delivery_fee": 7}).status_code == 200
+    response = client.get("/api/v1/settings", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{response.json()["id"]}-2"'
+
+
+@pytest.mark.asyncio
+async def test_cache_versions_are_shared_between_workers(db):
+    this_worker, other_worker = CacheVersions(ttl_seconds=3600), CacheVersions(ttl_seconds=0)
+    tag = await this_worker.get("catalog")
+    assert await other_worker.get("catalog") == tag  # first use created one shared token
+
+    bumped = await this_worker.bump("catalog")
+    assert bumped != tag
+    assert await other_worker.get("catalog") == bumped
+    assert await this_worker.get("reviews") != bumped  # scopes are independent
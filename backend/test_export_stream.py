@@ -0,0 +1,82 @@
+"""
+Streaming export tests
+Encoding tests need nothing; the endpoint tests stream GET /orders/export
+and GET /reviews/export from the in-memory database in conftest.py.
+    pytest test_export_stream.py
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+from app import export_stream, models, order_archive
+from app.models import OrderStatus
+
+
+def test_csv_and_ndjson_chunks():
+    rows = [{"id": "a", "total": 1.5, "at": datetime(2024, 5, 1, 12, 30), "items": [{"q": 1}], "note": None}]
+    fields = ["id", "total", "at", "items", "note"]
+
+    parsed = list(csv.reader(io.StringIO(export_stream.csv_chunk(rows, fields, header=True).decode())))
+    assert parsed == [fields, ["a", "1.5", "2024-05-01T12:30:00", '[{"q":1}]', ""]]
+
+    line = json.loads(export_stream.ndjson_chunk(rows, ["id", "at"]))
+    assert line == {"id": "a", "at": "2024-05-01T12:30:00"}
+
+
+def test_parse_fields():
+    assert export_stream.parse_fields(None, ["a", "b"], ["a"]) == ["a"]
+    assert export_stream.parse_fields(" b , a ", ["a", "b"], ["a"]) == ["b", "a"]
+    with pytest.raises(ValueError):
+        export_stream.parse_fields("a,secret", ["a", "b"], ["a"])
+
+
+def test_export_routes_are_matched_before_id_routes():
+    from app.main import app
+
+    paths = [route.path for route in app.routes]
+    assert paths.index("/api/v1/orders/export") < paths.index("/api/v1/orders/{order_id}")
+
+
+# --- endpoints against an in-memory database ---
+
+@pytest_asyncio.fixture
+async def client(db, make_order):
+    from fastapi.testclient import TestClient
+
+    from app.auth import get_current_admin_user
+    from app.main import app
+
+    soup = [("meal-1", 1, 3.3)]
+    await make_order("old", OrderStatus.DELIVERED, days_ago=200, items=soup, customer_name="Test, Jr.", cents=True).insert()
+    await make_order("new", OrderStatus.PENDING, days_ago=1, items=soup, customer_name="Test, Jr.").insert()  # predates the cents fields
+    await order_archive.archive_orders(older_than_days=90)
+    for rating in (2, 5):
+        await models.Review(user_id="user-1", user_name="Ann", meal_id="meal-1", rating=rating, comment=f"r{rating}").insert()
+
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_orders_export_streams_hot_and_archived_rows(client):
+    response = client.get("/api/v1/orders/export", params={"fields": "id,status,total_amount,total_amount_cents,customer_name"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = {row["id"]: row for row in map(json.loads, response.text.splitlines())}
+    assert rows["old"] == {"id": "old", "status": "DELIVERED", "total_amount": 3.3, "total_amount_cents": 330, "customer_name": "Test, Jr."}
+    assert rows["new"]["total_amount_cents"] == 330
+
+    response = client.get("/api/v1/orders/export", params={"format": "csv", "status": "PENDING", "fields": "id,customer_name"})
+    assert list(csv.reader(io.StringIO(response.text))) == [["id", "customer_name"], ["new", "Test, Jr."]]
+
+    assert client.get("/api/v1/orders/export", params={"fields": "id,password"}).status_code == 400
+
+
+def test_reviews_export_pushes_filters_down(client):
+    response = client.get("/api/v1/reviews/export", params={"format": "csv", "min_rating": 4, "fields": "user_name,rating,comment"})
+    assert response.status_code == 200
+    assert list(csv.reader(io.StringIO(response.text))) == [["user_name", "rating", "comment"], ["Ann", "5", "r5"]]
@@ -0,0 +1,84 @@
+"""
+Demand forecast tests
+Runs against the in-memory database from conftest.py; skipped without numpy.
+    pytest test_forecast.py
+"""
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+from app import forecast, models
+from app.config import settings
+
+np = pytest.importorskip("numpy")
+
+NOW = datetime(2024, 5, 20, 10, 30)  # a Monday
+
+
+def hourly(hour, orders, revenue_cents):
+    return models.OrderHourly(id=f"{hour:%Y-%m-%dT%H}", hour=hour, orders=orders, revenue_cents=revenue_cents)
+
+
+def meal_day(meal_id, day, quantity):
+    return models.MealSalesDaily(id=f"{meal_id}:{day:%Y-%m-%d}", meal_id=meal_id, meal_name=meal_id.title(), day=day, quantity=quantity)
+
+
+@pytest_asyncio.fixture
+async def history(db, monkeypatch):
+    monkeypatch.setattr(settings, "forecast_history_weeks", 3)
+    monkeypatch.setattr(settings, "forecast_smoothing", 0.5)
+    # Two Tuesdays of history; the oldest of the three weeks has no orders at all
+    for doc in (
+        hourly(datetime(2024, 5, 7, 13), 2, 2000),
+        hourly(datetime(2024, 5, 14, 13), 4, 5000),
+        hourly(datetime(2024, 5, 20, 9), 50, 0),  # Monday, a week from tomorrow's forecast
+        meal_day("soup", datetime(2024, 5, 7), 2),
+        meal_day("soup", datetime(2024, 5, 14), 6),
+        meal_day("pie", datetime(2024, 5, 13), 1),
+    ):
+        await doc.insert()
+
+
+def test_seasonal_smoothing():
+    weeks = np.array([[1.0, 10.0], [3.0, 20.0], [5.0, 40.0]])
+    assert forecast.seasonal_smoothing(weeks, 1.0).tolist() == [5.0, 40.0]  # seasonal-naive
+    assert forecast.seasonal_smoothing(weeks, 0.5).tolist() == [3.5, 27.5]
+    assert forecast.recorded_weeks(np.array([[0, 0], [0, 1], [0, 0]])) == 2
+
+
+@pytest.mark.asyncio
+async def test_forecast_by_hour_and_meal(history):
+    result = await forecast.compute(now=NOW, timezone="UTC")
+    assert result["weeks_of_history"] == 2
+
+    tomorrow = result["next_day"]
+    assert tomorrow["date"] == "2024-05-21" and len(tomorrow["hours"]) == 24
+    assert tomorrow["hours"][13]["orders"] == 3.0 and tomorrow["hours"][13]["revenue"] == 35.0
+    assert tomorrow["orders"] == 3.0
+
+    week = result["next_week"]
+    assert [day["date"] for day in week["days"]][-1] == "2024-05-27"
+    assert week["days"][-1]["hours"][9]["orders"] == 25.0  # one recorded Monday, smoothed with an empty one
+    assert week["orders"] == 28.0
+
+    assert [(meal["meal_id"], meal["next_day"], meal["next_week"]) for meal in result["meals"]] == [
+        ("soup", 4.0, 4.0), ("pie", 0.0, 0.5)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_forecast_hours_are_local(history):
+    result = await forecast.compute(now=NOW, timezone="Africa/Nairobi")  # UTC+3
+    hours = result["next_day"]["hours"]
+    assert hours[0]["starts_at"] == "2024-05-21T00:00:00+03:00"
+    assert hours[16]["orders"] == 3.0
+
+
+@pytest.mark.asyncio
+async def test_get_serves_the_cached_forecast(history):
+    demand = forecast.DemandForecast()
+    first = await demand.get()
+    await hourly(datetime.utcnow().replace(minute=0, second=0, microsecond=0) - forecast.HOUR, 99, 0).insert()
+    assert await demand.get() is first
+    assert await demand.refresh() is not first
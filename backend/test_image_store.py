@@ -0,0 +1,108 @@
+"""
+Content-addressed image store tests
+Uses a local backend in a temp directory; no server or database needed.
+    pytest test_image_store.py
+"""
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import FastAPI, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+from starlette.datastructures import Headers
+
+from app.images import UploadTooLarge, VARIANT_WIDTHS
+from app.routers import media
+from app.storage import IMMUTABLE_CACHE_CONTROL, ImageStore, LocalImageBackend
+
+
+def png_bytes(color=(200, 30, 30), size=(1200, 800)) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, "PNG")
+    return out.getvalue()
+
+
+def upload(data: bytes, filename="photo.png", content_type="image/png") -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(data),
+        filename=filename,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(LocalImageBackend(tmp_path / "cas"), tmp_path / "tmp")
+
+
+def test_key_is_content_hash(store):
+    data = png_bytes()
+    stored = asyncio.run(store.save_upload(upload(data), max_bytes=10_000_000))
+
+    digest = hashlib.sha256(data).hexdigest()
+    assert stored.key == f"{digest[:2]}/{digest}.png"
+    assert stored.size == len(data)
+    assert stored.url.endswith(stored.key)
+    assert store.backend.path(stored.key).read_bytes() == data
+
+
+def test_identical_uploads_are_stored_once(store, tmp_path):
+    data = png_bytes()
+    first = asyncio.run(store.save_upload(upload(data, "a.png"), max_bytes=10_000_000))
+    second = asyncio.run(store.save_upload(upload(data, "b.png"), max_bytes=10_000_000))
+
+    assert first.url == second.url
+    assert not first.deduplicated and second.deduplicated
+    assert len(list((tmp_path / "cas").rglob("*.png"))) == 1
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_upload_over_cap_leaves_nothing_behind(store, tmp_path):
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(store.save_upload(upload(b"x" * 2048), max_bytes=1024))
+
+    assert not (tmp_path / "cas").exists() or list((tmp_path / "cas").rglob("*")) == []
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_variants_are_rendered_once(store, monkeypatch):
+    stored = asyncio.run(store.save_upload(upload(png_bytes()), max_bytes=10_000_000))
+    variants = asyncio.run(store.ensure_variants(stored.key))
+
+    assert set(variants) == set(VARIANT_WIDTHS)
+    for name, url in variants.items():
+        key = store.variant_key(stored.key, name)
+        assert url.endswith(key)
+        with Image.open(store.backend.path(key)) as image:
+            assert image.format == "WEBP"
+            assert image.width == VARIANT_WIDTHS[name]
+
+    async def fail(data):
+        raise AssertionError("variants should not be re-rendered")
+
+    monkeypatch.setattr("app.storage.generate_variants", fail)
+    assert asyncio.run(store.ensure_variants(stored.key)) == variants
+
+
+def test_media_route_serves_immutable_urls(store, monkeypatch):
+    monkeypatch.setattr(media, "image_store", store)
+    app = FastAPI()
+    app.include_router(media.router, prefix="/api/v1")
+    client = TestClient(app)
+
+    data = png_bytes()
+    stored = asyncio.run(store.save_upload(upload(data), max_bytes=10_000_000))
+
+    response = client.get(f"/api/v1/media/{stored.key}")
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+    revalidated = client.get(f"/api/v1/media/{stored.key}", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+    assert client.get("/api/v1/media/../../etc/passwd").status_code == 404
+    assert client.get(f"/api/v1/media/{stored.key[:-3]}jpg").status_code == 404
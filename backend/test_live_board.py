@@ -0,0 +1,126 @@
+"""
+Live board tests
+Runs against the in-memory database from conftest.py.
+    pytest test_live_board.py
+"""
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from app import order_state
+from app.live_board import CLOSE_TOO_SLOW, LiveBoard, live_board
+from app.models import OrderStatus
+
+
+class FakeSocket:
+    def __init__(self):
+        self.messages = []
+        self.closed_with = None
+
+    async def send_json(self, message):
+        self.messages.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+class StalledSocket(FakeSocket):
+    """A client that never finishes receiving"""
+
+    async def send_json(self, message):
+        await asyncio.Event().wait()
+
+
+async def settle():
+    """Let the per-subscriber send tasks drain their queues"""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+@pytest_asyncio.fixture
+async def board():
+    board = LiveBoard()
+    yield board
+    await board.stop()
+
+
+@pytest.mark.asyncio
+async def test_load_keeps_only_active_orders(db, make_order, board):
+    await make_order("o-1", OrderStatus.PENDING).insert()
+    await make_order("o-2", OrderStatus.READY).insert()
+    await make_order("o-3", OrderStatus.DELIVERED).insert()
+    await make_order("o-4", OrderStatus.CANCELLED).insert()
+
+    await board.load()
+    snapshot = board.snapshot()
+    assert snapshot["type"] == "board_snapshot" and snapshot["seq"] == 1
+    assert {card["id"] for card in snapshot["orders"]} == {"o-1", "o-2"}
+
+
+@pytest.mark.asyncio
+async def test_subscriber_gets_snapshot_then_deltas(db, make_order, board):
+    await make_order("o-1").insert()
+    await board.load()
+    socket = FakeSocket()
+    await board.subscribe(socket)
+
+    added = make_order("o-2", OrderStatus.CONFIRMED)
+    await board.apply([added])
+    await board.apply([make_order("o-1", OrderStatus.DELIVERED)])
+    await board.apply([make_order("o-3", OrderStatus.CANCELLED)])  # never on the board: no delta
+    await board.remove(["o-2", "missing"])
+    await board.remove(["o-2"])  # already gone: no delta
+    await settle()
+
+    snapshot, upsert, delivered, removed = socket.messages
+    assert snapshot["seq"] == 1 and [card["id"] for card in snapshot["orders"]] == ["o-1"]
+    assert upsert == {"type": "board_delta", "seq": 2, "upserted": [LiveBoard.card(added)], "removed": []}
+    assert delivered == {"type": "board_delta", "seq": 3, "upserted": [], "removed": ["o-1"]}
+    assert removed == {"type": "board_delta", "seq": 4, "upserted": [], "removed": ["o-2"]}
+    assert board.snapshot()["orders"] == []
+
+    # A late subscriber starts from the current seq
+    late = FakeSocket()
+    await board.subscribe(late)
+    await settle()
+    assert late.messages == [{"type": "board_snapshot", "seq": 4, "orders": []}]
+
+
+@pytest.mark.asyncio
+async def test_field_updates_reach_the_board(db, make_order):
+    await make_order("o-1", OrderStatus.CONFIRMED).insert()
+    await make_order("o-2", OrderStatus.DELIVERED).insert()
+    await live_board.load()
+
+    # payment intent creation
+    updated = await order_state.update_fields("o-1", {"payment_intent_id": "pi_1", "payment_status": "FAILED"})
+    assert updated.payment_intent_id == "pi_1"
+    assert live_board.snapshot()["orders"][0]["payment_status"] == "FAILED"
+
+    # payment confirmed on an order that can no longer move to CONFIRMED
+    await order_state.transition_or_update("o-1", OrderStatus.CONFIRMED, set_fields={"payment_status": "PAID"})
+    assert live_board.snapshot()["orders"][0]["payment_status"] == "PAID"
+
+    # terminal orders stay off the board; unknown ids are a no-op
+    await order_state.transition_or_update("o-2", OrderStatus.CONFIRMED, set_fields={"payment_status": "PAID"})
+    assert await order_state.update_fields("missing", {"payment_status": "PAID"}) is None
+    assert [card["id"] for card in live_board.snapshot()["orders"]] == ["o-1"]
+
+
+@pytest.mark.asyncio
+async def test_slow_client_is_dropped_without_delaying_writes(db, make_order, board, monkeypatch):
+    monkeypatch.setattr("app.live_board.settings.live_board_client_queue_size", 3)
+    await board.load()
+    fast, slow = FakeSocket(), StalledSocket()
+    await board.subscribe(fast)
+    await board.subscribe(slow)
+
+    for i in range(6):
+        await asyncio.wait_for(board.apply([make_order(f"o-{i}")]), timeout=1)
+    await settle()
+
+    assert [message["seq"] for message in fast.messages] == list(range(1, 8))
+    assert slow.closed_with == CLOSE_TOO_SLOW
+    board.send(slow, {"type": "pong"})  # no longer subscribed: ignored
+    assert board._subscribers.keys() == {fast}
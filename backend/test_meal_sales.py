@@ -0,0 +1,74 @@
+"""
+Meal sales counter tests
+Runs against the in-memory database from conftest.py.
+    pytest test_meal_sales.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from app import meal_sales, models, order_state, order_totals
+from app.config import settings
+from app.models import OrderStatus
+
+
+@pytest_asyncio.fixture
+async def orders(db, make_order):
+    orders = [
+        make_order("a", OrderStatus.OUT_FOR_DELIVERY, items=[("soup", 2), ("salad", 1)]),
+        make_order("b", OrderStatus.OUT_FOR_DELIVERY, items=[("soup", 1)], days_ago=3),
+        make_order("c", OrderStatus.OUT_FOR_DELIVERY, items=[("salad", 5)], days_ago=20),
+        make_order("d", OrderStatus.PREPARING, items=[("pie", 9)]),  # never delivered
+    ]
+    for order in orders:
+        await order.insert()
+    for order_id in ("a", "b", "c"):
+        await order_state.transition(order_id, OrderStatus.DELIVERED)
+    return orders
+
+
+async def counters():
+    return {
+        doc["_id"]: (doc["quantity"], doc["revenue_cents"])
+        for doc in await models.MealSalesDaily.get_motor_collection().find({}).to_list(length=None)
+    }
+
+
+@pytest.mark.asyncio
+async def test_delivered_transitions_feed_the_counters(orders):
+    incremental = await counters()
+    assert len(incremental) == 4
+    assert sum(quantity for quantity, _ in incremental.values()) == 2 + 1 + 1 + 5
+
+    ranked = await meal_sales.top_meals()
+    assert [(meal_id, totals.quantity) for meal_id, totals in ranked] == [("salad", 6), ("soup", 3)]
+    week = await meal_sales.top_meals(since=datetime.utcnow() - timedelta(days=7), limit=1)
+    assert [(meal_id, totals.quantity, totals.revenue_cents) for meal_id, totals in week] == [("soup", 3, 750)]
+
+    # Counters agree with the order aggregation they replace
+    from_orders = await order_totals.meal_totals(engine="mongo")
+    assert {meal_id: (t.quantity, t.revenue_cents) for meal_id, t in ranked} == \
+        {meal_id: (t.quantity, t.revenue_cents) for meal_id, t in from_orders.items()}
+
+
+@pytest.mark.asyncio
+async def test_rebuild_matches_incremental_counters(orders):
+    incremental = await counters()
+    await models.MealSalesDaily.get_motor_collection().update_many({}, {"$inc": {"quantity": 100}})
+    await models.MealSalesDaily(id="ghost:2020-01-01", meal_id="ghost", day=datetime(2020, 1, 1), quantity=1).insert()
+
+    assert await meal_sales.rebuild() == 4
+    assert await counters() == incremental
+
+
+@pytest.mark.asyncio
+async def test_trending_skips_unavailable_meals_and_syncs_popular(orders, monkeypatch):
+    for meal_id, available in (("soup", True), ("salad", False), ("pie", True)):
+        await models.Meal(id=meal_id, price=2.5, category_id="c", is_available=available, is_popular=meal_id == "pie").insert()
+    monkeypatch.setattr(settings, "trending_sets_popular", True)
+
+    trending = meal_sales.TrendingMeals()
+    assert [meal.id for meal in await trending.get()] == ["soup"]
+    popular = {meal.id: meal.is_popular for meal in await models.Meal.find_all().to_list()}
+    assert popular == {"soup": True, "salad": False, "pie": False}
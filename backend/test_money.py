@@ -0,0 +1,63 @@
+"""
+Integer-cents money tests
+Conversion tests need nothing; the totals test runs against the in-memory
+database from conftest.py.
+    pytest test_money.py
+"""
+import pytest
+import pytest_asyncio
+
+from app import models, money, order_totals
+from app.models import OrderStatus
+
+
+def test_to_cents_rounds_half_up_without_float_drift():
+    assert money.to_cents(19.99) == 1999  # int(19.99 * 100) == 1998
+    assert money.to_cents(0.285) == 29
+    assert money.to_cents(12.345) == 1235
+    assert money.to_cents("7.10") == 710
+    assert money.to_cents(None) == 0
+    assert money.from_cents(1999) == 19.99
+
+
+def test_percent_and_whole_units():
+    assert money.percent_of(3150, 0.16) == 504
+    assert money.percent_of(1005, 0.1) == 101  # 100.5 rounds up
+    assert money.to_whole_units(14950) == 150
+    assert money.to_whole_units(14949) == 149
+
+
+def test_summing_cents_is_exact():
+    prices = [0.1, 0.2, 0.7] * 1000
+    assert sum(prices) != 1000.0
+    assert money.from_cents(sum(money.to_cents(price) for price in prices)) == 1000.0
+
+
+# --- aggregation over an in-memory database ---
+
+@pytest_asyncio.fixture
+async def orders(db, make_order):
+    orders = []
+    for i, (status, total) in enumerate([
+        (OrderStatus.DELIVERED, 10.1), (OrderStatus.DELIVERED, 20.2), (OrderStatus.CANCELLED, 5.0), (OrderStatus.DELIVERED, 0.7),
+    ]):
+        order = make_order(
+            status=status,
+            days_ago=i,
+            items=[models.OrderItem(meal_id="meal-1", meal_name="Soup", meal_price=total, quantity=i + 1, subtotal=total)],
+            cents=i % 2 == 0,  # odd orders predate the cents fields
+        )
+        await order.insert()
+        orders.append(order)
+    return orders
+
+
+@pytest.mark.asyncio
+async def test_totals_are_summed_in_cents(orders):
+    totals = await order_totals.grand_total()
+    assert (totals.orders, totals.delivered_orders, totals.sold_meals) == (4, 3, 1 + 2 + 4)
+    assert totals.revenue_cents == 1010 + 2020 + 70
+
+    meals = await order_totals.meal_totals()
+    assert meals["meal-1"].quantity == 7
+    assert meals["meal-1"].revenue == 31.0
@@ -0,0 +1,106 @@
+"""
+M-Pesa long-poll tests
+Calls the callback and /mpesa/transaction/{id}/wait handlers directly
+against the in-memory database from conftest.py.
+    pytest test_mpesa_wait.py
+"""
+import asyncio
+
+import pytest
+
+from app import models
+from app.models import MPesaTransactionStatus, OrderStatus
+from app.routers import mpesa
+from app.routers.mpesa import mpesa_callback, wait_for_transaction_status, waiters
+
+
+class CallbackRequest:
+    def __init__(self, checkout_request_id: str, result_code: int):
+        self.body = {"Body": {"stkCallback": {
+            "MerchantRequestID": "mr-1",
+            "CheckoutRequestID": checkout_request_id,
+            "ResultCode": result_code,
+            "ResultDesc": "ok" if result_code == 0 else "cancelled",
+            "CallbackMetadata": {"Item": [{"Name": "MpesaReceiptNumber", "Value": "RCPT1"}]},
+        }}}
+
+    async def json(self):
+        return self.body
+
+
+@pytest.fixture(autouse=True)
+def slow_recheck(monkeypatch):
+    # Waiters must be woken by the callback, not by the periodic re-read
+    monkeypatch.setattr(mpesa.settings, "mpesa_wait_recheck_seconds", 30)
+
+
+async def pending_transaction(checkout_request_id="ws-1", order_id="o-1", **fields):
+    transaction = models.MPesaTransaction(
+        order_id=order_id, amount=100, checkout_request_id=checkout_request_id, **fields
+    )
+    await transaction.insert()
+    return transaction
+
+
+async def registered(checkout_request_id: str, count: int):
+    for _ in range(100):
+        if waiters._events.get(checkout_request_id, (None, 0))[1] == count:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"{count} waiter(s) never registered for {checkout_request_id}")
+
+
+@pytest.mark.asyncio
+async def test_callback_wakes_every_waiter_with_the_final_status(db, make_order):
+    await make_order("o-1").insert()
+    await pending_transaction()
+
+    polls = [asyncio.create_task(wait_for_transaction_status("ws-1", timeout=20)) for _ in range(2)]
+    await registered("ws-1", 2)
+    await mpesa_callback(CallbackRequest("ws-1", 0))
+
+    results = await asyncio.wait_for(asyncio.gather(*polls), timeout=5)
+    assert [result["status"] for result in results] == [MPesaTransactionStatus.SUCCESS] * 2
+    assert results[0]["mpesa_receipt_number"] == "RCPT1"
+    assert (await models.Order.get("o-1")).status == OrderStatus.CONFIRMED
+    assert waiters._events == {}
+
+
+@pytest.mark.asyncio
+async def test_timeout_returns_pending(db):
+    await pending_transaction()
+
+    result = await wait_for_transaction_status("ws-1", timeout=1)
+    assert result["status"] == MPesaTransactionStatus.PENDING
+    assert waiters._events == {}
+
+
+@pytest.mark.asyncio
+async def test_settled_transaction_returns_immediately(db):
+    await pending_transaction(status=MPesaTransactionStatus.FAILED, result_code=1032)
+
+    result = await asyncio.wait_for(wait_for_transaction_status("ws-1", timeout=20), timeout=1)
+    assert result["status"] == MPesaTransactionStatus.FAILED and result["result_code"] == 1032
+    assert waiters._events == {}
+
+
+@pytest.mark.asyncio
+async def test_unknown_transaction_releases_its_waiter(db):
+    with pytest.raises(mpesa.HTTPException) as raised:
+        await wait_for_transaction_status("missing", timeout=20)
+    assert raised.value.status_code == 404
+    assert waiters._events == {}
+
+
+def test_waiter_registry_counts_references():
+    registry = mpesa.TransactionWaiters()
+    first = registry.acquire("ws-1")
+    assert registry.acquire("ws-1") is first
+    registry.release("ws-1")
+    registry.notify("ws-1")
+    assert first.is_set()
+    registry.release("ws-1")
+    registry.release("ws-1")  # extra release is harmless
+    registry.notify("ws-1")  # nobody waiting: nothing to wake
+    assert registry._events == {}
+    assert not registry.acquire("ws-1").is_set()  # a new round gets a fresh event
@@ -0,0 +1,70 @@
+"""
+Order archive tests
+Runs against the in-memory database from conftest.py.
+    pytest test_order_archive.py
+"""
+import pytest
+import pytest_asyncio
+
+from app import models, order_archive, order_codec
+from app.models import OrderStatus
+
+
+@pytest_asyncio.fixture
+async def orders(db, make_order):
+    orders = [
+        make_order("old-delivered", OrderStatus.DELIVERED, days_ago=200),
+        make_order("old-cancelled", OrderStatus.CANCELLED, days_ago=120),
+        make_order("old-pending", OrderStatus.PENDING, days_ago=300),
+        make_order("recent-delivered", OrderStatus.DELIVERED, days_ago=5),
+        make_order("other-user", OrderStatus.DELIVERED, days_ago=150, user_id="user-2"),
+    ]
+    for order in orders:
+        order.status_history = [
+            models.OrderStatusHistory(status=status, changed_at=order.created_at)
+            for status in (OrderStatus.PENDING, OrderStatus.PREPARING, order.status)
+        ]
+        await order.insert()
+    return orders
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_only_old_terminal_orders(orders):
+    moved = await order_archive.archive_orders(older_than_days=90, batch_size=2)
+
+    assert moved == 3
+    assert {o.id for o in await models.Order.find().to_list()} == {"old-pending", "recent-delivered"}
+    stored = await models.ArchivedOrder.get_motor_collection().find_one({"_id": "old-delivered"})
+    assert order_codec.is_packed(stored)
+    archived = await order_archive.get_order("old-delivered")
+    assert isinstance(archived, models.ArchivedOrder)
+    assert archived.archived_at is not None
+    assert [h.status for h in archived.status_history] == [OrderStatus.PENDING, OrderStatus.PREPARING, OrderStatus.DELIVERED]
+    assert await order_archive.archive_orders(older_than_days=90) == 0
+
+
+@pytest.mark.asyncio
+async def test_reads_go_through_to_the_archive(orders):
+    await order_archive.archive_orders(older_than_days=90)
+
+    assert (await order_archive.get_order("old-delivered")).id == "old-delivered"
+    history = await order_archive.find_recent({"user_id": "user-1"}, limit=10)
+    assert [o.id for o in history] == ["recent-delivered", "old-cancelled", "old-delivered", "old-pending"]
+    page = await order_archive.find_recent({"user_id": "user-1"}, skip=1, limit=2)
+    assert [o.id for o in page] == ["old-cancelled", "old-delivered"]
+
+    assert await order_archive.count_orders() == 5
+    assert len(await order_archive.find_orders({"status": OrderStatus.DELIVERED})) == 3
+
+
+@pytest.mark.asyncio
+async def test_invalid_orders_are_skipped_not_fatal(orders, caplog):
+    hot = models.Order.get_motor_collection()
+    await hot.update_one({"_id": "old-delivered"}, {"$set": {"order_type": "DRONE"}})  # no longer a valid OrderType
+    await hot.update_one({"_id": "old-cancelled"}, {"$unset": {"user_id": ""}})
+
+    assert await order_archive.archive_orders(older_than_days=90, batch_size=1) == 1
+    assert await order_archive.archive_orders(older_than_days=90) == 0
+    assert {doc["_id"] async for doc in hot.find({"status": {"$in": order_archive.TERMINAL_STATUSES}})} == \
+        {"old-delivered", "old-cancelled", "recent-delivered"}
+    assert "old-delivered" in caplog.text and "old-cancelled" in caplog.text
@@ -0,0 +1,96 @@
+"""
+Archived order codec tests
+Nothing is read or written, but Beanie documents can only be built after
+init_beanie, so these use the in-memory database from conftest.py.
+    pytest test_order_codec.py
+"""
+from datetime import datetime
+
+import bson
+import pytest
+
+from app import models, money, order_codec
+from app.models import OrderStatus
+from app.order_codec import CodeBook, CodeBooks
+
+
+@pytest.fixture(autouse=True)
+def beanie(db):
+    """Initialises Beanie (through the shared in-memory database)"""
+
+
+def make_books():
+    return CodeBooks(CodeBook("meal"), CodeBook("ingredient"))
+
+
+def make_order():
+    at = datetime(2024, 5, 1, 12, 30, 15, 123000)  # MongoDB keeps milliseconds
+    order = models.Order(
+        id="order-1",
+        user_id="user-1",
+        status=OrderStatus.DELIVERED,
+        order_type=models.OrderType.DELIVERY,
+        payment_method=models.PaymentMethod.MPESA,
+        payment_status=models.PaymentStatus.PAID,
+        items=[
+            models.OrderItem(
+                meal_id="meal-1", meal_name="Grilled Chicken", meal_price=12.5, quantity=2,
+                selected_ingredients=[models.OrderItemIngredient(ingredient_id="ing-1", name="Cheese", price=1.25)],
+                removed_ingredients=["ing-2"], removed_ingredients_names=["Onion"],
+                subtotal=27.5,
+            ),
+            models.OrderItem(
+                meal_id="meal-2", meal_name="Fries", meal_price=4.0,
+                removed_ingredients=["ing-2", "gone"], removed_ingredients_names=["Onion"],
+                special_instructions="Extra crispy", subtotal=4.0,
+            ),
+        ],
+        subtotal=31.5, tax_amount=5.04, delivery_fee=2.0, total_amount=38.54,
+        customer_name="Test", customer_phone="0500000000",
+        order_number="ORD-20240501-000001",
+        created_at=at, updated_at=at, completed_at=at,
+        status_history=[
+            models.OrderStatusHistory(status=OrderStatus.PENDING, changed_at=at, changed_by="system", notes="Order created"),
+            models.OrderStatusHistory(status=OrderStatus.CONFIRMED, changed_at=at, changed_by="stripe",
+                                      notes="Status changed from PENDING to CONFIRMED"),
+            models.OrderStatusHistory(status=OrderStatus.DELIVERED, changed_at=at, changed_by="admin-1", notes="Left at the door"),
+        ],
+    )
+    money.fill_order_cents(order)
+    return order
+
+
+def test_round_trip():
+    order = make_order()
+    books = make_books()
+    packed = order_codec.encode(order, books)
+
+    decoded = order_codec.decode(bson.decode(bson.encode(packed)), books)
+    assert decoded.model_dump() == order.model_dump()
+
+
+def test_packed_form_is_smaller_and_keeps_query_fields():
+    order = make_order()
+    packed = order_codec.encode(order, make_books())
+
+    assert packed["status"] == OrderStatus.DELIVERED
+    assert packed["user_id"] == "user-1"
+    assert packed["created_at"] == order.created_at
+    assert packed["total_amount_cents"] == 3854
+    assert packed["h"][0] == [0, order_codec.to_millis(order.created_at)]
+    assert len(bson.encode(packed)) < len(bson.encode(order.model_dump(by_alias=True)))
+
+
+def test_code_books_reuse_codes_and_track_pending_entries():
+    books = make_books()
+    order_codec.encode(make_order(), books)
+    order_codec.encode(make_order(), books)
+
+    assert books.meals.pending == [("meal-1", "Grilled Chicken"), ("meal-2", "Fries")]
+    assert books.ingredients.entries == [("ing-1", "Cheese"), ("ing-2", "Onion")]
+
+
+def test_unpacked_documents_pass_through():
+    order = make_order()
+    decoded = order_codec.decode(order.model_dump(by_alias=True), make_books())
+    assert decoded.model_dump() == order.model_dump()
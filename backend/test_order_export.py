@@ -0,0 +1,79 @@
+"""
+Order export tests
+Runs against the in-memory database from conftest.py and writes real
+Parquet / Arrow files to a temp dir; skipped without pyarrow.
+    pytest test_order_export.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from app import models, order_archive, order_export
+from app.models import OrderStatus
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+
+def order_with_items(make_order, order_id, status, days_ago, items=2):
+    meals = [models.OrderItem(meal_id=f"meal-{i}", meal_name=f"Meal {i}", meal_price=2.5, quantity=2, subtotal=5.0) for i in range(items)]
+    return make_order(order_id, status, days_ago=days_ago, items=meals, cents=True)
+
+
+@pytest_asyncio.fixture
+async def orders(db, make_order):
+    orders = [
+        order_with_items(make_order, "old", OrderStatus.DELIVERED, 200, items=3),
+        order_with_items(make_order, "recent", OrderStatus.DELIVERED, 10),
+        order_with_items(make_order, "today", OrderStatus.PENDING, 0, items=1),
+    ]
+    for order in orders:
+        await order.insert()
+    await order_archive.archive_orders(older_than_days=90)
+    return orders
+
+
+@pytest.mark.asyncio
+async def test_export_writes_orders_and_exploded_items(orders, tmp_path):
+    result = await order_export.export_orders("parquet", out_dir=str(tmp_path), batch_size=2)
+    assert (result["orders"], result["items"]) == (3, 6)
+
+    table = pq.read_table(result["files"][0])
+    rows = {row["id"]: row for row in table.to_pylist()}
+    assert rows["old"]["archived"] and not rows["recent"]["archived"]
+    assert rows["old"]["total_amount_cents"] == 1500
+    assert rows["old"]["item_count"] == 6
+
+    items = pq.read_table(result["files"][1]).to_pylist()
+    assert sorted(item["meal_id"] for item in items if item["order_id"] == "old") == ["meal-0", "meal-1", "meal-2"]
+    assert all(item["subtotal_cents"] == 500 for item in items)
+
+
+@pytest.mark.asyncio
+async def test_date_range_and_arrow_format(orders, tmp_path):
+    since = datetime.utcnow() - timedelta(days=30)
+    result = await order_export.export_orders("arrow", since=since, out_dir=str(tmp_path))
+    with pa.OSFile(result["files"][0]) as source:
+        ids = pa.ipc.open_file(source).read_all().column("id").to_pylist()
+    assert sorted(ids) == ["recent", "today"]
+
+
+@pytest.mark.asyncio
+async def test_incremental_export_resumes_from_watermark(orders, tmp_path):
+    soon = datetime.utcnow() + order_export.WATERMARK_LAG * 2  # past the lag for "today"
+    first = await order_export.export_orders(incremental=True, out_dir=str(tmp_path), now=soon)
+    assert first["orders"] == 3
+
+    later = datetime.utcnow() + timedelta(hours=1)
+    unchanged = await order_export.export_orders(incremental=True, out_dir=str(tmp_path / "2"), now=later)
+    assert unchanged["orders"] == 0
+
+    today = await models.Order.get("today")
+    today.status = OrderStatus.CONFIRMED
+    today.updated_at = later + timedelta(minutes=10)
+    await today.save()
+    changed = await order_export.export_orders(incremental=True, out_dir=str(tmp_path / "3"), now=later + timedelta(hours=1))
+    assert changed["orders"] == 1
+    assert pq.read_table(changed["files"][0]).column("status").to_pylist() == ["CONFIRMED"]
@@ -0,0 +1,61 @@
+"""
+Hourly order rollup tests
+Runs against the in-memory database from conftest.py.
+    pytest test_order_rollups.py
+"""
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+from app import models, order_rollups, order_state
+from app.models import OrderStatus
+
+
+@pytest_asyncio.fixture
+async def orders(db, make_order):
+    await models.RestaurantSettings(timezone="Africa/Nairobi").insert()  # UTC+3, no DST
+
+    orders = [
+        make_order("sun-late", OrderStatus.OUT_FOR_DELIVERY, created_at=datetime(2024, 5, 5, 22, 30), total=10.0, cents=True),  # Monday 01:30 in Nairobi
+        make_order("sun-late-2", OrderStatus.OUT_FOR_DELIVERY, created_at=datetime(2024, 5, 5, 22, 50), total=5.5, cents=True),
+        make_order("mon-noon", OrderStatus.OUT_FOR_DELIVERY, created_at=datetime(2024, 5, 6, 9, 15), total=7.25, cents=True),  # Monday 12:15
+    ]
+    for order in orders:
+        await order.insert()
+    await order_rollups.record_created(orders)
+    for order_id in ("sun-late", "mon-noon"):
+        await order_state.transition(order_id, OrderStatus.DELIVERED)
+    return orders
+
+
+async def rollups():
+    docs = await models.OrderHourly.get_motor_collection().find({}, {"updated_at": 0}).to_list(length=None)
+    return {doc["_id"]: doc for doc in docs}
+
+
+@pytest.mark.asyncio
+async def test_heatmap_uses_the_restaurant_timezone(orders):
+    timezone = await order_rollups.restaurant_timezone()
+    assert timezone == "Africa/Nairobi"
+
+    counts, revenue = await order_rollups.heatmap(timezone=timezone)
+    assert len(counts) == 7 and all(len(day) == 24 for day in counts)
+    assert counts[0][1] == 2 and revenue[0][1] == 10.0  # only the delivered order counts as revenue
+    assert counts[0][12] == 1 and revenue[0][12] == 7.25
+    assert sum(map(sum, counts)) == 3
+
+    by_hour = await order_rollups.totals_by_hour(timezone=timezone)
+    assert {hour: totals.orders for hour, totals in by_hour.items()} == {1: 2, 12: 1}
+    utc = await order_rollups.totals_by_hour()
+    assert {hour: totals.delivered_orders for hour, totals in utc.items()} == {22: 1, 9: 1}
+
+
+@pytest.mark.asyncio
+async def test_rebuild_matches_incremental_rollups(orders):
+    incremental = await rollups()
+    assert incremental["2024-05-05T22"]["orders"] == 2
+    await models.OrderHourly.get_motor_collection().delete_many({})
+
+    assert await order_rollups.rebuild() == 2
+    assert await rollups() == incremental
@@ -0,0 +1,184 @@
+"""
+Order state machine tests
+Table and update-building tests need nothing; transition tests run against
+the in-memory database from conftest.py.
+    pytest test_order_state_machine.py
+"""
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+from app import models, order_state
+from app.models import OrderStatus
+from app.order_state import InvalidTransition, TransitionConflict
+
+
+def test_terminal_statuses_have_no_moves():
+    for status in (OrderStatus.DELIVERED, OrderStatus.CANCELLED):
+        assert order_state.TRANSITIONS[status] == frozenset()
+        assert not order_state.can_transition(status, OrderStatus.PENDING)
+
+
+def test_every_active_status_can_be_cancelled():
+    for status, targets in order_state.TRANSITIONS.items():
+        if targets:
+            assert OrderStatus.CANCELLED in targets
+
+
+def test_no_skipping_backwards():
+    assert not order_state.can_transition(OrderStatus.READY, OrderStatus.PREPARING)
+    assert not order_state.can_transition(OrderStatus.CONFIRMED, OrderStatus.PENDING)
+    assert not order_state.can_transition(OrderStatus.PENDING, OrderStatus.DELIVERED)
+    assert order_state.sources_for(OrderStatus.OUT_FOR_DELIVERY) == [OrderStatus.READY]
+
+
+def test_build_update_sets_timestamps_and_history():
+    now = datetime(2024, 5, 1, 12, 0)
+    update = order_state.build_update(
+        OrderStatus.PENDING, OrderStatus.CONFIRMED, changed_by="admin-1", notes=None, now=now,
+        set_fields={"payment_status": models.PaymentStatus.PAID}
+    )
+    assert update["$set"]["status"] == OrderStatus.CONFIRMED
+    assert update["$set"]["confirmed_at"] == now
+    assert update["$set"]["payment_status"] == models.PaymentStatus.PAID
+    history = update["$push"]["status_history"]
+    assert history["changed_by"] == "admin-1"
+    assert history["notes"] == "Status changed from PENDING to CONFIRMED"
+
+    delivered = order_state.build_update(OrderStatus.READY, OrderStatus.DELIVERED, changed_by="x", notes="done", now=now)
+    assert delivered["$set"]["completed_at"] == now
+    assert "confirmed_at" not in delivered["$set"]
+
+
+# --- transitions against an in-memory database ---
+
+@pytest_asyncio.fixture
+async def order(db, make_order):
+    order = make_order(status_history=[models.OrderStatusHistory(status=OrderStatus.PENDING)])
+    await order.insert()
+    return order
+
+
+@pytest.fixture
+def events():
+    received = []
+
+    async def listener(event):
+        received.append(event)
+
+    order_state.on_transition(listener)
+    yield received
+    order_state._listeners.remove(listener)
+
+
+@pytest.mark.asyncio
+async def test_transition_applies_update_and_emits(order, events):
+    event = await order_state.transition(order.id, OrderStatus.CONFIRMED, expected=OrderStatus.PENDING, changed_by="admin-1")
+
+    stored = await models.Order.get(order.id)
+    assert stored.status == OrderStatus.CONFIRMED
+    assert stored.confirmed_at is not None
+    assert [h.status for h in stored.status_history] == [OrderStatus.PENDING, OrderStatus.CONFIRMED]
+
+    assert events == [event]
+    assert event.from_status == OrderStatus.PENDING
+    assert event.order.status == OrderStatus.CONFIRMED
+    assert len(event.order.status_history) == 2
+
+
+@pytest.mark.asyncio
+async def test_invalid_transition_is_rejected_without_writing(order, events):
+    with pytest.raises(InvalidTransition):
+        await order_state.transition(order.id, OrderStatus.DELIVERED)
+    with pytest.raises(InvalidTransition):
+        await order_state.transition(order.id, OrderStatus.READY, expected=OrderStatus.PENDING)
+
+    stored = await models.Order.get(order.id)
+    assert stored.status == OrderStatus.PENDING
+    assert len(stored.status_history) == 1
+    assert events == []
+
+
+@pytest.mark.asyncio
+async def test_stale_expected_status_conflicts(order):
+    await order_state.transition(order.id, OrderStatus.CONFIRMED, expected=OrderStatus.PENDING)
+    with pytest.raises(TransitionConflict):
+        await order_state.transition(order.id, OrderStatus.CANCELLED, expected=OrderStatus.PENDING)
+    assert (await models.Order.get(order.id)).status == OrderStatus.CONFIRMED
+
+    # Even when the order's current status could not make the move itself
+    with pytest.raises(TransitionConflict):
+        await order_state.transition(order.id, OrderStatus.CONFIRMED, expected=OrderStatus.PENDING)
+
+
+@pytest.mark.asyncio
+async def test_source_dependent_timestamps_without_expected_status(order):
+    assert len(order_state.sources_for(OrderStatus.PREPARING)) > 1
+    event = await order_state.transition(order.id, OrderStatus.PREPARING)
+
+    stored = await models.Order.get(order.id)
+    assert stored.status == OrderStatus.PREPARING
+    assert stored.confirmed_at is not None and stored.confirmed_at == stored.updated_at
+    assert event.from_status == OrderStatus.PENDING
+    assert event.order.confirmed_at == event.changed_at
+
+
+@pytest.mark.asyncio
+async def test_missing_order_returns_none(order):
+    assert await order_state.transition("missing", OrderStatus.CONFIRMED) is None
+
+
+@pytest.mark.asyncio
+async def test_transition_or_update_records_payment_on_terminal_orders(order):
+    await order_state.transition(order.id, OrderStatus.CANCELLED)
+    event = await order_state.transition_or_update(
+        order.id, OrderStatus.CONFIRMED, {"payment_status": models.PaymentStatus.PAID}
+    )
+    stored = await models.Order.get(order.id)
+    assert event is None
+    assert stored.status == OrderStatus.CANCELLED
+    assert stored.payment_status == models.PaymentStatus.PAID
+
+
+@pytest.mark.asyncio
+async def test_failing_listener_does_not_fail_transition(order):
+    async def broken(event):
+        raise RuntimeError("boom")
+
+    order_state.on_transition(broken)
+    try:
+        event = await order_state.transition(order.id, OrderStatus.CANCELLED)
+    finally:
+        order_state._listeners.remove(broken)
+    assert event.to_status == OrderStatus.CANCELLED
+
+
+@pytest.mark.asyncio
+async def test_transition_many_moves_valid_orders_in_one_batch(order, events):
+    batch = []
+
+    async def batch_listener(received):
+        batch.append(received)
+
+    order_state.on_transitions(batch_listener)
+    try:
+        other = models.Order(**{**order.model_dump(exclude={"id"}), "status": OrderStatus.PREPARING})
+        await other.insert()
+        done = models.Order(**{**order.model_dump(exclude={"id"}), "status": OrderStatus.DELIVERED})
+        await done.insert()
+
+        moved, rejected = await order_state.transition_many(
+            [order.id, other.id, done.id, "missing"], OrderStatus.CANCELLED, changed_by="kitchen"
+        )
+    finally:
+        order_state._batch_listeners.remove(batch_listener)
+
+    assert {event.order.id for event in moved} == {order.id, other.id}
+    assert set(rejected) == {done.id, "missing"}
+    assert len(events) == 2 and len(batch) == 1 and len(batch[0]) == 2
+    for order_id in (order.id, other.id):
+        stored = await models.Order.get(order_id)
+        assert stored.status == OrderStatus.CANCELLED
+        assert stored.status_history[-1].changed_by == "kitchen"
+    assert (await models.Order.get(done.id)).status == OrderStatus.DELIVERED
@@ -0,0 +1,68 @@
+"""
+Keyset pagination tests
+Cursor and filter tests need nothing; the paging round trip runs against
+the in-memory database from conftest.py.
+    pytest test_pagination.py
+"""
+from datetime import datetime
+
+import pytest
+from pymongo import ASCENDING, DESCENDING
+
+from app.pagination import decode_cursor, encode_cursor, keyset_filter
+from app.routers.reviews import REVIEW_ROW_DEFAULTS, REVIEW_SORT_KEYS, ReviewSort
+
+HELPFUL = REVIEW_SORT_KEYS[ReviewSort.MOST_HELPFUL]
+NEWEST = REVIEW_SORT_KEYS[ReviewSort.NEWEST]
+
+
+def test_cursor_round_trip_keeps_datetimes():
+    doc = {"_id": "r-1", "created_at": datetime(2024, 5, 1, 12, 30, 15, 250000)}
+    cursor = encode_cursor(NEWEST, doc, tag="newest")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, NEWEST, tag="newest") == [doc["created_at"], "r-1"]
+
+
+def test_cursor_rejects_other_sorts_and_garbage():
+    cursor = encode_cursor(HELPFUL, {"_id": "r-1", "helpful_count": 3}, tag="most_helpful")
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, HELPFUL, tag="newest")
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, [("_id", DESCENDING)], tag="most_helpful")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor!", HELPFUL, tag="most_helpful")
+
+
+def test_missing_sort_field_is_encoded_as_its_default():
+    legacy = {"_id": "r-1"}  # written before helpful_count existed
+    cursor = encode_cursor(HELPFUL, legacy, tag="most_helpful", defaults=REVIEW_ROW_DEFAULTS)
+    assert decode_cursor(cursor, HELPFUL, tag="most_helpful") == [0, "r-1"]
+
+
+def test_keyset_filter_branches():
+    assert keyset_filter(HELPFUL, [2, "r-5"]) == {"$or": [
+        {"helpful_count": {"$lt": 2}},
+        {"helpful_count": 2, "_id": {"$lt": "r-5"}},
+    ]}
+    assert keyset_filter([("rating", ASCENDING), ("_id", ASCENDING)], [4, "r-1"]) == {"$or": [
+        {"rating": {"$gt": 4}},
+        {"rating": 4, "_id": {"$gt": "r-1"}},
+    ]}
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_every_review_once(db):
+    collection = db["reviews"]
+    counts = [3, 0, 1, 1, 0, 3, 0]
+    await collection.insert_many([{"_id": f"r-{i}", "helpful_count": count} for i, count in enumerate(counts)])
+
+    seen, cursor = [], None
+    for _ in range(2):
+        query = keyset_filter(HELPFUL, decode_cursor(cursor, HELPFUL, tag="most_helpful")) if cursor else {}
+        page = await collection.find(query).sort(HELPFUL).limit(4).to_list(length=None)
+        seen += [doc["_id"] for doc in page]
+        cursor = encode_cursor(HELPFUL, page[-1], tag="most_helpful", defaults=REVIEW_ROW_DEFAULTS)
+
+    everything = await collection.find({}).sort(HELPFUL).to_list(length=None)
+    assert seen == [doc["_id"] for doc in everything]
+    assert seen[:2] == ["r-5", "r-0"] and seen[-1] == "r-1"
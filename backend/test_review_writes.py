@@ -0,0 +1,283 @@
+"""
+Review write path tests
+Calls the review handlers directly against the in-memory database from
+conftest.py and checks meal_rating_stats against a full recompute.
+    pytest test_review_writes.py
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models
+from app.crud import crud_meal_rating_stats
+from app.models import Review, ReviewStatus, ReviewVote, ReviewVoteType
+from app.routers import reviews
+from app.routers.reviews import AdminResponse, BulkReviewModeration, ReviewModeration, ReviewUpdate
+
+AUTHOR_ID = "user-1"
+HELPFUL, UNHELPFUL = ReviewVoteType.HELPFUL, ReviewVoteType.UNHELPFUL
+
+
+@pytest.fixture
+def author(db):
+    return models.User(id=AUTHOR_ID, phone="0500000001", name="Ann")
+
+
+@pytest.fixture
+def admin(db):
+    return models.User(id="admin-1", phone="0500000002", name="Staff", role=models.UserRole.ADMIN)
+
+
+async def add_review(review_id: str, rating: int = 4, status: ReviewStatus = ReviewStatus.APPROVED, meal_id: str = "meal-1", **fields) -> Review:
+    review = Review(id=review_id, user_id=AUTHOR_ID, meal_id=meal_id, rating=rating, status=status, **fields)
+    await review.insert()
+    if status == ReviewStatus.APPROVED:
+        await crud_meal_rating_stats.apply(meal_id, added=rating)
+    return review
+
+
+async def stats(meal_id: str = "meal-1"):
+    doc = await models.MealRatingStats.get_motor_collection().find_one({"_id": meal_id}, {"updated_at": 0})
+    if doc is None or not doc.get("rating_count"):
+        return (0, 0, {})
+    histogram = {rating: count for rating, count in (doc.get("histogram") or {}).items() if count}
+    return (doc["rating_sum"], doc["rating_count"], histogram)
+
+
+async def assert_stats_match_reviews(*meal_ids: str):
+    """The incrementally maintained aggregates equal a rebuild from the reviews"""
+    meal_ids = meal_ids or ("meal-1",)
+    maintained = [await stats(meal_id) for meal_id in meal_ids]
+    await crud_meal_rating_stats.recompute(meal_ids=list(meal_ids))
+    assert maintained == [await stats(meal_id) for meal_id in meal_ids]
+    return maintained
+
+
+def moderate_first(monkeypatch, admin, status: ReviewStatus):
+    """Make the handler's Review.get return a copy read before a moderation lands"""
+    get = Review.get
+
+    async def stale_get(review_id, *args, **kwargs):
+        stale = await get(review_id, *args, **kwargs)
+        await reviews.moderate_review(review_id, ReviewModeration(status=status), current_admin=admin)
+        return stale
+
+    monkeypatch.setattr(Review, "get", stale_get)
+
+
+# --- edits and admin responses ---
+
+@pytest.mark.asyncio
+async def test_rating_edit_moves_the_aggregate(db, author, admin):
+    await add_review("r-1", rating=4)
+    await add_review("r-2", rating=5)
+
+    response = await reviews.update_review("r-1", ReviewUpdate(rating=2, comment="meh"), current_user=author)
+    assert (response.rating, response.comment) == (2, "meh")
+    assert await assert_stats_match_reviews() == [(7, 2, {"2": 1, "5": 1})]
+
+
+@pytest.mark.asyncio
+async def test_edit_keeps_a_concurrent_moderation(db, monkeypatch, author, admin):
+    await add_review("r-1", rating=4)
+    moderate_first(monkeypatch, admin, ReviewStatus.REJECTED)
+
+    await reviews.update_review("r-1", ReviewUpdate(rating=1), current_user=author)
+    stored = await Review.get_motor_collection().find_one({"_id": "r-1"})
+    assert (stored["status"], stored["rating"]) == (ReviewStatus.REJECTED, 1)
+    assert await assert_stats_match_reviews() == [(0, 0, {})]
+
+
+@pytest.mark.asyncio
+async def test_edit_of_a_review_approved_meanwhile_counts_the_new_rating(db, monkeypatch, author, admin):
+    await add_review("r-1", rating=4, status=ReviewStatus.PENDING)
+    moderate_first(monkeypatch, admin, ReviewStatus.APPROVED)
+
+    await reviews.update_review("r-1", ReviewUpdate(rating=2), current_user=author)
+    assert await assert_stats_match_reviews() == [(2, 1, {"2": 1})]
+
+
+@pytest.mark.asyncio
+async def test_edit_checks_the_author(db, author, admin):
+    await add_review("r-1")
+    with pytest.raises(reviews.HTTPException) as raised:
+        await reviews.update_review("r-1", ReviewUpdate(rating=1), current_user=admin)
+    assert raised.value.status_code == 403
+    with pytest.raises(reviews.HTTPException) as raised:
+        await reviews.update_review("missing", ReviewUpdate(rating=1), current_user=author)
+    assert raised.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_admin_response_writes_only_the_response(db, author, admin):
+    await add_review("r-1", status=ReviewStatus.PENDING)
+    await reviews.moderate_review("r-1", ReviewModeration(status=ReviewStatus.APPROVED), current_admin=admin)
+
+    await reviews.respond_to_review("r-1", AdminResponse(admin_response="Thanks!"), current_admin=admin)
+    stored = await Review.get("r-1")
+    assert (stored.status, stored.admin_response, stored.admin_responder_id) == (ReviewStatus.APPROVED, "Thanks!", admin.id)
+    with pytest.raises(reviews.HTTPException):
+        await reviews.respond_to_review("missing", AdminResponse(admin_response="?"), current_admin=admin)
+
+
+# --- helpful / unhelpful votes ---
+
+def voter(n: int) -> models.User:
+    return models.User(id=f"voter-{n}", phone=f"05100000{n:02d}", name=f"Voter {n}")
+
+
+async def counts(review_id: str = "r-1"):
+    doc = await Review.get_motor_collection().find_one({"_id": review_id})
+    return (doc["helpful_count"], doc["unhelpful_count"])
+
+
+@pytest.mark.asyncio
+async def test_repeat_vote_is_a_no_op(db):
+    await add_review("r-1")
+    first = await reviews.record_review_vote("r-1", HELPFUL, voter(1))
+    again = await reviews.record_review_vote("r-1", HELPFUL, voter(1))
+    assert first["helpful_count"] == again["helpful_count"] == 1
+    assert await counts() == (1, 0)
+    assert await ReviewVote.find(ReviewVote.review_id == "r-1").count() == 1
+
+
+@pytest.mark.asyncio
+async def test_switching_sides_moves_the_vote(db):
+    await add_review("r-1")
+    await reviews.record_review_vote("r-1", HELPFUL, voter(1))
+    await reviews.record_review_vote("r-1", HELPFUL, voter(2))
+    assert await counts() == (2, 0)
+
+    await reviews.record_review_vote("r-1", UNHELPFUL, voter(1))
+    assert await counts() == (1, 1)
+    await reviews.record_review_vote("r-1", HELPFUL, voter(1))
+    assert await counts() == (2, 0)
+
+    # Anonymous votes are not deduplicated
+    await reviews.record_review_vote("r-1", UNHELPFUL, None)
+    await reviews.record_review_vote("r-1", UNHELPFUL, None)
+    assert await counts() == (2, 2)
+
+
+@pytest.mark.asyncio
+async def test_vote_on_missing_review_leaves_no_vote_behind(db):
+    with pytest.raises(reviews.HTTPException) as raised:
+        await reviews.record_review_vote("missing", HELPFUL, voter(1))
+    assert raised.value.status_code == 404
+    assert await ReviewVote.find_all().count() == 0
+
+
+@pytest.mark.asyncio
+async def test_edits_and_responses_keep_votes_cast_meanwhile(db, monkeypatch, author, admin):
+    await add_review("r-1")
+    get = Review.get
+
+    async def get_then_vote(review_id, *args, **kwargs):
+        stale = await get(review_id, *args, **kwargs)
+        await reviews.record_review_vote(review_id, HELPFUL, voter(1))
+        return stale
+
+    monkeypatch.setattr(Review, "get", get_then_vote)
+    await reviews.update_review("r-1", ReviewUpdate(comment="edited"), current_user=author)
+    await reviews.record_review_vote("r-1", UNHELPFUL, voter(2))
+    await reviews.respond_to_review("r-1", AdminResponse(admin_response="Thanks!"), current_admin=admin)
+
+    assert await counts() == (1, 1)
+
+
+# --- moderation ---
+
+APPROVED, REJECTED, PENDING = ReviewStatus.APPROVED, ReviewStatus.REJECTED, ReviewStatus.PENDING
+
+
+def bulk(status: ReviewStatus, *review_ids: str) -> BulkReviewModeration:
+    return BulkReviewModeration(status=status, review_ids=list(review_ids))
+
+
+@pytest.mark.asyncio
+async def test_moderation_moves_the_aggregate_both_ways(db, admin):
+    await add_review("r-1", rating=5, status=PENDING)
+    await add_review("r-2", rating=3)
+
+    await reviews.moderate_review("r-1", ReviewModeration(status=APPROVED), current_admin=admin)
+    assert await assert_stats_match_reviews() == [(8, 2, {"3": 1, "5": 1})]
+    await reviews.moderate_review("r-1", ReviewModeration(status=APPROVED), current_admin=admin)  # no change
+    await reviews.moderate_review("r-2", ReviewModeration(status=REJECTED, moderation_notes="spam"), current_admin=admin)
+    assert await assert_stats_match_reviews() == [(5, 1, {"5": 1})]
+    stored = await Review.get("r-2")
+    assert (stored.moderated_by, stored.moderation_notes) == (admin.id, "spam")
+
+    with pytest.raises(reviews.HTTPException):
+        await reviews.moderate_review("missing", ReviewModeration(status=APPROVED), current_admin=admin)
+
+
+@pytest.mark.asyncio
+async def test_bulk_moderation_merges_deltas_per_meal(db, admin):
+    await add_review("r-1", rating=5, status=PENDING)
+    await add_review("r-2", rating=4, status=PENDING, meal_id="meal-2")
+    await add_review("r-3", rating=2)
+    await add_review("r-4", rating=1, status=REJECTED)
+
+    result = await reviews.bulk_moderate_reviews(bulk(APPROVED, "r-1", "r-2", "r-3", "r-4", "r-1", "missing"), current_admin=admin)
+    assert (result["moderated"], result["not_found"]) == (4, ["missing"])
+    assert await assert_stats_match_reviews("meal-1", "meal-2") == [(8, 3, {"1": 1, "2": 1, "5": 1}), (4, 1, {"4": 1})]
+
+    await reviews.bulk_moderate_reviews(bulk(REJECTED, "r-1", "r-2", "r-3"), current_admin=admin)
+    assert await assert_stats_match_reviews("meal-1", "meal-2") == [(1, 1, {"1": 1}), (0, 0, {})]
+
+
+@pytest.mark.asyncio
+async def test_bulk_moderation_recomputes_after_a_concurrent_change(db, monkeypatch, admin):
+    await add_review("r-1", rating=5, status=PENDING)
+    await add_review("r-2", rating=3, status=PENDING)
+
+    # r-2 is approved by someone else between the bulk read and the bulk write
+    collection = Review.get_motor_collection()
+    bulk_write = collection.bulk_write
+
+    async def racing_bulk_write(*args, **kwargs):
+        await reviews.moderate_review("r-2", ReviewModeration(status=APPROVED), current_admin=admin)
+        return await bulk_write(*args, **kwargs)
+
+    recomputed = []
+    recompute = crud_meal_rating_stats.recompute
+
+    async def spy_recompute(meal_ids=None):
+        recomputed.append(meal_ids)
+        return await recompute(meal_ids=meal_ids)
+
+    monkeypatch.setattr(collection, "bulk_write", racing_bulk_write)
+    monkeypatch.setattr(crud_meal_rating_stats, "recompute", spy_recompute)
+
+    result = await reviews.bulk_moderate_reviews(bulk(APPROVED, "r-1", "r-2"), current_admin=admin)
+    assert result["moderated"] == 1  # the guarded update skipped r-2
+    assert recomputed == [["meal-1"]]
+    assert await assert_stats_match_reviews() == [(8, 2, {"3": 1, "5": 1})]
+
+
+@pytest.mark.asyncio
+async def test_moderation_queue_pages_without_duplicates(db, admin):
+    start = datetime(2024, 5, 1, 12)
+    for i in range(8):
+        # pairs share a timestamp, so _id breaks the ties
+        await add_review(f"r-{i}", status=PENDING, created_at=start + timedelta(minutes=i // 2))
+    await add_review("r-approved", created_at=start)
+
+    seen, cursor = [], None
+    while True:
+        response = await reviews.get_moderation_queue(current_admin=admin, limit=3, cursor=cursor)
+        page = [row["id"] for row in json.loads(response.body)]
+        seen += page
+        if page:
+            # Approving from the current page does not shift the next one
+            await reviews.moderate_review(page[0], ReviewModeration(status=APPROVED), current_admin=admin)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == [f"r-{i}" for i in range(8)]
+
+    with pytest.raises(reviews.HTTPException) as raised:
+        await reviews.get_moderation_queue(current_admin=admin, limit=3, cursor="garbage")
+    assert raised.value.status_code == 400
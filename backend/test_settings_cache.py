@@ -0,0 +1,64 @@
+"""
+Restaurant settings cache tests
+Runs against the in-memory database from conftest.py.
+    pytest test_settings_cache.py
+"""
+import asyncio
+
+import pytest
+
+from app import models, schemas
+from app.cache import CacheVersions, SettingsCache, settings_cache
+from app.routers.settings import partial_update_settings
+
+
+def worker(version_ttl: float = 3600) -> SettingsCache:
+    """A settings cache as another worker process would hold it"""
+    return SettingsCache(ttl_seconds=3600, versions=CacheVersions(ttl_seconds=version_ttl))
+
+
+@pytest.mark.asyncio
+async def test_reads_are_served_from_memory(db):
+    cache = worker()
+    cached = await cache.get()
+    await models.RestaurantSettings.get_motor_collection().delete_many({})
+    assert await cache.get() is cached
+
+
+@pytest.mark.asyncio
+async def test_write_by_another_worker_is_seen_once_the_version_is_rechecked(db):
+    this_worker, other_worker = worker(), worker()
+    cached = await this_worker.get()
+    assert (await other_worker.get()).delivery_fee == cached.delivery_fee
+
+    settings = await models.RestaurantSettings.find_one()
+    settings.delivery_fee = cached.delivery_fee + 50
+    settings.version += 1
+    await settings.save()
+    await other_worker.saved(settings)
+    assert await other_worker.get() is settings
+
+    # Within cache_version_ttl_seconds the cached copy is trusted
+    assert await this_worker.get() is cached
+
+    this_worker.versions.ttl_seconds = 0
+    reloaded = await this_worker.get()
+    assert reloaded.delivery_fee == cached.delivery_fee + 50
+    assert reloaded.version == cached.version + 1
+    assert await this_worker.get() is reloaded  # unchanged version tag: served from memory
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_get_distinct_versions(db):
+    initial = await settings_cache.get()
+    saved = await asyncio.gather(*(
+        partial_update_settings(settings_in=schemas.RestaurantSettingsUpdate(delivery_fee=fee), current_user=None)
+        for fee in (10, 20)
+    ))
+    assert sorted(settings.version for settings in saved) == [initial.version + 1, initial.version + 2]
+
+    stored = await models.RestaurantSettings.find_one()
+    latest = max(saved, key=lambda settings: settings.version)
+    assert (stored.version, stored.delivery_fee) == (latest.version, latest.delivery_fee)
+    assert stored.restaurant_name == initial.restaurant_name  # only the given fields were written
+    assert await settings_cache.get() is latest
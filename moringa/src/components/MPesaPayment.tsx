@@ -40,28 +40,43 @@ export default function MPesaPayment({ orderId, amount, phoneNumber, onSuccess,
     fetchConfig();
   }, []);
 
-  // Poll transaction status
+  // Long-poll transaction status: the server holds each request until the
+  // M-Pesa callback lands (or ~25s pass), so we just loop until settled.
   useEffect(() => {
     if (!polling || !checkoutRequestId) return;
-    const interval = setInterval(async () => {
-      try {
-        const res = await api.get(`/mpesa/transaction/${checkoutRequestId}`);
-        const tx = res.data;
-        setStatusMessage(`Status: ${tx.status}`);
-        if (tx.status === 'SUCCESS') {
-          toast.success('Payment successful');
-          setPolling(false);
-          onSuccess();
-        } else if (tx.status === 'FAILED' || tx.status === 'CANCELED') {
-          toast.error('Payment failed');
-          setPolling(false);
-          setError('Payment failed');
+    let cancelled = false;
+    const waitForStatus = async () => {
+      while (!cancelled) {
+        try {
+          const res = await api.get(`/mpesa/transaction/${checkoutRequestId}/wait`, {
+            params: { timeout: 25 },
+          });
+          if (cancelled) return;
+          const tx = res.data;
+          const status = String(tx.status || '').toLowerCase();
+          setStatusMessage(`Status: ${tx.status}`);
+          if (status === 'success') {
+            toast.success('Payment successful');
+            setPolling(false);
+            onSuccess();
+            return;
+          } else if (status === 'failed' || status === 'canceled') {
+            toast.error('Payment failed');
+            setPolling(false);
+            setError('Payment failed');
+            return;
+          }
+        } catch (err) {
+          console.warn('Polling error:', err);
+          // Back off briefly before retrying after a network/server error
+          await new Promise((resolve) => setTimeout(resolve, 3000));
         }
-      } catch (err) {
-        console.warn('Polling error:', err);
       }
-    }, 3000);
-    return () => clearInterval(interval);
+    };
+    waitForStatus();
+    return () => {
+      cancelled = true;
+    };
   }, [polling, checkoutRequestId, onSuccess]);
 
   const initiatePayment = async () => {
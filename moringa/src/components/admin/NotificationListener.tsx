@@ -59,6 +59,9 @@ export function NotificationListener() {
       } else if (message.type === 'order_status_update' && message.data) {
         // Handle order status updates (could update existing notification)
         console.log('Order status updated:', message.data);
+      } else if (message.type === 'order_status_batch' && message.data) {
+        // Bulk updates (e.g. kitchen display) arrive as one coalesced message
+        console.log('Order statuses updated:', message.data.orders);
       } else if (message.type === 'connection') {
         console.log('WebSocket:', message.message);
       }